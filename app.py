@@ -10,15 +10,13 @@ import os
 import secrets
 from datetime import date, timedelta
 
-from flask import Flask, Response, g, redirect, render_template, request, session, url_for
+from flask import Flask, g, redirect, render_template, request, send_file, session, url_for
 from flask_wtf.csrf import CSRFError, CSRFProtect
-import webbrowser
-import threading
 
 # ------------------------
 # Database & initialization
 # ------------------------
-from db.database import get_db
+from db.database import get_db, init_request_db
 from db.schema import init_db
 
 # ------------------------
@@ -26,8 +24,8 @@ from db.schema import init_db
 # ------------------------
 from routes.login_route import auth_bp
 from auth.utils import ensure_authenticated_user, admin_required
-from services.inventory_service import get_items_with_stock, search_items_with_stock
-from services.transactions_service import add_transaction
+from services.inventory_service import get_stock_for_items, search_items_with_stock
+from services.catalogue_cache import get_latest_items, start_catalogue_listener
 from services.analytics_service import (
     get_dashboard_stats,
     get_hot_items,
@@ -41,6 +39,8 @@ from services.analytics_service import (
 from importers.items_importer import import_items_csv
 from importers.sales_importer import import_sales_csv
 from importers.inventory_importer import import_inventory_csv
+from importers.bulk_loader import report_path
+from utils.csv_export import csv_response, stream_query
 
 # ------------------------
 # API / blueprints
@@ -55,6 +55,11 @@ from routes.customer_route import customer_bp
 from routes.loyalty_route import loyalty_bp
 from routes.notification_route import notification_bp
 from routes.vendor_route import vendor_bp
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_transactions = lazy_module("services.transactions_service")
+add_transaction = _transactions.add_transaction
 
 
 # ============================================================
@@ -83,6 +88,9 @@ app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH_MB", 1
 
 csrf = CSRFProtect(app)
 
+# One shared pool connection per request, returned on teardown (db/database.py)
+init_request_db(app)
+
 
 @app.before_request
 def restrict_access():
@@ -116,7 +124,11 @@ def inject_globals():
         "current_date": date.today().isoformat(),
         "current_user": getattr(g, "current_user", None),
     }
-init_db()  # Safe to call on startup (creates tables if missing)
+init_db()  # Applies pending schema migrations; near-instant when the schema is current
+
+# Keep the item catalogue cache coherent across Waitress processes (LISTEN/NOTIFY)
+if _env_flag("ITEM_CACHE_LISTEN", default=False):
+    start_catalogue_listener()
 
 # Register API routes (kept separate from UI routes)
 app.register_blueprint(dashboard_api)
@@ -153,21 +165,12 @@ def index():
 
     # 1️⃣ We only get the first 50 items for the initial page load
     # This keeps the "Home" page fast even with 5,000 items in the DB
-    extras = conn.execute("""
-        SELECT *
-        FROM items
-        ORDER BY id DESC
-        LIMIT 75
-    """).fetchall()
+    extras = get_latest_items(external_conn=conn)
 
-    # 2️⃣ Get the stock for JUST these 50 items
-    # (We'll adjust your service later, but for now let's just get the list of IDs)
+    # 2️⃣ Get the stock for JUST these items (scoped lookup, not the whole catalogue),
+    # with the same snapshot rule the page has always shown
     item_ids = [e["id"] for e in extras]
-    
-    # We still use your stock service, but we'll need to pass the IDs 
-    # to avoid calculating stock for 5,000 items we aren't showing.
-    items_stock = get_items_with_stock(snapshot_date="2026-01-18")
-    stock_dict = {s["id"]: s["current_stock"] for s in items_stock}
+    stock_dict = get_stock_for_items(item_ids, snapshot_date="2026-01-18", external_conn=conn)
 
     conn.close()
 
@@ -175,7 +178,7 @@ def index():
     items_merged = []
     for row in extras:
         item_data = dict(row)
-        item_data["current_stock"] = stock_dict.get(row["id"], 0)
+        item_data["current_stock"] = stock_dict.get(row["id"], {}).get("current_stock", 0)
         items_merged.append(item_data)
 
     return render_template("index.html", items=items_merged)
@@ -255,26 +258,22 @@ def low_stock():
 # ============================================================
 @app.route("/export/transactions")
 def export_transactions():
-    conn = get_db()
-    rows = conn.execute("""
-        SELECT 
-            items.name AS item,
-            inventory_transactions.transaction_type,
-            inventory_transactions.quantity,
-            inventory_transactions.transaction_date,
-            inventory_transactions.user_name
-        FROM inventory_transactions
-        JOIN items ON items.id = inventory_transactions.item_id
-        ORDER BY inventory_transactions.transaction_date DESC
-    """).fetchall()
-    conn.close()
-
     def generate():
-        yield "Item,Type,Quantity,Date,User\n" # Only one header!
-        for row in rows:
-            yield f"{row['item']},{row['transaction_type']},{row['quantity']},{row['transaction_date']},{row['user_name'] or 'System'}\n"
-
-    return Response(generate(), mimetype="text/csv", headers={"Content-Disposition": "attachment; filename=inventory_transactions.csv"})
+        yield ["Item", "Type", "Quantity", "Date", "User"]
+        for row in stream_query("""
+            SELECT
+                items.name AS item,
+                inventory_transactions.transaction_type,
+                inventory_transactions.quantity,
+                inventory_transactions.transaction_date,
+                inventory_transactions.user_name
+            FROM inventory_transactions
+            JOIN items ON items.id = inventory_transactions.item_id
+            ORDER BY inventory_transactions.transaction_date DESC
+        """):
+            yield [row["item"], row["transaction_type"], row["quantity"], row["transaction_date"], row["user_name"] or "System"]
+
+    return csv_response(generate(), "inventory_transactions.csv")
 
 
 # ============================================================
@@ -285,12 +284,18 @@ def import_items():
     """
     Import item master list.
     """
-    success = import_items_csv(request.files.get("file"))
+    success, result = import_items_csv(request.files.get("file"))
     if not success:
-        return "Invalid file", 400
+        return result, 400
     return redirect("/")
 
 
+def _skip_report_link(result):
+    if not result.get("report_file"):
+        return ""
+    return f'<br><a href="{url_for("download_import_report", filename=result["report_file"])}">Download skipped rows</a>'
+
+
 @app.route("/import/sales", methods=["POST"])
 def import_sales():
     """
@@ -304,6 +309,7 @@ def import_sales():
         f"Sales import complete. "
         f"Imported: {result['imported']}, "
         f"Skipped: {result['skipped']}"
+        f"{_skip_report_link(result)}"
     )
 
 
@@ -316,16 +322,29 @@ def import_inventory():
     if not success:
         return result, 400
 
+    skip_reasons = result['skip_reasons']
     return (
         f"Inventory import complete.<br>"
         f"Imported: {result['imported']}<br>"
         f"Skipped: {result['skipped']}<br>"
-        f"Missing fields: {result['skip_reasons']['missing_fields']}<br>"
-        f"Bad quantity: {result['skip_reasons']['bad_quantity']}<br>"
-        f"Item not found: {result['skip_reasons']['item_not_found']}"
+        f"Missing fields: {skip_reasons.get('missing_fields', 0)}<br>"
+        f"Bad quantity: {skip_reasons.get('bad_quantity', 0)}<br>"
+        f"Item not found: {skip_reasons.get('item_not_found', 0)}"
+        f"{_skip_report_link(result)}"
     )
 
 
+@app.route("/import/report/<filename>")
+def download_import_report(filename):
+    """
+    Per-row skip report written by the last import(s).
+    """
+    path = report_path(filename)
+    if not path:
+        return "Report not found", 404
+    return send_file(path, mimetype="text/csv", as_attachment=True, download_name=filename)
+
+
 # ============================================================
 # Experimental / alternate UI
 # ============================================================
@@ -350,17 +369,10 @@ def index2():
         SELECT 
             items.id,
             items.name,
-            COALESCE(SUM(
-                CASE 
-                    WHEN inventory_transactions.transaction_type = 'IN' 
-                    THEN inventory_transactions.quantity
-                    ELSE -inventory_transactions.quantity
-                END
-            ), 0) AS current_stock
+            COALESCE(b.on_hand, 0) AS current_stock
         FROM items
-        LEFT JOIN inventory_transactions
-            ON items.id = inventory_transactions.item_id
-        GROUP BY items.id
+        LEFT JOIN item_stock_balances b
+            ON b.item_id = items.id
     """).fetchall()
 
     conn.close()
@@ -479,9 +491,13 @@ def server_error(e):
 # App runner
 # ============================================================
 def open_browser():
+    import webbrowser
+
     webbrowser.open("http://127.0.0.1:5000")
 
 if __name__ == "__main__":
+    import threading
+
     threading.Timer(1.5, open_browser).start()
     app.run(port=5000)
 
@@ -1,4 +1,11 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
+
+# Service modules imported by name on first request (utils/lazy_import.py);
+# PyInstaller's import scan can't see them, so list them explicitly.
+sys.path.insert(0, os.path.abspath(SPECPATH))
+from utils.lazy_import import LAZY_SERVICE_MODULES
 
 
 a = Analysis(
@@ -6,7 +13,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('templates/users', 'templates/users'), ('templates/errors', 'templates/errors'), ('static', 'static')],
-    hiddenimports=[],
+    hiddenimports=list(LAZY_SERVICE_MODULES),
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,3 +1,5 @@
+import json
+import os
 import threading
 import time
 from collections import defaultdict, deque
@@ -6,12 +8,31 @@ from functools import wraps
 from flask import abort, flash, g, request, session, redirect, url_for
 
 from db.database import get_db
+from services.catalogue_cache import register_listener_channel
 
 _LOGIN_WINDOW_SECONDS = 15 * 60
 _LOGIN_MAX_ATTEMPTS = 5
 _login_attempt_lock = threading.Lock()
 _failed_login_attempts = defaultdict(deque)
 
+# Authenticated-user cache: restrict_access runs for every request (charts,
+# autocomplete, ...), so the users lookup is cached per process for a short TTL.
+# Writers call notify_user_changed(conn, user_id) inside their transaction and
+# invalidate_cached_user(user_id) after commit. Processes running the
+# catalogue listener (ITEM_CACHE_LISTEN=1) get the NOTIFY on commit and drop
+# their copy too; without it they pick the change up within the TTL.
+#
+# Versioning (as in services/catalogue_cache.py): every invalidation bumps the
+# user's version (or the epoch, for everyone), and a lookup that started
+# before it is not stored, so a slow request can't put the old row back.
+USER_CHANNEL = "auth_user_changed"
+_USER_CACHE_TTL_SECONDS = int(os.environ.get("USER_CACHE_TTL_SECONDS", 30))
+_user_cache_lock = threading.Lock()
+_user_cache = {}
+_user_cache_epoch = 0
+_user_versions = {}
+_user_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
 
 def _client_ip():
     forwarded_for = request.headers.get("X-Forwarded-For", "")
@@ -56,11 +77,68 @@ def clear_failed_login_attempts(username):
         _failed_login_attempts.pop(key, None)
 
 
+def invalidate_cached_user(user_id=None):
+    """Drops one user (or everyone when user_id is None) from the auth cache."""
+    global _user_cache_epoch
+    with _user_cache_lock:
+        _user_cache_stats["invalidations"] += 1
+        if user_id is None:
+            _user_cache_epoch += 1
+            _user_cache.clear()
+        else:
+            user_id = int(user_id)
+            _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+            _user_cache.pop(user_id, None)
+
+
+def notify_user_changed(conn, user_id=None):
+    """
+    Queues a NOTIFY on the writer's transaction so other processes drop the
+    user on commit (nothing is sent for a rolled-back change).
+    """
+    payload = json.dumps({"user_id": int(user_id) if user_id is not None else None})
+    conn.execute("SELECT pg_notify(%s, %s)", (USER_CHANNEL, payload))
+
+
+def _handle_user_notification(payload):
+    try:
+        user_id = json.loads(payload or "{}").get("user_id")
+    except ValueError:
+        user_id = None
+    invalidate_cached_user(user_id)
+
+
+register_listener_channel(USER_CHANNEL, _handle_user_notification, on_reconnect=invalidate_cached_user)
+
+
+def get_user_cache_stats():
+    with _user_cache_lock:
+        lookups = _user_cache_stats["hits"] + _user_cache_stats["misses"]
+        return {
+            **_user_cache_stats,
+            # Every hit is one pool checkout + users query the request didn't make.
+            "db_round_trips_saved": _user_cache_stats["hits"],
+            "hit_ratio": round(_user_cache_stats["hits"] / lookups, 4) if lookups else None,
+            "cached_users": len(_user_cache),
+            "ttl_seconds": _USER_CACHE_TTL_SECONDS,
+        }
+
+
 def get_current_user():
     user_id = session.get("user_id")
     if not user_id:
         return None
 
+    user_id = int(user_id)
+    now_ts = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+        if cached and cached[0] > now_ts:
+            _user_cache_stats["hits"] += 1
+            return dict(cached[1])
+        _user_cache_stats["misses"] += 1
+        loaded_version = (_user_cache_epoch, _user_versions.get(user_id, 0))
+
     conn = get_db()
     try:
         user = conn.execute(
@@ -74,7 +152,16 @@ def get_current_user():
     finally:
         conn.close()
 
-    return dict(user) if user else None
+    if not user:
+        return None
+
+    user = dict(user)
+    if _USER_CACHE_TTL_SECONDS > 0:
+        with _user_cache_lock:
+            # Invalidated while we were reading: the row may already be stale
+            if loaded_version == (_user_cache_epoch, _user_versions.get(user_id, 0)):
+                _user_cache[user_id] = (now_ts + _USER_CACHE_TTL_SECONDS, user)
+    return dict(user)
 
 
 def ensure_authenticated_user():
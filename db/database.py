@@ -1,10 +1,13 @@
 import os
 import threading
+import uuid
 
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
 import psycopg2.pool
 from dotenv import load_dotenv
+from flask import g, has_app_context
 
 load_dotenv()
 
@@ -42,6 +45,7 @@ class DbConnection:
     def __init__(self, raw_conn, pool=None):
         self._conn = raw_conn
         self._pool = pool
+        self._after_commit = []
 
     def execute(self, sql, params=None):
         cursor = self._conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
@@ -56,18 +60,67 @@ class DbConnection:
         cursor.executemany(sql, seq_of_params)
         return DbCursor(cursor)
 
+    def execute_values(self, sql, argslist, template=None, page_size=500, fetch=False):
+        """
+        Multi-row INSERT: sql contains a single "VALUES %s" that is expanded to
+        page_size rows per statement. Returns the RETURNING rows when fetch=True.
+        """
+        cursor = self._conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        rows = psycopg2.extras.execute_values(
+            cursor, sql, argslist, template=template, page_size=page_size, fetch=fetch
+        )
+        return rows if fetch else DbCursor(cursor)
+
+    def iter_rows(self, sql, params=None, itersize=2000):
+        """
+        Yields rows through a server-side (named) cursor, fetching itersize
+        rows per round trip, so memory stays flat however large the result.
+        Consume it before committing / closing the connection.
+        """
+        cursor = self._conn.cursor(
+            name=f"stream_{uuid.uuid4().hex}", cursor_factory=psycopg2.extras.DictCursor
+        )
+        cursor.itersize = itersize
+        try:
+            if params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, tuple(params))
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
     def cursor(self, *args, **kwargs):
         if "cursor_factory" not in kwargs:
             kwargs["cursor_factory"] = psycopg2.extras.DictCursor
         return self._conn.cursor(*args, **kwargs)
 
+    def after_commit(self, callback):
+        """
+        Runs callback() once the current transaction commits, after its locks
+        are released. Dropped if the transaction rolls back or the connection
+        is closed first. A failing callback is logged, never raised: the
+        transaction it follows is already committed.
+        """
+        self._after_commit.append(callback)
+
     def commit(self):
-        return self._conn.commit()
+        result = self._conn.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠ After-commit callback failed: {e}")
+        return result
 
     def rollback(self):
+        self._after_commit = []
         return self._conn.rollback()
 
     def close(self):
+        self._after_commit = []
         if self._pool is not None:
             return self._pool.putconn(self._conn)
         return self._conn.close()
@@ -83,17 +136,136 @@ class DbConnection:
         return getattr(self._conn, name)
 
 
-def get_db():
+class RequestScopedConnection(DbConnection):
+    """
+    One pooled connection shared by every get_db() call within a Flask request.
+
+    close() behaves like returning the connection to the pool (uncommitted work
+    is rolled back) but keeps it checked out for the next service call. The
+    real return to the pool happens in the app-context teardown.
+    """
+
+    def __init__(self, raw_conn, pool=None):
+        super().__init__(raw_conn, pool=pool)
+        self.in_use = False
+
+    def _rollback_open_transaction(self):
+        status = self._conn.info.transaction_status
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._conn.rollback()
+
+    def close(self):
+        self._after_commit = []
+        try:
+            if not self._conn.closed:
+                self._rollback_open_transaction()
+        finally:
+            self.in_use = False
+
+    def release(self):
+        self._after_commit = []
+        try:
+            if not self._conn.closed:
+                self._rollback_open_transaction()
+        finally:
+            self._pool.putconn(self._conn, close=bool(self._conn.closed))
+
+
+def _checkout():
     pool = _get_pool()
     raw_conn = pool.getconn()
     raw_conn.autocommit = False
-    return DbConnection(raw_conn, pool=pool)
+    return raw_conn, pool
+
+
+def get_db():
+    """
+    Inside a Flask request, sequential get_db() calls share one connection
+    (see RequestScopedConnection). A nested call made while the shared
+    connection is still open elsewhere gets its own pooled connection, exactly
+    as before, so transaction boundaries never change.
+    """
+    if not (_REQUEST_SCOPED and has_app_context()):
+        raw_conn, pool = _checkout()
+        return DbConnection(raw_conn, pool=pool)
+
+    g._db_calls = getattr(g, "_db_calls", 0) + 1
+    shared = getattr(g, "_db_conn", None)
+
+    if shared is not None and not shared.in_use:
+        shared.in_use = True
+        return shared
+
+    raw_conn, pool = _checkout()
+    g._db_pool_checkouts = getattr(g, "_db_pool_checkouts", 0) + 1
+
+    if shared is not None:
+        # Shared connection is busy (nested call) — hand out a private one.
+        return DbConnection(raw_conn, pool=pool)
+
+    shared = RequestScopedConnection(raw_conn, pool=pool)
+    shared.in_use = True
+    g._db_conn = shared
+    return shared
 
 
 def get_cursor(conn):
     return conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
 
 
+# ─────────────────────────────────────────────
+# REQUEST-SCOPED CONNECTIONS
+# ─────────────────────────────────────────────
+
+_REQUEST_SCOPED = os.environ.get("DB_REQUEST_SCOPED", "1").strip().lower() in {"1", "true", "yes", "on"}
+_request_stats_lock = threading.Lock()
+_request_stats = {
+    "requests": 0,
+    "get_db_calls": 0,
+    "pool_checkouts": 0,
+    "max_get_db_calls_per_request": 0,
+    "max_pool_checkouts_per_request": 0,
+}
+
+
+def _teardown_request_db(exc=None):
+    shared = g.pop("_db_conn", None)
+    calls = g.pop("_db_calls", 0)
+    checkouts = g.pop("_db_pool_checkouts", 0)
+
+    if shared is not None:
+        # release() rolls back anything left uncommitted (always the case on error).
+        shared.release()
+
+    if calls:
+        with _request_stats_lock:
+            _request_stats["requests"] += 1
+            _request_stats["get_db_calls"] += calls
+            _request_stats["pool_checkouts"] += checkouts
+            _request_stats["max_get_db_calls_per_request"] = max(
+                _request_stats["max_get_db_calls_per_request"], calls
+            )
+            _request_stats["max_pool_checkouts_per_request"] = max(
+                _request_stats["max_pool_checkouts_per_request"], checkouts
+            )
+
+
+def init_request_db(app):
+    """Registers the teardown that returns the request's shared connection to the pool."""
+    app.teardown_appcontext(_teardown_request_db)
+
+
+def get_request_db_stats():
+    """get_db() calls vs real pool checkouts, across requests that touched the DB."""
+    with _request_stats_lock:
+        stats = dict(_request_stats)
+    requests = stats["requests"]
+    stats["enabled"] = _REQUEST_SCOPED
+    stats["avg_get_db_calls_per_request"] = round(stats["get_db_calls"] / requests, 2) if requests else None
+    stats["avg_pool_checkouts_per_request"] = round(stats["pool_checkouts"] / requests, 2) if requests else None
+    return stats
+
+
 _pool_lock = threading.Lock()
 _db_pool = None
 
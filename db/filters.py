@@ -0,0 +1,57 @@
+# ─────────────────────────────────────────────
+# SARGABLE DATE FILTERS
+# ─────────────────────────────────────────────
+#
+# Filters like DATE(col) >= %s wrap the column in a function, so Postgres
+# can't use a btree index on col and scans the table instead. These helpers
+# write the same inclusive YYYY-MM-DD bounds as half-open ranges on the raw
+# column:
+#
+#     DATE(col) BETWEEN a AND b   →   col >= a::date AND col < b::date + 1
+#
+# Same rows (including timestamps late on the end date), but index-backed.
+# Bounds are always passed as params, never formatted into the SQL.
+
+
+def date_range_conditions(column, date_from=None, date_to=None):
+    """
+    Returns ([condition, ...], [param, ...]) for inclusive YYYY-MM-DD bounds.
+    Either bound may be None; both None returns two empty lists.
+    For code that collects a conditions list and joins it with AND.
+    """
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append(f"{column} >= %s::date")
+        params.append(str(date_from)[:10])
+    if date_to:
+        conditions.append(f"{column} < %s::date + 1")
+        params.append(str(date_to)[:10])
+    return conditions, params
+
+
+def date_range_sql(column, date_from=None, date_to=None):
+    """Same as date_range_conditions, as an " AND ..." fragment to append to an open WHERE."""
+    conditions, params = date_range_conditions(column, date_from, date_to)
+    return "".join(f" AND {condition}" for condition in conditions), params
+
+
+def on_date_sql(column, day):
+    """Single-day filter ("col on this date") → (sql, params) without a leading AND."""
+    conditions, params = date_range_conditions(column, day, day)
+    return " AND ".join(conditions), params
+
+
+def on_dates_sql(column, days):
+    """
+    "col falls on any of these dates" → (sql, params) without a leading AND.
+    The outer range lets the index narrow the scan; the ANY(...) check then
+    drops the days in between that weren't asked for.
+    """
+    normalized = sorted({str(day)[:10] for day in days if day})
+    if not normalized:
+        return "FALSE", []
+    conditions, params = date_range_conditions(column, normalized[0], normalized[-1])
+    conditions.append(f"{column}::date = ANY(%s::date[])")
+    params.append(normalized)
+    return " AND ".join(conditions), params
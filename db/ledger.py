@@ -0,0 +1,240 @@
+from datetime import date
+
+
+# ─────────────────────────────────────────────
+# INVENTORY TRANSACTIONS — INDEXES & PARTITIONING
+# ─────────────────────────────────────────────
+#
+# Access paths the app actually uses on the ledger:
+#   item_id + transaction_type       → stock sums, snapshot stock, rebuild_stock_balances
+#   transaction_type + date          → top sellers, daily/range reports, items-sold exports
+#   transaction_date                 → audit trail ordering, chart APIs, recent activity
+#   reference_type + reference_id    → PO edit/delete, sale details, audit joins to sales/POs
+#                                      (integer reference_id: compare it as an int, never CAST
+#                                      it to text, or the index can't be used)
+#
+# On a partitioned ledger these are created on the parent and cascade to
+# every monthly partition.
+
+INVENTORY_TRANSACTION_INDEXES = [
+    (
+        "idx_inv_tx_item_type",
+        "CREATE INDEX IF NOT EXISTS idx_inv_tx_item_type "
+        "ON inventory_transactions (item_id, transaction_type) "
+        "INCLUDE (quantity, transaction_date)",
+    ),
+    (
+        "idx_inv_tx_type_date",
+        "CREATE INDEX IF NOT EXISTS idx_inv_tx_type_date "
+        "ON inventory_transactions (transaction_type, transaction_date) "
+        "INCLUDE (item_id, quantity)",
+    ),
+    (
+        "idx_inv_tx_date",
+        "CREATE INDEX IF NOT EXISTS idx_inv_tx_date "
+        "ON inventory_transactions (transaction_date DESC)",
+    ),
+    (
+        "idx_inv_tx_reference",
+        "CREATE INDEX IF NOT EXISTS idx_inv_tx_reference "
+        "ON inventory_transactions (reference_type, reference_id, transaction_type) "
+        "INCLUDE (item_id, quantity, unit_price)",
+    ),
+]
+
+# How many future months init_db keeps pre-created on a partitioned ledger.
+PARTITION_MONTHS_AHEAD = 3
+
+
+def _upgrade_reference_index(cur):
+    """
+    idx_inv_tx_reference used to have no INCLUDE columns. Drop that version
+    so the loop below recreates it covering, and sale-detail lines become an
+    index-only scan. No-op once upgraded.
+    """
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_index
+            WHERE indexrelid = to_regclass('idx_inv_tx_reference')
+              AND indnatts = indnkeyatts
+        ) AS needs_upgrade
+    """)
+    if cur.fetchone()["needs_upgrade"]:
+        cur.execute("DROP INDEX idx_inv_tx_reference")
+
+
+def create_inventory_transaction_indexes(cur):
+    _upgrade_reference_index(cur)
+    for _, ddl in INVENTORY_TRANSACTION_INDEXES:
+        cur.execute(ddl)
+
+
+def is_inventory_transactions_partitioned(cur):
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_class
+            WHERE oid = to_regclass('inventory_transactions')
+              AND relkind = 'p'
+        ) AS is_partitioned
+    """)
+    return bool(cur.fetchone()["is_partitioned"])
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def _partition_name(month_start):
+    return f"inventory_transactions_{month_start.year}_{month_start.month:02d}"
+
+
+_DEFAULT_PARTITION = "inventory_transactions_default"
+
+
+def _create_month_partition(cur, month_start):
+    """
+    Creates one month's partition. Rows for that month that already landed in
+    the DEFAULT partition (dated past PARTITION_MONTHS_AHEAD) would make
+    CREATE ... PARTITION OF fail, so the default is detached, those rows are
+    moved into the new partition and the default is attached again.
+    """
+    name = _partition_name(month_start)
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AS has_partition", (name,))
+    if cur.fetchone()["has_partition"]:
+        return
+
+    bounds = (month_start.isoformat(), _next_month(month_start).isoformat())
+    create_sql = f"""
+        CREATE TABLE {name}
+        PARTITION OF inventory_transactions
+        FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')
+    """
+
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AS has_default", (_DEFAULT_PARTITION,))
+    has_rows = False
+    if cur.fetchone()["has_default"]:
+        cur.execute(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {_DEFAULT_PARTITION}
+                WHERE transaction_date >= %s AND transaction_date < %s
+            ) AS has_rows
+        """, bounds)
+        has_rows = cur.fetchone()["has_rows"]
+    if not has_rows:
+        cur.execute(create_sql)
+        return
+
+    cur.execute(f"ALTER TABLE inventory_transactions DETACH PARTITION {_DEFAULT_PARTITION}")
+    cur.execute(create_sql)
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {_DEFAULT_PARTITION}
+            WHERE transaction_date >= %s AND transaction_date < %s
+            RETURNING *
+        )
+        INSERT INTO inventory_transactions
+        SELECT * FROM moved
+    """, bounds)
+    print(f"⚠ Moved {cur.rowcount} ledger rows from {_DEFAULT_PARTITION} into {name}")
+    cur.execute(f"ALTER TABLE inventory_transactions ATTACH PARTITION {_DEFAULT_PARTITION} DEFAULT")
+
+
+def ensure_inventory_transaction_partitions(cur, months_ahead=PARTITION_MONTHS_AHEAD, start=None):
+    """
+    Pre-creates monthly partitions from `start` (default: this month) through
+    `months_ahead` months later. No-op when the ledger is not partitioned.
+    """
+    if not is_inventory_transactions_partitioned(cur):
+        return 0
+
+    month = _month_start(start or date.today())
+    last = _month_start(date.today())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+
+    created = 0
+    while month <= last:
+        _create_month_partition(cur, month)
+        month = _next_month(month)
+        created += 1
+    return created
+
+
+def partition_inventory_transactions(conn):
+    """
+    One-off conversion of a plain inventory_transactions table into a table
+    RANGE-partitioned by month on transaction_date. Runs in the caller's
+    transaction; the caller commits.
+
+    - Keeps the id sequence, so existing ids and reference links stay valid.
+    - Primary key becomes (id, transaction_date), as Postgres requires the
+      partition key in every unique constraint.
+    - transaction_date becomes NOT NULL (it is part of the key); legacy rows
+      without a date are stamped with the earliest ledger date.
+    - Dates outside the pre-created months land in the DEFAULT partition.
+    """
+    cur = conn.cursor()
+
+    if is_inventory_transactions_partitioned(cur):
+        cur.close()
+        return False
+
+    cur.execute("LOCK TABLE inventory_transactions IN ACCESS EXCLUSIVE MODE")
+
+    cur.execute("""
+        SELECT MIN(transaction_date)::date AS first_date
+        FROM inventory_transactions
+    """)
+    first_date = cur.fetchone()["first_date"] or date.today()
+
+    # The old table owns the id sequence; detach it so DROP TABLE keeps it.
+    cur.execute("ALTER SEQUENCE inventory_transactions_id_seq OWNED BY NONE")
+
+    cur.execute("""
+    CREATE TABLE inventory_transactions_partitioned (
+        id                  INTEGER NOT NULL DEFAULT nextval('inventory_transactions_id_seq'),
+        item_id             INTEGER NOT NULL REFERENCES items(id),
+        quantity            INTEGER NOT NULL,
+        transaction_type    TEXT CHECK(transaction_type IN ('IN', 'OUT', 'ORDER')),
+        transaction_date    TIMESTAMP NOT NULL DEFAULT NOW(),
+        user_id             INTEGER REFERENCES users(id),
+        user_name           TEXT,
+        unit_price          NUMERIC(12,2),
+        reference_id        INTEGER,
+        reference_type      TEXT,
+        change_reason       TEXT,
+        notes               TEXT,
+        PRIMARY KEY (id, transaction_date)
+    ) PARTITION BY RANGE (transaction_date)
+    """)
+
+    cur.execute("ALTER TABLE inventory_transactions RENAME TO inventory_transactions_old")
+    cur.execute("ALTER TABLE inventory_transactions_partitioned RENAME TO inventory_transactions")
+
+    cur.execute(f"""
+        CREATE TABLE {_DEFAULT_PARTITION}
+        PARTITION OF inventory_transactions DEFAULT
+    """)
+    ensure_inventory_transaction_partitions(cur, start=first_date)
+
+    cur.execute("""
+        INSERT INTO inventory_transactions
+        SELECT id, item_id, quantity, transaction_type,
+               COALESCE(transaction_date, %s::timestamp), user_id,
+               user_name, unit_price, reference_id, reference_type, change_reason, notes
+        FROM inventory_transactions_old
+    """, (first_date,))
+    moved = cur.rowcount
+
+    cur.execute("DROP TABLE inventory_transactions_old")
+    cur.execute("ALTER SEQUENCE inventory_transactions_id_seq OWNED BY inventory_transactions.id")
+    create_inventory_transaction_indexes(cur)
+
+    cur.close()
+    return moved
@@ -1,8 +1,12 @@
 ﻿from db.database import get_db, get_cursor
+from db.ledger import create_inventory_transaction_indexes, ensure_inventory_transaction_partitions
+from services.stock_service import rebuild_stock_balances
+from services.cash_service import rebuild_cash_daily_balances
+from services.sales_facts_service import rebuild_sales_facts
+from services.debt_service import rebuild_sale_balances
 
-def init_db():
-    conn = get_db()
-    cur = get_cursor(conn)
+def _create_baseline_schema(conn, cur):
+    """Migration 1: every table, index, backfill and seed that init_db used to run on each start."""
 
     # 1. USERS TABLE
     cur.execute("""
@@ -84,6 +88,9 @@ def init_db():
         created_at      TIMESTAMP DEFAULT NOW()
     )
     """)
+    # Customer directory keyset pages (services/customer_service.py DIRECTORY_SORTS)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_customers_active_name ON customers(is_active, customer_name, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_customers_active_created ON customers(is_active, created_at DESC, id DESC)")
 
     # 7. VEHICLES TABLE
     cur.execute("""
@@ -96,6 +103,7 @@ def init_db():
         updated_at  TIMESTAMP DEFAULT NOW()
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vehicles_customer ON vehicles(customer_id)")
 
     # 8. SALES TABLE
     # customer_id, vehicle_id, mechanic_id, service_fee, paid_at
@@ -141,6 +149,9 @@ def init_db():
         notes               TEXT
     )
     """)
+    # Covering indexes for stock sums, date-range reports, audit ordering and
+    # reference lookups (see db/ledger.py for the access path each one serves).
+    create_inventory_transaction_indexes(cur)
 
     # 10. SERVICES TABLE (The Master List of Labor Types)
     cur.execute("""
@@ -161,6 +172,7 @@ def init_db():
         price       NUMERIC(12,2) NOT NULL
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_services_sale ON sales_services(sale_id)")
 
     # 12. SALES ITEMS TABLE (Item-level sales & discounts)
     cur.execute("""
@@ -177,6 +189,13 @@ def init_db():
         created_at          TIMESTAMP DEFAULT NOW()
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_items_sale ON sales_items(sale_id)")
+    # Audit trail / sales admin "discounted sales only" filter (EXISTS per sale)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sales_items_discounted
+        ON sales_items(sale_id)
+        WHERE discount_percent > 0 OR discount_amount > 0
+    """)
 
     # 13. PURCHASE ORDERS (The Header)
     cur.execute("""
@@ -401,6 +420,9 @@ def init_db():
         stamped_at      TIMESTAMP DEFAULT NOW()
     )
     """)
+    # Balance lookups (services/loyalty_service.py) filter customer + program + period
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_loyalty_stamps_customer_program ON loyalty_stamps(customer_id, program_id, stamped_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_loyalty_stamps_sale ON loyalty_stamps(sale_id)")
 
     # 17. LOYALTY REDEMPTIONS TABLE
     # One row = one reward granted to a customer.
@@ -420,6 +442,7 @@ def init_db():
         redeemed_at         TIMESTAMP DEFAULT NOW()
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_loyalty_redemptions_customer_program ON loyalty_redemptions(customer_id, program_id, redeemed_at)")
 
     # 18. LOYALTY POINT RULES TABLE
     # Rules are evaluated in priority order for each sale.
@@ -459,6 +482,7 @@ def init_db():
     """)
     cur.execute("ALTER TABLE loyalty_point_ledger ADD COLUMN IF NOT EXISTS redemption_id INTEGER REFERENCES loyalty_redemptions(id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_lpl_customer ON loyalty_point_ledger(customer_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lpl_customer_program ON loyalty_point_ledger(customer_id, program_id, awarded_at)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_lpl_program ON loyalty_point_ledger(program_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_lpl_sale ON loyalty_point_ledger(sale_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_lpr_program_active ON loyalty_point_rules(program_id, is_active, priority)")
@@ -498,6 +522,15 @@ def init_db():
         created_at      TIMESTAMP DEFAULT NOW()
     )
     """)
+    # Cash ledger UNION ALL (services/cash_service.py) reads each source newest-first
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cash_entries_branch_created ON cash_entries(branch_id, created_at DESC, id DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_transaction_date ON sales(transaction_date DESC, id DESC)")
+    # Per-customer visit stats and history (customer directory / detail rows)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer_date ON sales(customer_id, transaction_date DESC, id DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_debt_payments_paid_at ON debt_payments(paid_at DESC, id DESC)")
+    # Date filters use half-open ranges on the raw column (db/filters.py), so
+    # plain timestamp indexes serve them; sales / debt_payments are covered above.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cash_entries_created_at ON cash_entries(created_at)")
 
     # 22. NOTIFICATIONS TABLE
     # One row per recipient user. This keeps unread/read state independent
@@ -646,6 +679,146 @@ def init_db():
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_approval_resubmission_changes_request ON approval_resubmission_changes(approval_request_id, approval_action_id)")
 
+    # 27. ITEM STOCK BALANCES
+    # Projection of inventory_transactions: one row per item so stock reads are
+    # a primary-key lookup instead of a SUM over the whole ledger.
+    # on_hand / total_in / total_out / last_movement_at are maintained by add_transaction.
+    # on_order is the outstanding qty on PENDING/PARTIAL POs, refreshed on PO changes.
+    # Rebuild / verify: python -m scripts.rebuild_stock_balances [--verify]
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS item_stock_balances (
+        item_id             INTEGER PRIMARY KEY REFERENCES items(id),
+        on_hand             INTEGER NOT NULL DEFAULT 0,
+        total_in            INTEGER NOT NULL DEFAULT 0,
+        total_out           INTEGER NOT NULL DEFAULT 0,
+        on_order            INTEGER NOT NULL DEFAULT 0,
+        last_movement_at    TIMESTAMP,
+        updated_at          TIMESTAMP DEFAULT NOW()
+    )
+    """)
+    # Per-item, per-day IN / OUT next to the balance row (dashboard charts).
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS item_daily_movements (
+        movement_date       DATE NOT NULL,
+        item_id             INTEGER NOT NULL REFERENCES items(id),
+        qty_in              INTEGER NOT NULL DEFAULT 0,
+        qty_out             INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (movement_date, item_id)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_item_daily_movements_item ON item_daily_movements(item_id, movement_date)")
+
+    # First run on an existing database: backfill the projection from the ledger
+    # (item_daily_movements was added later, so an empty one triggers it too).
+    cur.execute("""
+        SELECT EXISTS (SELECT 1 FROM item_stock_balances)
+           AND EXISTS (SELECT 1 FROM item_daily_movements) AS has_rows
+    """)
+    if not cur.fetchone()["has_rows"]:
+        rebuild_stock_balances(external_conn=conn)
+
+    # 28. SEARCH INDEXES (pg_trgm)
+    # GIN trigram indexes back the ranked autocomplete in services/search_service.py:
+    # ILIKE '%word%' and the word_similarity (<%) typo match both use them.
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_items_name_trgm ON items USING GIN (name gin_trgm_ops)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_items_description_trgm ON items USING GIN (description gin_trgm_ops)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_services_name_trgm ON services USING GIN (name gin_trgm_ops)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_services_category_trgm ON services USING GIN (category gin_trgm_ops)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_customers_name_trgm ON customers USING GIN (customer_name gin_trgm_ops)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_customers_no_trgm ON customers USING GIN (customer_no gin_trgm_ops)")
+
+    # 29. CASH DAILY BALANCES
+    # Per-branch, per-day physical cash rollup behind get_cash_summary.
+    # Maintained by record_sale, record_payment, add_cash_entry and delete_cash_entry.
+    # Rebuild: python -m scripts.rebuild_cash_balances
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cash_daily_balances (
+        branch_id           INTEGER NOT NULL DEFAULT 1,
+        balance_date        DATE NOT NULL,
+        sales_cash_in       NUMERIC(14,2) NOT NULL DEFAULT 0,
+        debt_cash_in        NUMERIC(14,2) NOT NULL DEFAULT 0,
+        manual_cash_in      NUMERIC(14,2) NOT NULL DEFAULT 0,
+        manual_cash_out     NUMERIC(14,2) NOT NULL DEFAULT 0,
+        updated_at          TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (branch_id, balance_date)
+    )
+    """)
+    cur.execute("SELECT EXISTS (SELECT 1 FROM cash_daily_balances) AS has_rows")
+    if not cur.fetchone()["has_rows"]:
+        rebuild_cash_daily_balances(external_conn=conn)
+
+    # 30. DAILY SALES FACTS (range reports)
+    # Paid-sale items / services / mechanic service revenue / payment-method
+    # totals per day, maintained by record_sale and record_payment.
+    # Rebuild: python -m scripts.rebuild_sales_facts
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_daily_item_facts (
+        fact_date           DATE NOT NULL,
+        item_id             INTEGER NOT NULL,
+        quantity            INTEGER NOT NULL DEFAULT 0,
+        amount              NUMERIC(14,2) NOT NULL DEFAULT 0,
+        updated_at          TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (fact_date, item_id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_daily_service_facts (
+        fact_date           DATE NOT NULL,
+        service_id          INTEGER NOT NULL,
+        quantity            INTEGER NOT NULL DEFAULT 0,
+        amount              NUMERIC(14,2) NOT NULL DEFAULT 0,
+        updated_at          TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (fact_date, service_id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_daily_mechanic_facts (
+        fact_date           DATE NOT NULL,
+        mechanic_id         INTEGER NOT NULL,
+        paid_services_total NUMERIC(14,2) NOT NULL DEFAULT 0,
+        debt_service_total  NUMERIC(14,2) NOT NULL DEFAULT 0,
+        updated_at          TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (fact_date, mechanic_id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_daily_payment_facts (
+        fact_date           DATE NOT NULL,
+        payment_method_id   INTEGER NOT NULL,
+        sale_count          INTEGER NOT NULL DEFAULT 0,
+        gross_amount        NUMERIC(14,2) NOT NULL DEFAULT 0,
+        debt_collected      NUMERIC(14,2) NOT NULL DEFAULT 0,
+        updated_at          TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (fact_date, payment_method_id)
+    )
+    """)
+    # First run on an existing database: backfill from the source tables.
+    cur.execute("SELECT EXISTS (SELECT 1 FROM sales_daily_payment_facts) AS has_rows")
+    if not cur.fetchone()["has_rows"]:
+        rebuild_sales_facts(external_conn=conn)
+
+    # 31. SALE BALANCES (debt / utang)
+    # One row per sale: amount paid so far, service total and the part of the
+    # payments that went to services. Written by record_sale, updated by
+    # record_payment, so debt pages don't re-sum debt_payments per sale.
+    # Rebuild / verify: python -m scripts.rebuild_sale_balances [--verify]
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sale_balances (
+        sale_id             INTEGER PRIMARY KEY REFERENCES sales(id) ON DELETE CASCADE,
+        amount_paid_total   NUMERIC(12,2) NOT NULL DEFAULT 0,
+        service_total       NUMERIC(12,2) NOT NULL DEFAULT 0,
+        service_paid_total  NUMERIC(12,2) NOT NULL DEFAULT 0,
+        updated_at          TIMESTAMP DEFAULT NOW()
+    )
+    """)
+    # Debt pages filter on status; the balance row is then a primary-key lookup
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_open_debts ON sales(transaction_date) WHERE status IN ('Unresolved', 'Partial')")
+    # First run on an existing database: backfill from the source tables.
+    cur.execute("SELECT EXISTS (SELECT 1 FROM sale_balances) AS has_rows")
+    if not cur.fetchone()["has_rows"]:
+        rebuild_sale_balances(external_conn=conn)
+
     # --- SEEDING ---
 
     # 1. Seed Services (Only if empty)
@@ -683,6 +856,90 @@ def init_db():
         for name, cat in payment_data:
             cur.execute("UPDATE payment_methods SET category = %s WHERE name = %s", (cat, name))
 
-    conn.commit()
-    cur.close()
-    conn.close()
+
+# ─────────────────────────────────────────────
+# SCHEMA MIGRATIONS
+# ─────────────────────────────────────────────
+#
+# Each step runs once, in its own transaction, and is recorded in
+# schema_migrations. On a database that is already current, init_db() is two
+# small catalog reads, with no DDL, backfills or table locks.
+#
+# To change the schema, append a step with the next version number. Never
+# edit or renumber a step that has already shipped.
+# Status / apply by hand: python -m scripts.migrate_schema [--status]
+
+MIGRATIONS = [
+    (1, "baseline schema, projections and seed data", _create_baseline_schema),
+]
+
+# pg_advisory_lock key: processes booting together apply migrations one at a time
+_MIGRATION_LOCK_KEY = 7_310_023
+
+
+def get_schema_version(cur):
+    """Highest applied migration version (0 on a database that predates the runner)."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS has_table")
+    if not cur.fetchone()["has_table"]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+    return cur.fetchone()["version"]
+
+
+def pending_migrations(cur):
+    current = get_schema_version(cur)
+    return [migration for migration in MIGRATIONS if migration[0] > current]
+
+
+def _apply_pending_migrations(conn, cur):
+    cur.execute("SELECT pg_advisory_lock(%s)", (_MIGRATION_LOCK_KEY,))
+    try:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            applied_at  TIMESTAMP DEFAULT NOW()
+        )
+        """)
+        conn.commit()
+
+        # Re-read under the lock: another process may have applied them meanwhile
+        applied = []
+        for version, name, step in pending_migrations(cur):
+            step(conn, cur)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+            conn.commit()
+            applied.append(version)
+            print(f"✅ Schema migration {version} applied: {name}")
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATION_LOCK_KEY,))
+        conn.commit()
+
+
+def init_db():
+    """
+    Brings the schema up to date: applies pending MIGRATIONS, then keeps the
+    upcoming monthly ledger partitions created (only if the ledger was
+    converted with python -m scripts.partition_inventory_transactions).
+    Returns the versions applied ([] when the schema was already current).
+    """
+    conn = get_db()
+    cur = get_cursor(conn)
+    try:
+        applied = _apply_pending_migrations(conn, cur) if pending_migrations(cur) else []
+        ensure_inventory_transaction_partitions(cur)
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
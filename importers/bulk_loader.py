@@ -0,0 +1,199 @@
+import csv
+import io
+import os
+import secrets
+from datetime import datetime
+
+
+# ─────────────────────────────────────────────
+# STREAMING CSV → COPY IMPORT ENGINE
+# ─────────────────────────────────────────────
+#
+# Shared by the items / sales / inventory importers:
+#   1. iter_csv_rows()   streams the upload line by line (never the whole file)
+#   2. the importer validates each row; rejects go to an ImportReport CSV on disk
+#   3. StagingLoader     COPYs accepted rows into a TEMP staging table in batches
+#   4. the importer runs ONE set-based INSERT/UPSERT from staging
+#
+# Memory stays bounded by BATCH_SIZE rows plus whatever lookup maps the
+# importer keeps (e.g. item names), regardless of file size.
+
+BATCH_SIZE = 5000
+IMPORT_REPORT_DIR = os.environ.get("IMPORT_REPORT_DIR", "import_reports")
+
+
+def is_csv_upload(file):
+    return bool(file and file.filename and file.filename.lower().endswith(".csv"))
+
+
+def normalize_header(text):
+    if not text:
+        return ""
+    return " ".join(text.replace("\ufeff", "").strip().lower().split())
+
+
+def _iter_text_lines(stream):
+    first = True
+    for raw_line in stream:
+        line = raw_line.decode("utf-8", errors="ignore")
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        yield line
+
+
+def iter_csv_rows(file, header_normalizer=normalize_header):
+    """
+    Yields (line_no, row_dict) with normalized header keys and stripped values.
+    line_no is the 1-based CSV data row number (header excluded).
+    """
+    reader = csv.reader(_iter_text_lines(file.stream))
+    headers = next(reader, None)
+    if headers is None:
+        return
+    keys = [header_normalizer(h) for h in headers]
+
+    for line_no, values in enumerate(reader, start=1):
+        if not any((v or "").strip() for v in values):
+            continue
+        row = {}
+        for key, value in zip(keys, values):
+            row[key] = value.strip() if isinstance(value, str) else value
+        yield line_no, row
+
+
+def parse_decimal(raw, default=None):
+    """'₱1,234.50' / '12%' / '' → float (or default)."""
+    if raw in (None, ""):
+        return default
+    cleaned = "".join(c for c in str(raw) if c.isdigit() or c in ".-")
+    if cleaned in ("", ".", "-", "-."):
+        return default
+    try:
+        return float(cleaned)
+    except ValueError:
+        return default
+
+
+def parse_int(raw, default=None):
+    value = parse_decimal(raw, None)
+    if value is None:
+        return default
+    return int(value)
+
+
+_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y",
+)
+
+
+def parse_timestamp(raw):
+    """Returns 'YYYY-MM-DD HH:MM:SS' or None if the value is not a recognizable date."""
+    value = (raw or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return None
+
+
+class ImportReport:
+    """
+    Per-row skip reasons, streamed to a CSV under IMPORT_REPORT_DIR.
+    The file is only created once the first row is skipped.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.skip_reasons = {}
+        self.skipped = 0
+        self.filename = None
+        self._handle = None
+        self._writer = None
+
+    def skip(self, line_no, reason, detail="", raw_value=""):
+        self.skipped += 1
+        self.skip_reasons[reason] = self.skip_reasons.get(reason, 0) + 1
+
+        if self._writer is None:
+            os.makedirs(IMPORT_REPORT_DIR, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.filename = f"{self.kind}_skipped_{stamp}_{secrets.token_hex(4)}.csv"
+            self._handle = open(
+                os.path.join(IMPORT_REPORT_DIR, self.filename), "w", newline="", encoding="utf-8"
+            )
+            self._writer = csv.writer(self._handle)
+            self._writer.writerow(["CSV Row", "Reason", "Detail", "Value"])
+
+        self._writer.writerow([line_no, reason, detail, raw_value])
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def report_path(filename):
+    """Absolute path for a report name, or None if it is not a report we wrote."""
+    safe_name = os.path.basename(filename or "")
+    if not safe_name or safe_name != filename or "_skipped_" not in safe_name:
+        return None
+    path = os.path.abspath(os.path.join(IMPORT_REPORT_DIR, safe_name))
+    return path if os.path.isfile(path) else None
+
+
+class StagingLoader:
+    """
+    Buffers rows and COPYs them into a TEMP staging table every BATCH_SIZE rows.
+
+    staging_ddl is the column list, e.g. "row_no INTEGER, item_id INTEGER".
+    The table is dropped automatically at commit / rollback.
+    """
+
+    def __init__(self, conn, table, staging_ddl, columns):
+        self.conn = conn
+        self.table = table
+        self.columns = columns
+        self.loaded = 0
+        self._buffer = []
+        conn.execute(f"CREATE TEMP TABLE {table} ({staging_ddl}) ON COMMIT DROP")
+
+    def add(self, values):
+        self._buffer.append(values)
+        if len(self._buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        payload = io.StringIO()
+        writer = csv.writer(payload)
+        for values in self._buffer:
+            # \N is COPY's NULL marker in CSV mode below
+            writer.writerow(["\\N" if v is None else v for v in values])
+        payload.seek(0)
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                payload,
+            )
+        finally:
+            cursor.close()
+
+        self.loaded += len(self._buffer)
+        self._buffer = []
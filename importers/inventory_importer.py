@@ -1,6 +1,13 @@
-import csv
-from datetime import datetime
 from db.database import get_db
+from services.stock_service import rebuild_stock_balances
+from services.catalogue_cache import get_item_name_rows
+from importers.bulk_loader import (
+    ImportReport,
+    StagingLoader,
+    is_csv_upload,
+    iter_csv_rows,
+    parse_int,
+)
 
 # 🔒 Single source of truth for this import
 BASELINE_SNAPSHOT_DATE = "2026-01-21 00:00:00"
@@ -19,103 +26,84 @@ def normalize_name(value: str) -> str:
 
 
 def import_inventory_csv(file):
-    if not file or not file.filename.endswith(".csv"):
+    if not is_csv_upload(file):
         return False, "Invalid file"
 
+    report = ImportReport("inventory")
     conn = get_db()
-    skipped_rows = []
 
-    # 🔹 Preload items (Inventory ID must match items.name)
-    items = conn.execute("SELECT id, name FROM items").fetchall()
-    item_lookup = {
-        normalize_name(item["name"]): item["id"]
-        for item in items
-    }
-
-    lines = file.stream.read().decode("utf-8", errors="ignore").splitlines()
-    reader = csv.DictReader(lines)
-
-    imported = 0
-    skipped = 0
-
-    skip_reasons = {
-        "missing_fields": 0,
-        "bad_quantity": 0,
-        "item_not_found": 0,
-        "zero_quantity": 0
-    }
-
-    for row in reader:
-        # Normalize headers
-        normalized = {k.strip().lower(): v for k, v in row.items()}
-
-        raw_item_name = normalized.get("inventory id") or ""
-        raw_qty = normalized.get("quantity on hand") or ""
-
-        item_name = normalize_name(raw_item_name)
-        qty_raw = raw_qty.strip()
-
-        # 1️⃣ Required fields
-        if not item_name or not qty_raw:
-            skipped += 1
-            skip_reasons["missing_fields"] += 1
-            continue
-
-        # 2️⃣ Clean quantity
-        try:
-            quantity = int(float(qty_raw.replace(",", "")))
-        except ValueError:
-            skipped += 1
-            skip_reasons["bad_quantity"] += 1
-            continue
-
-        # 3️⃣ Zero or negative stock → no baseline transaction
-        if quantity <= 0:
-            skipped += 1
-            skip_reasons["zero_quantity"] += 1
-            continue
-
-        # 4️⃣ STRICT item match (after whitespace normalization only)
-        item_id = item_lookup.get(item_name)
-        if not item_id:
-            skipped += 1
-            skip_reasons["item_not_found"] += 1
-            skipped_rows.append({
-                "inventory_id": raw_item_name,
-                "normalized_inventory_id": item_name,
-                "quantity_on_hand": qty_raw,
-                "reason": "Item not found in items table"
-            })
-            continue
-
-        # 5️⃣ Insert BASELINE stock as a single IN transaction
+    try:
+        # 🔹 Preload items (Inventory ID must match items.name)
+        items = get_item_name_rows(external_conn=conn)
+        item_lookup = {
+            normalize_name(item["name"]): item["id"]
+            for item in items
+        }
+
+        staging = StagingLoader(
+            conn,
+            "import_inventory_stage",
+            "item_id INTEGER, quantity INTEGER",
+            ["item_id", "quantity"],
+        )
+        touched_item_ids = set()
+
+        for line_no, row in iter_csv_rows(file):
+            raw_item_name = row.get("inventory id") or ""
+            qty_raw = row.get("quantity on hand") or ""
+
+            item_name = normalize_name(raw_item_name)
+
+            # 1️⃣ Required fields
+            if not item_name or not qty_raw:
+                report.skip(line_no, "missing_fields", "Inventory ID and Quantity On Hand are required", raw_item_name)
+                continue
+
+            # 2️⃣ Clean quantity
+            quantity = parse_int(qty_raw)
+            if quantity is None:
+                report.skip(line_no, "bad_quantity", "Quantity is not a number", qty_raw)
+                continue
+
+            # 3️⃣ Zero or negative stock → no baseline transaction
+            if quantity <= 0:
+                report.skip(line_no, "zero_quantity", "Zero or negative stock", qty_raw)
+                continue
+
+            # 4️⃣ STRICT item match (after whitespace normalization only)
+            item_id = item_lookup.get(item_name)
+            if not item_id:
+                report.skip(line_no, "item_not_found", "Item not found in items table", raw_item_name)
+                continue
+
+            staging.add([item_id, quantity])
+            touched_item_ids.add(item_id)
+
+        staging.flush()
+
+        # 5️⃣ Insert BASELINE stock as IN transactions, one set-based statement
         conn.execute("""
             INSERT INTO inventory_transactions
             (item_id, quantity, transaction_type, transaction_date)
-            VALUES (?, ?, 'IN', ?)
-        """, (
-            item_id,
-            quantity,
-            BASELINE_SNAPSHOT_DATE
-        ))
-
-        imported += 1
-
-    conn.commit()
-    conn.close()
-
-    if skipped_rows:
-        with open("skipped_inventory_rows.csv", "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=skipped_rows[0].keys()
-            )
-            writer.writeheader()
-            writer.writerows(skipped_rows)
+            SELECT item_id, quantity, 'IN', %s
+            FROM import_inventory_stage
+        """, (BASELINE_SNAPSHOT_DATE,))
+
+        # Raw ledger inserts bypass add_transaction, so resync the stock projection
+        rebuild_stock_balances(item_ids=touched_item_ids, external_conn=conn)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        report.close()
 
     return True, {
-        "imported": imported,
-        "skipped": skipped,
-        "skip_reasons": skip_reasons,
+        "imported": staging.loaded,
+        "skipped": report.skipped,
+        "skip_reasons": report.skip_reasons,
+        "report_file": report.filename,
         "snapshot_date": BASELINE_SNAPSHOT_DATE
     }
@@ -1,60 +1,84 @@
-import csv
 from db.database import get_db
+from services.catalogue_cache import invalidate_item_catalogue, notify_item_catalogue_changed
+from importers.bulk_loader import (
+    ImportReport,
+    StagingLoader,
+    is_csv_upload,
+    iter_csv_rows,
+    parse_decimal,
+    parse_int,
+)
 
 def normalize_header(text):
     if not text:
         return ""
-    return (
-        text.strip()
+    return " ".join(
+        text.replace("\ufeff", "")
+            .strip()
             .lower()
             .replace("%", "")
             .replace("/", " ")
             .replace("-", " ")
             .replace("_", " ")
+            .split()
     )
 
 def import_items_csv(file):
-    if not file or not file.filename.endswith(".csv"):
-        return False
+    """
+    Upserts the item master list (matched on name).
+    Rows stream into a COPY staging table; one INSERT ... ON CONFLICT applies them.
+    If a name appears more than once in the file, the last row wins.
+    """
+    if not is_csv_upload(file):
+        return False, "Invalid file"
 
+    report = ImportReport("items")
     conn = get_db()
 
-    lines = file.stream.read().decode("utf-8", errors="ignore").splitlines()
-    reader = csv.DictReader(lines)
+    try:
+        staging = StagingLoader(
+            conn,
+            "import_items_stage",
+            """
+                row_no            INTEGER,
+                name              TEXT,
+                description       TEXT,
+                pack_size         TEXT,
+                vendor_price      NUMERIC(12,2),
+                cost_per_piece    NUMERIC(12,2),
+                a4s_selling_price NUMERIC(12,2),
+                markup            NUMERIC(12,4),
+                category          TEXT,
+                reorder_level     INTEGER
+            """,
+            [
+                "row_no", "name", "description", "pack_size", "vendor_price",
+                "cost_per_piece", "a4s_selling_price", "markup", "category", "reorder_level",
+            ],
+        )
 
-    # Normalize headers
-    reader.fieldnames = [normalize_header(h) for h in reader.fieldnames]
+        for line_no, row in iter_csv_rows(file, header_normalizer=normalize_header):
+            name = row.get("name") or ""
+            if not name:
+                report.skip(line_no, "missing_name", "Name is required")
+                continue
 
-    imported = 0
-    skipped = 0
-
-    for row in reader:
-        # Clean row keys and values
-        row = {
-            normalize_header(k): (v.strip() if isinstance(v, str) else v)
-            for k, v in row.items()
-        }
-
-        def get_value(key, default=None, cast=str):
-            raw = row.get(key)
-            if raw in (None, ""):
-                return default
-            try:
-                if cast == float:
-                    raw = str(raw).replace("%", "")
-                    raw = "".join(c for c in raw if c.isdigit() or c in ".-")
-                return cast(raw)
-            except:
-                return default
-
-        name = get_value("name", "", str)
+            staging.add([
+                line_no,
+                name,
+                row.get("description") or "",
+                row.get("pack size") or "",
+                parse_decimal(row.get("vendor price pc"), 0.0),
+                parse_decimal(row.get("cost per piece"), 0.0),
+                parse_decimal(row.get("a4s selling price"), 0.0),
+                parse_decimal(row.get("mark up"), 0.0) / 100,  # store as decimal
+                row.get("pms acc svc") or "",
+                parse_int(row.get("minimum inv level"), 0),
+            ])
 
-        if not name:
-            skipped += 1
-            continue
+        staging.flush()
 
-        # Using ON CONFLICT (Upsert) logic
-        conn.execute("""
+        result = conn.execute("""
             INSERT INTO items (
                 name,
                 description,
@@ -66,7 +90,11 @@ def import_items_csv(file):
                 category,
                 reorder_level
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            SELECT DISTINCT ON (name)
+                name, description, pack_size, vendor_price, cost_per_piece,
+                a4s_selling_price, markup, category, reorder_level
+            FROM import_items_stage
+            ORDER BY name, row_no DESC
             ON CONFLICT(name) DO UPDATE SET
                 description = excluded.description,
                 pack_size = excluded.pack_size,
@@ -76,22 +104,25 @@ def import_items_csv(file):
                 markup = excluded.markup,
                 category = excluded.category,
                 reorder_level = excluded.reorder_level
-        """, (
-            name,
-            get_value("description", "", str),
-            get_value("pack size", "", str),
-            get_value("vendor price pc", 0.0, float),
-            get_value("cost per piece", 0.0, float),
-            get_value("a4s selling price", 0.0, float),
-            get_value("mark up", 0.0, float) / 100,  # store as decimal
-            get_value("pms acc svc", "", str),
-            get_value("minimum inv level", 0, int),
-        ))
+        """)
+        upserted = result.rowcount
 
-        imported += 1
+        notify_item_catalogue_changed(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        report.close()
 
-    conn.commit()
-    conn.close()
+    invalidate_item_catalogue()
 
-    print(f"Items import complete. Processed: {imported}, Skipped: {skipped}")
-    return True
\ No newline at end of file
+    print(f"Items import complete. Processed: {staging.loaded}, Upserted: {upserted}, Skipped: {report.skipped}")
+    return True, {
+        "imported": staging.loaded,
+        "upserted": upserted,
+        "skipped": report.skipped,
+        "skip_reasons": report.skip_reasons,
+        "report_file": report.filename,
+    }
@@ -1,103 +1,117 @@
-import csv
 import difflib
 from db.database import get_db
+from services.stock_service import rebuild_stock_balances
+from services.catalogue_cache import get_item_name_rows
+from importers.bulk_loader import (
+    ImportReport,
+    StagingLoader,
+    is_csv_upload,
+    iter_csv_rows,
+    parse_int,
+    parse_timestamp,
+)
 
 def import_sales_csv(file):
-    if not file or not file.filename.endswith(".csv"):
+    """
+    Imports historical sales as OUT ledger rows.
+    Rows stream into a COPY staging table and land in inventory_transactions
+    with one INSERT ... SELECT; rejected rows go to a downloadable skip report.
+    """
+    if not is_csv_upload(file):
         return False, "Invalid file"
 
+    report = ImportReport("sales")
     conn = get_db()
 
-    lines = file.stream.read().decode("utf-8", errors="ignore").splitlines()
-    reader = csv.DictReader(lines)
-
-    imported = 0
-    skipped = 0
-
-    skip_reasons = {
-        "non_inventory_sale": 0,
-        "missing_fields": 0,
-        "bad_quantity": 0,
-        "item_not_found": 0,
-        "other": 0
-    }
-
-    skipped_rows = []
-
-    items = conn.execute("SELECT id, name FROM items").fetchall()
-    item_lookup = {
-        item["name"].strip().lower(): item["id"]
-        for item in items
-    }
-
-    def find_item_id(item_name):
-        key = item_name.strip().lower()
-
-        if key in item_lookup:
-            return item_lookup[key]
-
-        matches = difflib.get_close_matches(
-            key,
-            item_lookup.keys(),
-            n=1,
-            cutoff=0.85
+    try:
+        items = get_item_name_rows(external_conn=conn)
+        item_lookup = {
+            item["name"].strip().lower(): item["id"]
+            for item in items
+        }
+        # Fuzzy matching is the slow part; sales files repeat the same part numbers a lot
+        match_cache = {}
+
+        def find_item_id(item_name):
+            key = item_name.strip().lower()
+
+            if key in item_lookup:
+                return item_lookup[key]
+            if key in match_cache:
+                return match_cache[key]
+
+            matches = difflib.get_close_matches(
+                key,
+                item_lookup.keys(),
+                n=1,
+                cutoff=0.85
+            )
+            match_cache[key] = item_lookup[matches[0]] if matches else None
+            return match_cache[key]
+
+        staging = StagingLoader(
+            conn,
+            "import_sales_stage",
+            "item_id INTEGER, quantity INTEGER, transaction_date TIMESTAMP",
+            ["item_id", "quantity", "transaction_date"],
         )
-        return item_lookup[matches[0]] if matches else None
+        touched_item_ids = set()
 
-    for row in reader:
-        try:
-            normalized = {k.strip().lower(): v for k, v in row.items()}
-
-            sales_type = (normalized.get("sales type") or "").strip().lower()
+        for line_no, row in iter_csv_rows(file):
+            sales_type = (row.get("sales type") or "").lower()
             if sales_type != "inventory":
-                skip_reasons["non_inventory_sale"] += 1
-                skipped += 1
+                report.skip(line_no, "non_inventory_sale", "Sales type is not Inventory", row.get("sales type") or "")
                 continue
 
-            item_name = (normalized.get("part number") or "").strip()
-            qty_raw = normalized.get("qty pc")
-            date_raw = normalized.get("tr date")
+            item_name = row.get("part number") or ""
+            qty_raw = row.get("qty pc") or ""
+            date_raw = row.get("tr date") or ""
 
             if not item_name or not qty_raw or not date_raw:
-                skip_reasons["missing_fields"] += 1
-                skipped += 1
+                report.skip(line_no, "missing_fields", "Part Number, Qty PC and TR Date are required", item_name)
                 continue
 
-            try:
-                quantity = int(float(qty_raw))
-            except:
-                skip_reasons["bad_quantity"] += 1
-                skipped += 1
+            quantity = parse_int(qty_raw)
+            if quantity is None or quantity <= 0:
+                report.skip(line_no, "bad_quantity", "Quantity must be a positive number", qty_raw)
                 continue
 
-            if quantity <= 0:
-                skip_reasons["bad_quantity"] += 1
-                skipped += 1
+            transaction_date = parse_timestamp(date_raw)
+            if not transaction_date:
+                report.skip(line_no, "bad_date", "Unrecognized TR Date", date_raw)
                 continue
 
             item_id = find_item_id(item_name)
             if not item_id:
-                skip_reasons["item_not_found"] += 1
-                skipped += 1
+                report.skip(line_no, "item_not_found", "No matching item name", item_name)
                 continue
 
-            conn.execute("""
-                INSERT INTO inventory_transactions
-                (item_id, quantity, transaction_type, transaction_date)
-                VALUES (?, ?, 'OUT', ?)
-            """, (item_id, quantity, date_raw))
+            staging.add([item_id, quantity, transaction_date])
+            touched_item_ids.add(item_id)
+
+        staging.flush()
 
-            imported += 1
+        conn.execute("""
+            INSERT INTO inventory_transactions
+            (item_id, quantity, transaction_type, transaction_date)
+            SELECT item_id, quantity, 'OUT', transaction_date
+            FROM import_sales_stage
+        """)
 
-        except Exception as e:
-            skip_reasons["other"] += 1
-            skipped += 1
+        # Raw ledger inserts bypass add_transaction, so resync the stock projection
+        rebuild_stock_balances(item_ids=touched_item_ids, external_conn=conn)
 
-    conn.commit()
-    conn.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        report.close()
 
     return True, {
-        "imported": imported,
-        "skipped": skipped,
-        "skip_reasons": skip_reasons
+        "imported": staging.loaded,
+        "skipped": report.skipped,
+        "skip_reasons": report.skip_reasons,
+        "report_file": report.filename,
     }
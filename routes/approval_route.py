@@ -1,20 +1,22 @@
 from flask import Blueprint, jsonify, request, session
 
 from auth.utils import admin_required, login_required
-from services.approval_service import (
-    approve_request,
-    cancel_request,
-    get_approval_request,
-    get_approval_request_with_history,
-    list_approval_requests,
-    resubmit_request,
-    request_revisions,
-)
-from services.transactions_service import (
-    approve_purchase_order,
-    cancel_purchase_order,
-    request_po_revisions,
-)
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_approvals = lazy_module("services.approval_service")
+approve_request = _approvals.approve_request
+cancel_request = _approvals.cancel_request
+get_approval_request = _approvals.get_approval_request
+get_approval_request_with_history = _approvals.get_approval_request_with_history
+list_approval_requests = _approvals.list_approval_requests
+resubmit_request = _approvals.resubmit_request
+request_revisions = _approvals.request_revisions
+
+_transactions = lazy_module("services.transactions_service")
+approve_purchase_order = _transactions.approve_purchase_order
+cancel_purchase_order = _transactions.cancel_purchase_order
+request_po_revisions = _transactions.request_po_revisions
 
 approval_bp = Blueprint("approval", __name__)
 
@@ -12,7 +12,11 @@ from services.cash_service import (
     CASH_IN_CATEGORIES,
     CASH_OUT_CATEGORIES,
 )
-from services.reports_service import get_mechanic_payouts_for_dates
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_reports = lazy_module("services.reports_service")
+get_mechanic_payouts_for_dates = _reports.get_mechanic_payouts_for_dates
 
 cash_bp = Blueprint('cash', __name__)
 LEDGER_PAGE_SIZE = 20
@@ -206,20 +210,30 @@ def cash_ledger_api():
     page = max(1, min(page, total_pages))
     offset = (page - 1) * LEDGER_PAGE_SIZE
 
-    entries = get_cash_entries(
-        branch_id=branch_id,
-        limit=LEDGER_PAGE_SIZE,
-        offset=offset,
-        entry_type=entry_type,
-        start_date=start_date,
-        end_date=end_date,
-    )
+    # Keyset paging: "cursor" is the next_cursor of the previous page, so a
+    # "Next" click never has to skip rows with OFFSET.
+    cursor = request.args.get("cursor") or None
+
+    try:
+        entries, next_cursor = get_cash_entries(
+            branch_id=branch_id,
+            limit=LEDGER_PAGE_SIZE,
+            offset=offset,
+            entry_type=entry_type,
+            start_date=start_date,
+            end_date=end_date,
+            after_cursor=cursor,
+            with_cursor=True,
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
     start_entry = offset + 1 if total_entries else 0
     end_entry = offset + len(entries)
 
     return jsonify({
         "entries": entries,
+        "next_cursor": next_cursor,
         "page": page,
         "total_pages": total_pages,
         "total_entries": total_entries,
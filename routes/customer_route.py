@@ -1,12 +1,18 @@
 from flask import Blueprint, request, jsonify, render_template
 from db.database import get_db
 from utils.formatters import format_date
-from services.loyalty_service import (
-    get_customer_loyalty_summary,
-    get_customer_eligibility_bulk,
-    get_customer_earn_only_bulk,
-    get_customer_points_bulk,
+from services.search_service import build_search_clause, set_similarity_threshold
+from services.customer_service import (
+    CUSTOMER_PAGE_SIZE,
+    get_customer_directory_page,
+    get_customer_history,
+    get_loyalty_previews,
 )
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_loyalty = lazy_module("services.loyalty_service")
+get_customer_loyalty_summary = _loyalty.get_customer_loyalty_summary
 
 customer_bp = Blueprint('customer', __name__)
 
@@ -20,15 +26,21 @@ def search_customers():
     if not query:
         return jsonify({"customers": []})
 
+    # Ranked, typo-tolerant match on name / customer no. (pg_trgm)
+    where_sql, where_params, order_sql, order_params = build_search_clause(
+        query, ["customer_name", "customer_no"]
+    )
+
     conn = get_db()
-    rows = conn.execute("""
+    set_similarity_threshold(conn)
+    rows = conn.execute(f"""
         SELECT id, customer_no, customer_name
         FROM customers
-        WHERE (customer_no ILIKE %s OR customer_name ILIKE %s)
+        WHERE {where_sql}
         AND is_active = 1
-        ORDER BY customer_name ASC
+        ORDER BY {order_sql}, customer_name ASC
         LIMIT 10
-    """, (f'%{query}%', f'%{query}%')).fetchall()
+    """, where_params + order_params).fetchall()
     conn.close()
 
     return jsonify({"customers": [dict(r) for r in rows]})
@@ -152,105 +164,43 @@ def add_customer_vehicle(customer_id):
 # ─────────────────────────────────────────────
 @customer_bp.route("/customers")
 def customer_list():
-    conn = get_db()
+    search = request.args.get("q", "").strip() or None
+    sort = request.args.get("sort", "name")
+    cursor = request.args.get("cursor") or None
 
-    customers = conn.execute("""
-        SELECT
-            c.id,
-            c.customer_no,
-            c.customer_name,
-            c.created_at,
-            COUNT(s.id) AS total_visits,
-            MAX(s.transaction_date) AS last_visit,
-            (
-                SELECT STRING_AGG(v2.vehicle_name::text, ', ' ORDER BY v2.vehicle_name)
-                FROM vehicles v2
-                WHERE v2.customer_id = c.id
-            ) AS vehicles
-        FROM customers c
-        LEFT JOIN sales s ON s.customer_id = c.id
-        WHERE c.is_active = 1
-        GROUP BY c.id
-        ORDER BY c.customer_name ASC
-    """).fetchall()
-
-    customer_ids = [int(c["id"]) for c in customers]
-    loyalty_by_customer = get_customer_eligibility_bulk(customer_ids)
-    earn_only_by_customer = get_customer_earn_only_bulk(customer_ids)
-    points_by_customer = get_customer_points_bulk(customer_ids)
-
-    customers_with_loyalty = []
-    for c in customers:
-        c_dict = dict(c)
-        c_dict["last_visit_display"] = format_date(c_dict["last_visit"])
-        c_dict["loyalty_points"] = int(points_by_customer.get(int(c_dict["id"]), 0) or 0)
-
-        loyalty_programs = loyalty_by_customer.get(int(c_dict["id"]), [])
-        earn_only_programs = earn_only_by_customer.get(int(c_dict["id"]), [])
-        preview_programs = []
-        for program in loyalty_programs:
-            stamp_count = int(program.get("stamp_count", 0) or 0)
-            threshold = int(program.get("threshold", 0) or 0)
-            progress_current = int(program.get("progress_current", stamp_count) or 0)
-            progress_threshold = int(program.get("progress_threshold", threshold) or 0)
-            progress_unit = str(program.get("progress_unit") or "stamps")
-            preview_programs.append({
-                "program_id": program["program_id"],
-                "name": program["name"],
-                "program_type": program.get("program_type"),
-                "stamp_count": stamp_count,
-                "threshold": threshold,
-                "points_balance": int(program.get("points_balance", 0) or 0),
-                "points_threshold": int(program.get("points_threshold", 0) or 0),
-                "reward_basis": program.get("reward_basis", "STAMPS"),
-                "progress_current": progress_current,
-                "progress_threshold": progress_threshold,
-                "progress_unit": progress_unit,
-                "remaining": max(0, threshold - stamp_count),
-                "progress_remaining": int(program.get("progress_remaining", 0) or 0),
-                "is_eligible": bool(program.get("is_eligible")),
-                "redemption_count": int(program.get("redemption_count", 0) or 0),
-                "pct": (
-                    min(100, int((min(progress_current, progress_threshold) / progress_threshold * 100)))
-                    if progress_threshold > 0 else 0
-                ),
-            })
-        for program in earn_only_programs:
-            points_balance = int(program.get("points_balance", 0) or 0)
-            stamp_count = int(program.get("stamp_count", 0) or 0)
-            progress_unit = "points" if bool(program.get("points_enabled")) else "stamps"
-            progress_current = points_balance if progress_unit == "points" else stamp_count
-            preview_programs.append({
-                "program_id": program["program_id"],
-                "name": program["name"],
-                "program_type": program.get("program_type"),
-                "stamp_count": stamp_count,
-                "threshold": 0,
-                "points_balance": points_balance,
-                "points_threshold": 0,
-                "reward_basis": "POINTS",
-                "progress_current": progress_current,
-                "progress_threshold": 0,
-                "progress_unit": progress_unit,
-                "remaining": 0,
-                "progress_remaining": 0,
-                "is_eligible": False,
-                "is_earn_only": True,
-                "redemption_count": 0,
-                "pct": 0,
-            })
-
-        c_dict["loyalty_preview"] = {
-            "has_programs": bool(preview_programs),
-            "programs": preview_programs
-        }
-
-        customers_with_loyalty.append(c_dict)
-
-    customers = customers_with_loyalty
+    try:
+        page = get_customer_directory_page(search=search, sort=sort, after_cursor=cursor)
+    except ValueError:
+        # Stale / hand-edited cursor → start over from the first page
+        page = get_customer_directory_page(search=search, sort=sort)
+        cursor = None
+
+    return render_template(
+        "customers/customers_list.html",
+        customers=page["customers"],
+        total_customers=page["total"],
+        next_cursor=page["next_cursor"],
+        is_first_page=cursor is None,
+        search=page["search"],
+        sort=page["sort"],
+    )
 
-    conn.close()
-    return render_template("customers/customers_list.html", customers=customers)
+
+# ─────────────────────────────────────────────
+# API: Loyalty previews for the visible page
+# ─────────────────────────────────────────────
+@customer_bp.route("/api/customers/loyalty-previews")
+def customer_loyalty_previews():
+    try:
+        customer_ids = [int(cid) for cid in request.args.get("ids", "").split(",") if cid.strip()]
+    except ValueError:
+        return jsonify({"error": "Invalid customer ids"}), 400
+
+    if len(customer_ids) > CUSTOMER_PAGE_SIZE:
+        return jsonify({"error": f"At most {CUSTOMER_PAGE_SIZE} customers per request"}), 400
+
+    previews = get_loyalty_previews(customer_ids)
+    return jsonify({"previews": {str(cid): preview for cid, preview in previews.items()}})
 
 
 # ─────────────────────────────────────────────
@@ -258,91 +208,39 @@ def customer_list():
 # ─────────────────────────────────────────────
 @customer_bp.route("/api/customers/<int:customer_id>/transactions")
 def customer_transactions(customer_id):
-    conn = get_db()
+    """
+    Newest HISTORY_PAGE_SIZE sales with their lines and stamps. Pass the
+    returned next_cursor as ?cursor= to load older ones; the customer header
+    and loyalty summary only come with the first page.
+    """
+    cursor = request.args.get("cursor") or None
+
+    try:
+        transactions, next_cursor = get_customer_history(customer_id, after_cursor=cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    if cursor:
+        return jsonify({"transactions": transactions, "next_cursor": next_cursor})
+
+    conn = get_db()
     customer = conn.execute("""
         SELECT id, customer_no, customer_name, created_at
         FROM customers WHERE id = %s
     """, (customer_id,)).fetchone()
+    conn.close()
 
     if not customer:
         return jsonify({"error": "Customer not found"}), 404
 
-    sales = conn.execute("""
-        SELECT
-            s.id,
-            s.sales_number,
-            s.transaction_date,
-            s.total_amount,
-            s.status,
-            v.vehicle_name,
-            pm.name AS payment_method
-        FROM sales s
-        LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-        LEFT JOIN vehicles v ON v.id = s.vehicle_id
-        WHERE s.customer_id = %s
-        ORDER BY s.transaction_date DESC
-    """, (customer_id,)).fetchall()
-
-    loyalty_stamps_by_sale = {}
-    stamp_rows = conn.execute("""
-        SELECT
-            ls.sale_id,
-            lp.name AS program_name,
-            ls.redemption_id
-        FROM loyalty_stamps ls
-        JOIN loyalty_programs lp ON lp.id = ls.program_id
-        WHERE ls.customer_id = %s
-        ORDER BY ls.stamped_at ASC
-    """, (customer_id,)).fetchall()
-
-    for row in stamp_rows:
-        stamp_list = loyalty_stamps_by_sale.setdefault(row["sale_id"], [])
-        stamp_list.append({
-            "program_name": row["program_name"],
-            "is_active": row["redemption_id"] is None
-        })
-
-    result = []
-    for sale in sales:
-        # Get services for this sale
-        services = conn.execute("""
-            SELECT sv.name, ss.price
-            FROM sales_services ss
-            JOIN services sv ON sv.id = ss.service_id
-            WHERE ss.sale_id = %s
-        """, (sale['id'],)).fetchall()
-
-        # Get items for this sale
-        items = conn.execute("""
-            SELECT i.name, si.quantity, si.final_unit_price
-            FROM sales_items si
-            JOIN items i ON i.id = si.item_id
-            WHERE si.sale_id = %s
-        """, (sale['id'],)).fetchall()
-
-        result.append({
-            "id": sale['id'],
-            "sales_number": sale['sales_number'],
-            "transaction_date": format_date(sale['transaction_date']),
-            "total_amount": sale['total_amount'],
-            "status": sale['status'],
-            "vehicle_name": sale['vehicle_name'],
-            "payment_method": sale['payment_method'],
-            "loyalty_stamps": loyalty_stamps_by_sale.get(sale['id'], []),
-            "services": [dict(s) for s in services],
-            "items": [dict(i) for i in items],
-        })
-
     loyalty_summary = get_customer_loyalty_summary(customer_id)
 
-    conn.close()
     return jsonify({
         "customer": {
             **dict(customer),
             "created_at_display": format_date(customer["created_at"])
         },
-        "transactions": result,
+        "transactions": transactions,
+        "next_cursor": next_cursor,
         "loyalty_summary": loyalty_summary,
     })
-
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, session, flash
 from services.debt_service import get_all_debts, get_debt_detail, record_payment
 from db.database import get_db
+from db.filters import date_range_sql
 
 debt_bp = Blueprint('debt', __name__)
 
@@ -127,7 +128,7 @@ def debt_audit_api():
 def debt_summary_api():
     """
     Returns all debt-originated sales with accurate server-side totals.
-    - Uses LEFT JOIN so zero-payment Unresolved sales appear too
+    - Paid totals come from sale_balances (no re-summing of debt_payments)
     - Filters by date range if start_date / end_date query params are provided
     - Status is computed from math, not from sales.status column, so it's always accurate
     NOTE (future branches): add branch_id filter here when ready.
@@ -146,9 +147,9 @@ def debt_summary_api():
             s.customer_name,
             s.total_amount,
             s.transaction_date,
-            COALESCE(SUM(dp.amount_paid), 0) AS total_paid
+            COALESCE(b.amount_paid_total, 0) AS total_paid
         FROM sales s
-        LEFT JOIN debt_payments dp ON dp.sale_id = s.id
+        LEFT JOIN sale_balances b ON b.sale_id = s.id
         WHERE s.payment_method_id IN (
             SELECT id FROM payment_methods WHERE category = 'Debt'
         )
@@ -156,15 +157,11 @@ def debt_summary_api():
 
     params = []
 
-    if start_date:
-        query += " AND DATE(s.transaction_date) >= %s"
-        params.append(start_date)
+    date_sql, date_params = date_range_sql("s.transaction_date", start_date, end_date)
+    query += date_sql
+    params.extend(date_params)
 
-    if end_date:
-        query += " AND DATE(s.transaction_date) <= %s"
-        params.append(end_date)
-
-    query += " GROUP BY s.id ORDER BY s.transaction_date DESC"
+    query += " ORDER BY s.transaction_date DESC"
 
     rows = conn.execute(query, params).fetchall()
     conn.close()
@@ -5,11 +5,14 @@ from datetime import datetime
 from utils.formatters import format_date, norm_text
 from services.audit_service import get_audit_trail
 from services.sales_admin_service import get_sales_paginated
+from services.catalogue_cache import get_cached_item
 from auth.utils import (
     clear_failed_login_attempts,
     ensure_authenticated_user,
+    invalidate_cached_user,
     is_login_rate_limited,
     login_required,
+    notify_user_changed,
     register_failed_login_attempt,
 )
 
@@ -94,11 +97,14 @@ def manage_users():
         current_admin_id = session.get("user_id") 
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         try:
-            conn.execute("""
+            new_user = conn.execute("""
                 INSERT INTO users (username, password_hash, role, created_at, created_by)
                 VALUES (%s, %s, 'staff', %s, %s)
-            """, (username, generate_password_hash(password), now, current_admin_id))
+                RETURNING id
+            """, (username, generate_password_hash(password), now, current_admin_id)).fetchone()
+            notify_user_changed(conn, new_user["id"])
             conn.commit()
+            invalidate_cached_user(new_user["id"])
             flash(f"Account for {username} created successfully!", "success")
             return redirect(url_for('auth.manage_users'))
         except Exception as e:
@@ -157,7 +163,9 @@ def toggle_user(user_id):
         "UPDATE users SET is_active = %s WHERE id = %s",
         (new_status, user_id)
     )
+    notify_user_changed(conn, user_id)
     conn.commit()
+    invalidate_cached_user(user_id)
 
     # 🔔 Alerts
     if new_status == 0:
@@ -228,7 +236,7 @@ def toggle_mechanic(mechanic_id):
     return redirect(url_for('auth.manage_users', tab='mechanics-tab'))
 
 # --- NEW ROUTE: Get Sale Details for the Modal ---
-@auth_bp.route("/sales/details/<reference_id>")
+@auth_bp.route("/sales/details/<int:reference_id>")
 def sale_details(reference_id):
     conn = get_db()
     try:
@@ -255,9 +263,9 @@ def sale_details(reference_id):
             FROM inventory_transactions t
             JOIN items i ON t.item_id = i.id
             LEFT JOIN sales_items si ON (t.reference_id = si.sale_id AND t.item_id = si.item_id)
-            WHERE CAST(t.reference_id AS TEXT) = %s 
-            AND t.reference_type = 'SALE'
-        """, (str(reference_id),)).fetchall()
+            WHERE t.reference_type = 'SALE'
+            AND t.reference_id = %s
+        """, (reference_id,)).fetchall()
 
         # 3. Fetch Services
         services = conn.execute("""
@@ -421,7 +429,10 @@ def toggle_payment_method(pm_id):
 def audit_trail_api():
     """
     Paginated, filterable audit trail for the admin panel.
-    Query params: page, start_date, end_date, type (IN/OUT/ORDER)
+    Query params: page, cursor, start_date, end_date, type (IN/OUT/ORDER)
+
+    "cursor" is the next_cursor of the previous page (keyset paging); "page"
+    is still sent so the response can label it.
     """
     try:
         page          = int(request.args.get("page", 1))
@@ -435,6 +446,7 @@ def audit_trail_api():
             return jsonify({"error": "Invalid movement type"}), 400
 
         has_discount = _to_bool(request.args.get("has_discount"))
+        cursor       = request.args.get("cursor") or None
 
         data = get_audit_trail(
             page=page,
@@ -442,9 +454,12 @@ def audit_trail_api():
             end_date=end_date,
             movement_type=movement_type,
             has_discount=has_discount,
+            after_cursor=cursor,
         )
         return jsonify(data)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -471,25 +486,20 @@ def admin_sales_api():
     
 @auth_bp.route("/api/item/<int:item_id>")
 def get_item_details(item_id):
-    conn = get_db()
     try:
-        item = conn.execute("""
-            SELECT i.name, i.category, i.description, i.pack_size,
-                vendor_price, cost_per_piece, a4s_selling_price,
-                markup, reorder_level,
-                COALESCE(v.vendor_name, i.vendor) AS vendor,
-                i.vendor_id
-            FROM items i
-            LEFT JOIN vendors v ON v.id = i.vendor_id
-            WHERE i.id = %s
-        """, (item_id,)).fetchone()
+        item = get_cached_item(item_id)
 
         if not item:
             return jsonify({"error": "Item not found"}), 404
 
-        return jsonify(dict(item))
+        fields = (
+            "name", "category", "description", "pack_size",
+            "vendor_price", "cost_per_piece", "a4s_selling_price",
+            "markup", "reorder_level", "vendor_id",
+        )
+        details = {field: item.get(field) for field in fields}
+        details["vendor"] = item.get("vendor_name") or item.get("vendor")
+        return jsonify(details)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
 
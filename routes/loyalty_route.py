@@ -1,14 +1,16 @@
 from flask import Blueprint, request, jsonify, session
 from db.database import get_db
-from services.loyalty_service import (
-    get_all_programs,
-    create_program,
-    toggle_program,
-    get_customer_eligibility,
-    get_customer_earn_only,
-    redeem_reward,
-    get_customer_loyalty_summary,
-)
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_loyalty = lazy_module("services.loyalty_service")
+get_all_programs = _loyalty.get_all_programs
+create_program = _loyalty.create_program
+toggle_program = _loyalty.toggle_program
+get_customer_eligibility = _loyalty.get_customer_eligibility
+get_customer_earn_only = _loyalty.get_customer_earn_only
+redeem_reward = _loyalty.redeem_reward
+get_customer_loyalty_summary = _loyalty.get_customer_loyalty_summary
 
 loyalty_bp = Blueprint("loyalty", __name__)
 
@@ -178,4 +180,3 @@ def customer_loyalty_summary(customer_id):
         return jsonify({"error": str(e)}), 500
 
 
-
@@ -1,19 +1,21 @@
 ﻿# Add to imports at the top
-import csv
-import io
 from datetime import datetime, date
-from flask import Response
-from db.database import get_db
+from db.filters import on_date_sql
 from flask import Blueprint, request, render_template, redirect, url_for, flash
-from services.reports_service import (
-    get_sales_by_date,
-    get_sales_by_range,
-    get_sales_report_by_date,
-    get_sales_report_by_range,
-)
-from services.transactions_service import get_purchase_order_export_data
 from services.cash_service import get_cash_entries_for_report
 from utils.formatters import format_date
+from utils.csv_export import csv_response, stream_query
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_reports = lazy_module("services.reports_service")
+get_sales_by_date = _reports.get_sales_by_date
+get_sales_by_range = _reports.get_sales_by_range
+get_sales_report_by_date = _reports.get_sales_report_by_date
+get_sales_report_by_range = _reports.get_sales_report_by_range
+
+_transactions = lazy_module("services.transactions_service")
+get_purchase_order_export_data = _transactions.get_purchase_order_export_data
 
 reports_bp = Blueprint("reports", __name__)
 
@@ -143,69 +145,78 @@ def export_inventory_snapshot():
 
     Future scalability note: add ?branch_id= param here when multi-branch is ready.
     """
-    conn = get_db()
-    rows = conn.execute("""
-        SELECT
-            i.id,
-            i.name,
-            i.category,
-            i.a4s_selling_price,
-            COALESCE(inv.current_stock, 0) AS current_stock,
-            COALESCE(inv.total_sold, 0) AS total_sold,
-            COALESCE(sale_totals.total_revenue, 0) AS total_revenue
-        FROM items i
-        LEFT JOIN (
-            SELECT
-                item_id,
-                SUM(
-                    CASE WHEN transaction_type = 'IN'  THEN quantity
-                         WHEN transaction_type = 'OUT' THEN -quantity
-                         ELSE 0 END
-                ) AS current_stock,
-                SUM(
-                    CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END
-                ) AS total_sold
-            FROM inventory_transactions
-            GROUP BY item_id
-        ) AS inv ON i.id = inv.item_id
-        LEFT JOIN (
+    def generate():
+        yield [
+            "Item ID", "Item Name", "Category",
+            "Selling Price (A4S)", "Current Stock", "Total Units Sold (All-Time)", "Revenue"
+        ]
+        for row in stream_query("""
             SELECT
-                item_id,
-                SUM(COALESCE(final_unit_price, 0) * quantity) AS total_revenue
-            FROM sales_items
-            GROUP BY item_id
-        ) AS sale_totals ON i.id = sale_totals.item_id
-        ORDER BY i.name ASC
-    """).fetchall()
-    conn.close()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    writer.writerow([
-        "Item ID", "Item Name", "Category",
-        "Selling Price (A4S)", "Current Stock", "Total Units Sold (All-Time)", "Revenue"
-    ])
-
-    for row in rows:
-        writer.writerow([
-            row["id"],
-            row["name"],
-            row["category"] or "",
-            row["a4s_selling_price"] or 0,
-            row["current_stock"],
-            row["total_sold"],
-            round(row["total_revenue"] or 0, 2),
-        ])
+                i.id,
+                i.name,
+                i.category,
+                i.a4s_selling_price,
+                COALESCE(b.on_hand, 0) AS current_stock,
+                COALESCE(b.total_out, 0) AS total_sold,
+                COALESCE(sale_totals.total_revenue, 0) AS total_revenue
+            FROM items i
+            LEFT JOIN item_stock_balances b ON b.item_id = i.id
+            LEFT JOIN (
+                SELECT
+                    item_id,
+                    SUM(COALESCE(final_unit_price, 0) * quantity) AS total_revenue
+                FROM sales_items
+                GROUP BY item_id
+            ) AS sale_totals ON i.id = sale_totals.item_id
+            ORDER BY i.name ASC
+        """):
+            yield [
+                row["id"],
+                row["name"],
+                row["category"] or "",
+                row["a4s_selling_price"] or 0,
+                row["current_stock"],
+                row["total_sold"],
+                round(row["total_revenue"] or 0, 2),
+            ]
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"inventory_snapshot_{timestamp}.csv"
+    return csv_response(generate(), f"inventory_snapshot_{timestamp}.csv")
 
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+
+# Today's Paid sales, plus Partial debt sales whose service part is settled.
+# {today_sql} is an on_date_sql() filter on s.transaction_date.
+_SOLD_TODAY_SALES_SQL = """
+    SELECT *
+    FROM (
+        SELECT
+            s.id                AS sale_id,
+            s.sales_number,
+            s.status,
+            COALESCE(s.total_amount, 0) AS total_amount,
+            COALESCE(b.service_total, 0) AS service_total,
+            COALESCE(b.amount_paid_total, 0) AS total_paid,
+            COALESCE(b.service_paid_total, 0) AS service_paid,
+            COALESCE(pm.name, 'N/A') AS payment_method_name,
+            COALESCE(c.customer_name, s.customer_name, 'Walk-in') AS customer_name,
+            COALESCE(v.vehicle_name, '') AS vehicle_name,
+            COALESCE(m.name, 'N/A') AS mechanic_name,
+            COALESCE(m.commission_rate, 0.0) AS commission_rate
+        FROM sales s
+        LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
+        LEFT JOIN customers c ON c.id = s.customer_id
+        LEFT JOIN vehicles v ON v.id = s.vehicle_id
+        LEFT JOIN mechanics m ON m.id = s.mechanic_id
+        LEFT JOIN sale_balances b ON b.sale_id = s.id
+        WHERE {today_sql}
+    ) x
+    WHERE
+        x.status = 'Paid'
+        OR (
+            x.status = 'Partial'
+            AND x.service_paid >= x.service_total
+        )
+"""
 
 
 @reports_bp.route("/export/items-sold-today")
@@ -213,250 +224,137 @@ def export_items_sold_today():
     today = date.today()
     today_iso = today.isoformat()
     today_display = today.strftime("%B %d, %Y").replace(" 0", " ")
-    conn = get_db()
-    sales_rows = conn.execute("""
-        SELECT
-            x.sale_id,
-            x.sales_number,
-            x.status,
-            x.total_amount,
-            x.service_total,
-            x.total_paid,
-            x.service_paid,
-            x.payment_method_name
-        FROM (
-            SELECT
-                s.id                AS sale_id,
-                s.sales_number,
-                s.status,
-                COALESCE(s.total_amount, 0) AS total_amount,
-                COALESCE((SELECT SUM(ss.price) FROM sales_services ss WHERE ss.sale_id = s.id), 0) AS service_total,
-                COALESCE((SELECT SUM(dp.amount_paid) FROM debt_payments dp WHERE dp.sale_id = s.id), 0) AS total_paid,
-                COALESCE((SELECT SUM(dp.service_portion) FROM debt_payments dp WHERE dp.sale_id = s.id), 0) AS service_paid,
-                COALESCE(pm.name, 'N/A') AS payment_method_name
-            FROM sales s
-            LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-            WHERE DATE(s.transaction_date) = %s
-        ) x
-        WHERE
-            x.status = 'Paid'
-            OR (
-                x.status = 'Partial'
-                AND x.service_paid >= x.service_total
-            )
-    """, (today_iso,)).fetchall()
-
-    sale_map = {
-        row["sale_id"]: dict(row)
-        for row in sales_rows
-    }
+    today_sql, today_params = on_date_sql("s.transaction_date", today_iso)
+    sales_sql = _SOLD_TODAY_SALES_SQL.format(today_sql=today_sql)
+
+    def generate():
+        yield ["Date", today_display]
+        yield ["quantity", "item", "OR No", "Payment Mod", "amount"]
 
-    rows = []
-    if sales_rows:
-        sale_ids = [row["sale_id"] for row in sales_rows]
-        placeholders = ",".join(["%s"] * len(sale_ids))
-        rows = conn.execute(f"""
+        for row in stream_query(f"""
+            WITH day_sales AS ({sales_sql})
             SELECT
-                si.sale_id,
+                d.*,
                 COALESCE(i.name, '') AS item_name,
                 COALESCE(si.quantity, 0) AS quantity,
                 COALESCE(si.final_unit_price, 0) AS final_unit_price
-            FROM sales_items si
+            FROM day_sales d
+            JOIN sales_items si ON si.sale_id = d.sale_id
             LEFT JOIN items i ON i.id = si.item_id
-            WHERE si.sale_id IN ({placeholders})
             ORDER BY si.sale_id ASC
-        """, sale_ids).fetchall()
-    conn.close()
-
-    output = []
-    output.append(f"Date,{today_display}")
-    output.append("quantity,item,OR No,Payment Mod,amount")
-
-    for row in rows:
-        sale = sale_map.get(row["sale_id"], {})
-        item = row["item_name"].replace('"', '""') if row["item_name"] else ""
-        sales_number = sale.get("sales_number", "") or ""
-        sales_number = sales_number.replace('"', '""')
-        quantity = int(row["quantity"] or 0)
-        final_unit_price = float(row["final_unit_price"] or 0)
-        line_total = final_unit_price * quantity
-
-        paid_amount = line_total
-        if sale.get("status") == "Partial":
-            item_total = float(sale.get("total_amount", 0) or 0) - float(sale.get("service_total", 0) or 0)
-            item_paid = max(0.0, float(sale.get("total_paid", 0) or 0) - float(sale.get("service_paid", 0) or 0))
-            if item_total > 0:
-                ratio = min(1.0, item_paid / item_total)
-                paid_amount = round(line_total * ratio, 2)
-            else:
-                paid_amount = 0.0
-
-        paid_amount = round(paid_amount, 2)
-        if paid_amount <= 0:
-            continue
-
-        payment_method = (sale.get("payment_method_name", "N/A") or "N/A").replace('"', '""')
-        output.append(
-            f'{quantity},"{item}","{sales_number}","{payment_method}",'
-            f'{paid_amount:.2f}'
-        )
-
-    return Response(
-        "\n".join(output) + "\n",
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=items_sold_{today_iso}.csv"},
-    )
+        """, today_params):
+            quantity = int(row["quantity"] or 0)
+            final_unit_price = float(row["final_unit_price"] or 0)
+            line_total = final_unit_price * quantity
+
+            paid_amount = line_total
+            if row["status"] == "Partial":
+                item_total = float(row["total_amount"] or 0) - float(row["service_total"] or 0)
+                item_paid = max(0.0, float(row["total_paid"] or 0) - float(row["service_paid"] or 0))
+                if item_total > 0:
+                    ratio = min(1.0, item_paid / item_total)
+                    paid_amount = round(line_total * ratio, 2)
+                else:
+                    paid_amount = 0.0
+
+            paid_amount = round(paid_amount, 2)
+            if paid_amount <= 0:
+                continue
+
+            yield [
+                quantity,
+                row["item_name"] or "",
+                row["sales_number"] or "",
+                row["payment_method_name"] or "N/A",
+                f"{paid_amount:.2f}",
+            ]
+
+    return csv_response(generate(), f"items_sold_{today_iso}.csv")
 
 
 @reports_bp.route("/export/services-sold-today")
 def export_services_sold_today():
     today = date.today()
     today_iso = today.isoformat()
+    today_sql, today_params = on_date_sql("s.transaction_date", today_iso)
+    sales_sql = _SOLD_TODAY_SALES_SQL.format(today_sql=today_sql)
 
-    conn = get_db()
-    sale_rows = conn.execute("""
-        SELECT
-            x.sale_id,
-            x.sales_number,
-            x.customer_name,
-            COALESCE(x.vehicle_name, '') AS vehicle_name,
-            COALESCE(x.mechanic_name, 'N/A') AS mechanic_name,
-            COALESCE(x.commission_rate, 0.0) AS commission_rate
-        FROM (
-            SELECT
-                s.id                           AS sale_id,
-                s.sales_number,
-                COALESCE(c.customer_name, s.customer_name, 'Walk-in') AS customer_name,
-                v.vehicle_name,
-                m.name                         AS mechanic_name,
-                m.commission_rate,
-                COALESCE(ss.service_total, 0)  AS service_total,
-                COALESCE(dp.service_paid, 0)   AS service_paid,
-                s.status
-            FROM sales s
-            LEFT JOIN customers c ON c.id = s.customer_id
-            LEFT JOIN vehicles v ON v.id = s.vehicle_id
-            LEFT JOIN mechanics m ON m.id = s.mechanic_id
-            LEFT JOIN (
-                SELECT
-                    sale_id,
-                    SUM(price) AS service_total
-                FROM sales_services
-                GROUP BY sale_id
-            ) ss ON ss.sale_id = s.id
-            LEFT JOIN (
-                SELECT
-                    dp.sale_id,
-                    SUM(COALESCE(dp.service_portion, 0)) AS service_paid
-                FROM debt_payments dp
-                GROUP BY dp.sale_id
-            ) dp ON dp.sale_id = s.id
-            WHERE DATE(s.transaction_date) = %s
-        ) x
-        WHERE
-            x.status = 'Paid'
-            OR (
-                x.status = 'Partial'
-                AND x.service_paid >= x.service_total
-            )
-    """, (today_iso,)).fetchall()
-
-    sales_map = {row["sale_id"]: dict(row) for row in sale_rows}
-
-    rows = []
-    if sale_rows:
-        sale_ids = [row["sale_id"] for row in sale_rows]
-        placeholders = ",".join(["%s"] * len(sale_ids))
-        rows = conn.execute(f"""
+    def generate():
+        yield [
+            "Customer Name", "Vehicle", "Service Name", "Mechanic Name",
+            "OR No.", "Amount (Shop cut)", "Amount (Mechanic Cut)", "Total"
+        ]
+
+        total_shop_cut = 0.0
+        total_mechanic_cut = 0.0
+        total_amount = 0.0
+        mechanic_totals = {}
+
+        for row in stream_query(f"""
+            WITH day_sales AS ({sales_sql})
             SELECT
-                ss.sale_id,
+                d.*,
                 sv.name AS service_name,
                 ss.price
-            FROM sales_services ss
+            FROM day_sales d
+            JOIN sales_services ss ON ss.sale_id = d.sale_id
             JOIN services sv ON sv.id = ss.service_id
-            WHERE ss.sale_id IN ({placeholders})
             ORDER BY ss.sale_id ASC, sv.name ASC
-        """, sale_ids).fetchall()
-
-    conn.close()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        "Customer Name", "Vehicle", "Service Name", "Mechanic Name",
-        "OR No.", "Amount (Shop cut)", "Amount (Mechanic Cut)", "Total"
-    ])
-
-    total_shop_cut = 0.0
-    total_mechanic_cut = 0.0
-    total_amount = 0.0
-    mechanic_totals = {}
-
-    for row in rows:
-        sale = sales_map.get(row["sale_id"], {})
-        customer_name = sale.get("customer_name", "Walk-in")
-        vehicle_name = sale.get("vehicle_name", "N/A")
-        service_name = row["service_name"] or ""
-        mechanic_name = sale.get("mechanic_name", "N/A")
-        sales_number = sale.get("sales_number", "")
-
-        total = round(float(row["price"] or 0), 2)
-        commission_rate = round(float(sale.get("commission_rate", 0.0) or 0.0), 2)
-        mechanic_cut = round(total * commission_rate, 2)
-        shop_cut = round(total - mechanic_cut, 2)
-
-        writer.writerow([
-            customer_name,
-            vehicle_name,
-            service_name,
-            mechanic_name,
-            sales_number,
-            f"{shop_cut:.2f}",
-            f"{mechanic_cut:.2f}",
-            f"{total:.2f}",
-        ])
-
-        total_shop_cut += shop_cut
-        total_mechanic_cut += mechanic_cut
-        total_amount += total
-
-        mech = mechanic_name or "N/A"
-        if mech not in mechanic_totals:
-            mechanic_totals[mech] = {
-                "mechanic_cut": 0.0,
-                "shop_cut": 0.0,
-                "total": 0.0,
-            }
-        mechanic_totals[mech]["mechanic_cut"] += mechanic_cut
-        mechanic_totals[mech]["shop_cut"] += shop_cut
-        mechanic_totals[mech]["total"] += total
-
-    writer.writerow([
-        "TOTAL", "", "", "", "",
-        f"{round(total_shop_cut, 2):.2f}",
-        f"{round(total_mechanic_cut, 2):.2f}",
-        f"{round(total_amount, 2):.2f}",
-    ])
-    writer.writerow([])
-    writer.writerow(["Mechanic Name", "Amount (Mechanic Cut)", "Amount (Shop Cut)", "Total"])
-    for mechanic_name, values in sorted(mechanic_totals.items(), key=lambda item: item[0].lower()):
-        writer.writerow([
-            mechanic_name,
-            f"{round(values['mechanic_cut'], 2):.2f}",
-            f"{round(values['shop_cut'], 2):.2f}",
-            f"{round(values['total'], 2):.2f}",
-        ])
-
-    writer.writerow([
-        "TOTAL",
-        f"{round(total_mechanic_cut, 2):.2f}",
-        f"{round(total_shop_cut, 2):.2f}",
-        f"{round(total_amount, 2):.2f}",
-    ])
-
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=services_sold_{today_iso}.csv"},
-    )
+        """, today_params):
+            mechanic_name = row["mechanic_name"]
+
+            total = round(float(row["price"] or 0), 2)
+            commission_rate = round(float(row["commission_rate"] or 0.0), 2)
+            mechanic_cut = round(total * commission_rate, 2)
+            shop_cut = round(total - mechanic_cut, 2)
+
+            yield [
+                row["customer_name"],
+                row["vehicle_name"],
+                row["service_name"] or "",
+                mechanic_name,
+                row["sales_number"] or "",
+                f"{shop_cut:.2f}",
+                f"{mechanic_cut:.2f}",
+                f"{total:.2f}",
+            ]
+
+            total_shop_cut += shop_cut
+            total_mechanic_cut += mechanic_cut
+            total_amount += total
+
+            mech = mechanic_name or "N/A"
+            if mech not in mechanic_totals:
+                mechanic_totals[mech] = {
+                    "mechanic_cut": 0.0,
+                    "shop_cut": 0.0,
+                    "total": 0.0,
+                }
+            mechanic_totals[mech]["mechanic_cut"] += mechanic_cut
+            mechanic_totals[mech]["shop_cut"] += shop_cut
+            mechanic_totals[mech]["total"] += total
+
+        yield [
+            "TOTAL", "", "", "", "",
+            f"{round(total_shop_cut, 2):.2f}",
+            f"{round(total_mechanic_cut, 2):.2f}",
+            f"{round(total_amount, 2):.2f}",
+        ]
+        yield []
+        yield ["Mechanic Name", "Amount (Mechanic Cut)", "Amount (Shop Cut)", "Total"]
+        for mechanic_name, values in sorted(mechanic_totals.items(), key=lambda item: item[0].lower()):
+            yield [
+                mechanic_name,
+                f"{round(values['mechanic_cut'], 2):.2f}",
+                f"{round(values['shop_cut'], 2):.2f}",
+                f"{round(values['total'], 2):.2f}",
+            ]
+
+        yield [
+            "TOTAL",
+            f"{round(total_mechanic_cut, 2):.2f}",
+            f"{round(total_shop_cut, 2):.2f}",
+            f"{round(total_amount, 2):.2f}",
+        ]
 
+    return csv_response(generate(), f"services_sold_{today_iso}.csv")
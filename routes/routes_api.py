@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
-from db.database import get_db
-from auth.utils import admin_required
+from db.database import get_db, get_request_db_stats
+from auth.utils import admin_required, get_user_cache_stats
+from services.search_service import build_search_clause, set_similarity_threshold
+from services.catalogue_cache import get_catalogue_cache_stats
 
 dashboard_api = Blueprint("dashboard_api", __name__)
 
@@ -11,18 +13,13 @@ def stock_movement():
 
     conn = get_db()
     rows = conn.execute("""
-        SELECT 
-            DATE(transaction_date) AS date,
-            SUM(
-                CASE 
-                    WHEN transaction_type = 'IN' THEN quantity
-                    ELSE -quantity
-                END
-            ) AS net_change
-        FROM inventory_transactions
-        WHERE transaction_date >= (NOW() - (%s * INTERVAL '1 day'))
-        GROUP BY DATE(transaction_date)
-        ORDER BY DATE(transaction_date)
+        SELECT
+            movement_date AS date,
+            SUM(qty_in - qty_out) AS net_change
+        FROM item_daily_movements
+        WHERE movement_date >= CURRENT_DATE - %s
+        GROUP BY movement_date
+        ORDER BY movement_date
     """, (days,)).fetchall()
 
     conn.close()
@@ -41,19 +38,13 @@ def item_movement():
     conn = get_db()
 
     rows = conn.execute("""
-        SELECT 
-            DATE(transaction_date) AS date,
-            SUM(
-                CASE 
-                    WHEN transaction_type = 'IN' THEN quantity
-                    ELSE -quantity
-                END
-            ) AS net_change
-        FROM inventory_transactions
+        SELECT
+            movement_date AS date,
+            qty_in - qty_out AS net_change
+        FROM item_daily_movements
         WHERE item_id = %s
-        AND transaction_date >= (NOW() - (%s * INTERVAL '1 day'))
-        GROUP BY DATE(transaction_date)
-        ORDER BY DATE(transaction_date)
+        AND movement_date >= CURRENT_DATE - %s
+        ORDER BY movement_date
     """, (item_id, days)).fetchall()
 
     conn.close()
@@ -70,14 +61,14 @@ def top_items_chart():
     conn = get_db()
 
     rows = conn.execute("""
-        SELECT 
+        SELECT
             items.name,
-            SUM(inventory_transactions.quantity) AS total_out
-        FROM inventory_transactions
-        JOIN items ON items.id = inventory_transactions.item_id
-        WHERE inventory_transactions.transaction_type = 'OUT'
-        AND inventory_transactions.transaction_date >= (NOW() - (%s * INTERVAL '1 day'))
+            SUM(m.qty_out) AS total_out
+        FROM item_daily_movements m
+        JOIN items ON items.id = m.item_id
+        WHERE m.movement_date >= CURRENT_DATE - %s
         GROUP BY items.id
+        HAVING SUM(m.qty_out) > 0
         ORDER BY total_out DESC
         LIMIT 5
     """, (days,)).fetchall()
@@ -96,26 +87,41 @@ def search_services():
     if not query:
         return jsonify({"services": []})
 
-    # Split the query into words for forgiving search
-    words = query.split()
-    # Create multiple ILIKE clauses: WHERE name ILIKE %word1% AND name ILIKE %word2%...
-    where_clause = " AND ".join(["(name ILIKE %s OR category ILIKE %s)" for _ in words])
-    params = []
-    for word in words:
-        params.extend([f'%{word}%', f'%{word}%'])
+    # Ranked, typo-tolerant match on name / category (pg_trgm)
+    search = build_search_clause(query, ["name", "category"])
+    if not search:
+        return jsonify({"services": []})
+    where_sql, where_params, order_sql, order_params = search
 
     active_clause = "" if include_inactive else "AND is_active = 1"
 
     conn = get_db()
+    set_similarity_threshold(conn)
     cursor = conn.execute(f"""
         SELECT id, name, category, is_active
         FROM services 
-        WHERE {where_clause}
+        WHERE {where_sql}
         {active_clause}
+        ORDER BY {order_sql}, name ASC
         LIMIT 20
-    """, params)
+    """, where_params + order_params)
     
     services = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
     return jsonify({"services": services})
+
+
+@dashboard_api.route("/api/cache/stats")
+@admin_required
+def cache_stats():
+    return jsonify({
+        "catalogue": get_catalogue_cache_stats(),
+        "users": get_user_cache_stats(),
+    })
+
+
+@dashboard_api.route("/api/db/connection-stats")
+@admin_required
+def db_connection_stats():
+    return jsonify(get_request_db_stats())
@@ -1,30 +1,31 @@
-import csv
-import io
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, session, url_for, flash, jsonify, Response
+from flask import Blueprint, render_template, request, redirect, session, url_for, flash, jsonify
 from auth.utils import admin_required, login_required
 from services.inventory_service import get_unique_categories
 from utils.formatters import format_date
-from services.transactions_service import (
-    add_item_to_db,
-    normalize_item_category,
-    get_transaction_out_context,
-    process_manual_stock_in,
-    record_sale,
-    create_purchase_order,
-    get_all_purchase_orders,
-    get_purchase_order_with_items,
-    get_purchase_order_details,
-    get_po_for_receive_page,
-    approve_purchase_order,
-    cancel_purchase_order,
-    receive_purchase_order,
-    get_po_details_for_api,
-    get_purchase_order_export_data,
-    request_po_revisions,
-    update_purchase_order,
-    get_purchase_order_review_context,
-)
+from utils.csv_export import csv_response
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_transactions = lazy_module("services.transactions_service")
+add_item_to_db = _transactions.add_item_to_db
+normalize_item_category = _transactions.normalize_item_category
+get_transaction_out_context = _transactions.get_transaction_out_context
+process_manual_stock_in = _transactions.process_manual_stock_in
+record_sale = _transactions.record_sale
+create_purchase_order = _transactions.create_purchase_order
+get_all_purchase_orders = _transactions.get_all_purchase_orders
+get_purchase_order_with_items = _transactions.get_purchase_order_with_items
+get_purchase_order_details = _transactions.get_purchase_order_details
+get_po_for_receive_page = _transactions.get_po_for_receive_page
+approve_purchase_order = _transactions.approve_purchase_order
+cancel_purchase_order = _transactions.cancel_purchase_order
+receive_purchase_order = _transactions.receive_purchase_order
+get_po_details_for_api = _transactions.get_po_details_for_api
+get_purchase_order_export_data = _transactions.get_purchase_order_export_data
+request_po_revisions = _transactions.request_po_revisions
+update_purchase_order = _transactions.update_purchase_order
+get_purchase_order_review_context = _transactions.get_purchase_order_review_context
 
 transaction_bp = Blueprint('transaction', __name__)
 
@@ -340,48 +341,47 @@ def export_purchase_order_csv(po_id):
         return jsonify({"error": "Order not found"}), 404
 
     po_data = dict(po)
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    writer.writerow(["PO Number", po_data.get("po_number") or ""])
-    writer.writerow(["Vendor", po_data.get("vendor_name") or ""])
-    writer.writerow(["Status", po_data.get("status") or ""])
-    writer.writerow(["Created At", format_date(po_data.get("created_at"), show_time=True)])
-    writer.writerow(["Received At", format_date(po_data.get("received_at"), show_time=True)])
-    writer.writerow(["Total Amount", f"{float(po_data.get('total_amount') or 0):.2f}"])
-    writer.writerow([])
-    writer.writerow(["Item", "Qty Ordered", "Qty Received", "Unit Cost", "Subtotal"])
-
-    total_qty_ordered = 0
-    total_qty_received = 0
-    grand_total = 0.0
-
-    for row in items:
-        item = dict(row)
-        qty_ordered = int(item.get("quantity_ordered") or 0)
-        qty_received = int(item.get("quantity_received") or 0)
-        unit_cost = float(item.get("unit_cost") or 0)
-        subtotal = qty_ordered * unit_cost
-        total_qty_ordered += qty_ordered
-        total_qty_received += qty_received
-        grand_total += subtotal
-
-        writer.writerow([
-            item.get("name") or "",
-            qty_ordered,
-            qty_received,
-            f"{unit_cost:.2f}",
-            f"{subtotal:.2f}",
-        ])
-
-    writer.writerow([])
-    writer.writerow([
-        "TOTAL",
-        total_qty_ordered,
-        total_qty_received,
-        "",
-        f"{grand_total:.2f}",
-    ])
+
+    def generate():
+        yield ["PO Number", po_data.get("po_number") or ""]
+        yield ["Vendor", po_data.get("vendor_name") or ""]
+        yield ["Status", po_data.get("status") or ""]
+        yield ["Created At", format_date(po_data.get("created_at"), show_time=True)]
+        yield ["Received At", format_date(po_data.get("received_at"), show_time=True)]
+        yield ["Total Amount", f"{float(po_data.get('total_amount') or 0):.2f}"]
+        yield []
+        yield ["Item", "Qty Ordered", "Qty Received", "Unit Cost", "Subtotal"]
+
+        total_qty_ordered = 0
+        total_qty_received = 0
+        grand_total = 0.0
+
+        for row in items:
+            item = dict(row)
+            qty_ordered = int(item.get("quantity_ordered") or 0)
+            qty_received = int(item.get("quantity_received") or 0)
+            unit_cost = float(item.get("unit_cost") or 0)
+            subtotal = qty_ordered * unit_cost
+            total_qty_ordered += qty_ordered
+            total_qty_received += qty_received
+            grand_total += subtotal
+
+            yield [
+                item.get("name") or "",
+                qty_ordered,
+                qty_received,
+                f"{unit_cost:.2f}",
+                f"{subtotal:.2f}",
+            ]
+
+        yield []
+        yield [
+            "TOTAL",
+            total_qty_ordered,
+            total_qty_received,
+            "",
+            f"{grand_total:.2f}",
+        ]
 
     safe_po = "".join(
         ch if ch.isalnum() or ch in ("-", "_") else "_"
@@ -389,11 +389,7 @@ def export_purchase_order_csv(po_id):
     )
     filename = f"{safe_po}_{datetime.now().strftime('%Y%m%d')}.csv"
 
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
-    )
+    return csv_response(generate(), filename)
 
 
 @transaction_bp.route("/transaction/receive/<int:po_id>")
@@ -1,12 +1,187 @@
+import multiprocessing
 import os
+import signal
+import socket
+import threading
+import time
 
-from waitress import serve
 
-from wsgi import application
+# ─────────────────────────────────────────────
+# MULTI-PROCESS MODE (APP_WORKERS > 1)
+# ─────────────────────────────────────────────
+#
+# One Python process is capped at one core by the GIL, so report assembly,
+# CSV formatting and template rendering queue behind each other. With
+# APP_WORKERS=N this launcher binds the listening socket once and starts N
+# waitress worker processes that all accept from it (works on Windows too:
+# no fork or SO_REUSEPORT needed; the socket is handed over by
+# multiprocessing).
+#
+# DB_CONNECTION_BUDGET is the total number of Postgres connections the app
+# may hold. Each worker's ThreadedConnectionPool gets an equal share of it,
+# minus one connection per worker for the item catalogue LISTEN thread,
+# which is switched on by default here so worker caches stay coherent.
+#
+# Supervision:
+#   - a worker that dies is restarted
+#   - SIGHUP (not on Windows) → rolling restart: a new worker starts, then the
+#     old one stops accepting and exits once its open connections finish
+#     (or after APP_DRAIN_SECONDS)
+#   - Ctrl+C / SIGTERM → every worker drains the same way, then exits (a
+#     SIGTERM that reaches the workers directly drains them too)
+#
+# APP_THREADS is capped at the per-worker pool size, since a psycopg2 pool
+# raises instead of blocking when a thread asks for one connection too many.
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _worker_pool_size(workers, listen):
+    budget = _env_int("DB_CONNECTION_BUDGET", os.environ.get("DB_POOL_MAX", 20))
+    per_worker = budget // workers - (1 if listen else 0)
+    if per_worker < 1:
+        raise SystemExit(
+            f"❌ DB_CONNECTION_BUDGET={budget} is too small for {workers} workers "
+            f"(each needs at least {2 if listen else 1} connections)."
+        )
+    return per_worker
+
+
+def _drain_on_stop(server, stop_event, drain_seconds):
+    stop_event.wait()
+    # The listening socket is shared, so the other workers pick up new connections
+    server.accepting = False
+    deadline = time.monotonic() + drain_seconds
+    while getattr(server, "active_channels", None) and time.monotonic() < deadline:
+        time.sleep(0.2)
+    os._exit(0)
+
+
+def _run_worker(sock, pool_max, threads, stop_event, drain_seconds):
+    # Read by db.database._get_pool() when this process first needs a connection
+    os.environ["DB_POOL_MAX"] = str(pool_max)
+    os.environ["DB_POOL_MIN"] = str(min(_env_int("DB_POOL_MIN", 1), pool_max))
+    # The supervisor decides when to stop; a SIGTERM sent to the whole process
+    # group (service managers, docker stop) drains like a supervisor stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    from waitress import create_server
+    from wsgi import application
+
+    server = create_server(application, sockets=[sock], threads=threads)
+    threading.Thread(
+        target=_drain_on_stop, args=(server, stop_event, drain_seconds), daemon=True
+    ).start()
+    server.run()
+
+
+class _Supervisor:
+    def __init__(self, sock, workers, threads):
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.drain_seconds = _env_int("APP_DRAIN_SECONDS", 30)
+        os.environ.setdefault("ITEM_CACHE_LISTEN", "1")
+        listen = os.environ["ITEM_CACHE_LISTEN"].strip().lower() in {"1", "true", "yes", "on"}
+        self.pool_max = _worker_pool_size(workers, listen)
+        if threads > self.pool_max:
+            # psycopg2 pools raise PoolError instead of waiting once every
+            # connection is out, so never run more threads than connections
+            print(
+                f"⚠ APP_THREADS={threads} exceeds the per-worker DB pool ({self.pool_max}); "
+                f"using {self.pool_max} threads. Raise DB_CONNECTION_BUDGET or lower APP_WORKERS."
+            )
+            self.threads = self.pool_max
+        self.ctx = multiprocessing.get_context("spawn")
+        self.slots = [None] * workers   # (process, stop_event) per slot
+        self.stopping = False
+        self.restart_requested = False
+
+    def _spawn(self, slot):
+        stop_event = self.ctx.Event()
+        process = self.ctx.Process(
+            target=_run_worker,
+            args=(self.sock, self.pool_max, self.threads, stop_event, self.drain_seconds),
+            name=f"waitress-worker-{slot + 1}",
+        )
+        process.start()
+        self.slots[slot] = (process, stop_event)
+        print(f"✅ Worker {slot + 1} started (pid {process.pid})")
+
+    def _stop(self, process, stop_event):
+        stop_event.set()
+        process.join(self.drain_seconds + 5)
+        if process.is_alive():
+            process.kill()  # terminate() would only start another drain
+            process.join()
+
+    def _rolling_restart(self):
+        print("🔄 Rolling restart")
+        warmup = _env_int("APP_RESTART_WARMUP_SECONDS", 5)
+        for slot in range(self.workers):
+            old_process, old_stop = self.slots[slot]
+            self._spawn(slot)
+            time.sleep(warmup)  # let the new worker import the app before the old one leaves
+            self._stop(old_process, old_stop)
+
+    def run(self):
+        print(
+            f"🚀 {self.workers} workers × {self.threads} threads, "
+            f"DB pool {self.pool_max} per worker, on {self.sock.getsockname()}"
+        )
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self.stopping:
+            time.sleep(1)
+            if self.restart_requested:
+                self.restart_requested = False
+                self._rolling_restart()
+            for slot, (process, _) in enumerate(self.slots):
+                if not process.is_alive() and not self.stopping:
+                    print(f"⚠ Worker {slot + 1} exited (code {process.exitcode}), restarting")
+                    self._spawn(slot)
+
+        print("🛑 Stopping workers (draining open connections)")
+        stoppers = [threading.Thread(target=self._stop, args=slot) for slot in self.slots]
+        for stopper in stoppers:
+            stopper.start()
+        for stopper in stoppers:
+            stopper.join()
+        self.sock.close()
+
+
+def _serve_workers(host, port, workers, threads):
+    sock = socket.create_server((host, port), backlog=_env_int("APP_BACKLOG", 1024))
+    supervisor = _Supervisor(sock, workers, threads)
+
+    def request_stop(*_):
+        supervisor.stopping = True
+
+    def request_restart(*_):
+        supervisor.restart_requested = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, request_restart)
+
+    supervisor.run()
 
 
 if __name__ == "__main__":
     host = os.environ.get("APP_HOST", "127.0.0.1")
     port = int(os.environ.get("APP_PORT", "8080"))
     threads = int(os.environ.get("APP_THREADS", "8"))
-    serve(application, host=host, port=port, threads=threads)
+    workers = int(os.environ.get("APP_WORKERS", "1"))
+
+    if workers > 1:
+        _serve_workers(host, port, workers, threads)
+    else:
+        from waitress import serve
+
+        from wsgi import application
+
+        serve(application, host=host, port=port, threads=threads)
@@ -0,0 +1,117 @@
+"""
+Checkout latency vs. cart size for record_sale().
+
+    python -m scripts.benchmark_checkout [--sizes 1,5,15,30] [--runs 20]
+
+Creates BENCH items with plenty of stock, records real sales through
+record_sale() for each cart size, then deletes everything it created
+(sales, ledger rows, items) and rebuilds the cash rollup. Each sale commits,
+so run it against a dev / staging database, not the live shop.
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from db.database import get_db
+from services.cash_service import rebuild_cash_daily_balances
+from services.transactions_service import add_transaction, record_sale
+
+
+def _setup(conn, count, tag):
+    rows = conn.execute("""
+        INSERT INTO items (name, description, category, a4s_selling_price)
+        SELECT 'BENCH CHECKOUT ' || %s || ' ' || g, 'Synthetic checkout item', 'Benchmark', 100
+        FROM generate_series(1, %s) AS g
+        RETURNING id
+    """, (tag, count)).fetchall()
+    item_ids = [row["id"] for row in rows]
+
+    for item_id in item_ids:
+        add_transaction(item_id=item_id, quantity=100000, transaction_type='IN',
+                        change_reason='BENCHMARK', external_conn=conn)
+
+    user = conn.execute("SELECT id, username FROM users ORDER BY id LIMIT 1").fetchone()
+    payment_method = conn.execute("""
+        SELECT id FROM payment_methods
+        WHERE is_active = 1 AND COALESCE(category, '') <> 'Debt'
+        ORDER BY id LIMIT 1
+    """).fetchone()
+    conn.commit()
+
+    if not user or not payment_method:
+        raise SystemExit("❌ Needs at least one user and one active non-debt payment method.")
+    return item_ids, user, payment_method["id"]
+
+
+def _cleanup(tag):
+    conn = get_db()
+    try:
+        item_ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM items WHERE name LIKE %s", (f"BENCH CHECKOUT {tag} %",)
+        ).fetchall()]
+        sale_ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM sales WHERE sales_number LIKE %s", (f"BENCH-{tag}-%",)
+        ).fetchall()]
+
+        conn.execute("DELETE FROM sales_items WHERE sale_id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM sales WHERE id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM inventory_transactions WHERE item_id = ANY(%s)", (item_ids,))
+        conn.execute("DELETE FROM item_stock_balances WHERE item_id = ANY(%s)", (item_ids,))
+        conn.execute("DELETE FROM items WHERE id = ANY(%s)", (item_ids,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    rebuild_cash_daily_balances()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark record_sale latency by cart size.")
+    parser.add_argument("--sizes", default="1,5,15,30", help="Comma-separated cart sizes.")
+    parser.add_argument("--runs", type=int, default=20, help="Sales recorded per cart size.")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    tag = uuid.uuid4().hex[:8]
+
+    conn = get_db()
+    try:
+        item_ids, user, payment_method_id = _setup(conn, max(sizes), tag)
+    finally:
+        conn.close()
+
+    try:
+        print(f"  {'cart lines':>10} {'p50':>9} {'p95':>9} {'per line':>9}")
+        sale_no = 0
+        for size in sizes:
+            timings = []
+            for _ in range(args.runs):
+                sale_no += 1
+                data = {
+                    "sales_number": f"BENCH-{tag}-{sale_no}",
+                    "customer_name": "Benchmark",
+                    "payment_method_id": payment_method_id,
+                    "total_amount": 100 * size,
+                    "items": [
+                        {"item_id": item_id, "quantity": 1, "original_price": 100,
+                         "final_price": 100, "discount_percent": 0}
+                        for item_id in item_ids[:size]
+                    ],
+                    "services": [],
+                }
+                started = time.perf_counter()
+                record_sale(data, user["id"], user["username"])
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"  {size:>10} {p50:>7.1f}ms {p95:>7.1f}ms {p50 / size:>7.2f}ms")
+    finally:
+        _cleanup(tag)
+        print("\n🧹 Benchmark sales, ledger rows and items removed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Customer history latency vs. visit count.
+
+    python -m scripts.benchmark_customer_history [--visits 10,100,500,2000] [--runs 10]
+
+Creates a BENCH customer and grows its history to each visit count (every
+sale has two item lines and one service). Then it times:
+  - batched : get_customer_history(), the first page behind
+              /api/customers/<id>/transactions (a fixed number of queries)
+  - per-sale: the old loader, which ran two queries per sale over the whole
+              history
+The batched column should stay flat as visits grow.
+
+The sales are inserted directly, so stock, the cash rollup and the sales
+facts are not touched. Everything created is deleted at the end. Still,
+run it against a dev / staging database.
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from db.database import get_db
+from services.customer_service import get_customer_history
+
+
+def _setup(conn, tag):
+    customer_id = conn.execute("""
+        INSERT INTO customers (customer_no, customer_name)
+        VALUES (%s, %s)
+        RETURNING id
+    """, (f"BENCH-{tag}", f"BENCH HISTORY {tag}")).fetchone()["id"]
+    item_ids = [row["id"] for row in conn.execute("""
+        INSERT INTO items (name, description, category, a4s_selling_price)
+        SELECT 'BENCH HISTORY ' || %s || ' ' || g, 'Synthetic history item', 'Benchmark', 100
+        FROM generate_series(1, 2) AS g
+        RETURNING id
+    """, (tag,)).fetchall()]
+    service_id = conn.execute("""
+        INSERT INTO services (name, category)
+        VALUES (%s, 'Benchmark')
+        RETURNING id
+    """, (f"BENCH HISTORY {tag}",)).fetchone()["id"]
+    conn.commit()
+    return customer_id, item_ids, service_id
+
+
+def _grow_history(conn, tag, customer_id, item_ids, service_id, start, count):
+    sale_ids = [row["id"] for row in conn.execute("""
+        INSERT INTO sales (sales_number, customer_name, customer_id, total_amount, status, transaction_date)
+        SELECT 'BENCH-' || %s || '-' || g, 'Benchmark', %s, 300, 'Paid',
+               NOW() - (g * INTERVAL '1 hour')
+        FROM generate_series(%s, %s) AS g
+        RETURNING id
+    """, (tag, customer_id, start + 1, start + count)).fetchall()]
+    conn.execute("""
+        INSERT INTO sales_items (sale_id, item_id, quantity, original_unit_price, final_unit_price)
+        SELECT s, i, 1, 100, 100
+        FROM UNNEST(%s::int[]) AS s, UNNEST(%s::int[]) AS i
+    """, (sale_ids, item_ids))
+    conn.execute("""
+        INSERT INTO sales_services (sale_id, service_id, price)
+        SELECT s, %s, 100
+        FROM UNNEST(%s::int[]) AS s
+    """, (service_id, sale_ids))
+    conn.commit()
+
+
+def _per_sale_history(customer_id):
+    """The previous loader: every sale, then services and items one sale at a time."""
+    conn = get_db()
+    try:
+        sales = conn.execute("""
+            SELECT s.id FROM sales s
+            WHERE s.customer_id = %s
+            ORDER BY s.transaction_date DESC
+        """, (customer_id,)).fetchall()
+        for sale in sales:
+            conn.execute("""
+                SELECT sv.name, ss.price
+                FROM sales_services ss
+                JOIN services sv ON sv.id = ss.service_id
+                WHERE ss.sale_id = %s
+            """, (sale["id"],)).fetchall()
+            conn.execute("""
+                SELECT i.name, si.quantity, si.final_unit_price
+                FROM sales_items si
+                JOIN items i ON i.id = si.item_id
+                WHERE si.sale_id = %s
+            """, (sale["id"],)).fetchall()
+    finally:
+        conn.close()
+
+
+def _time(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def _cleanup(tag):
+    conn = get_db()
+    try:
+        sale_ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM sales WHERE sales_number LIKE %s", (f"BENCH-{tag}-%",)
+        ).fetchall()]
+        conn.execute("DELETE FROM sales_items WHERE sale_id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM sales_services WHERE sale_id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM sales WHERE id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM items WHERE name LIKE %s", (f"BENCH HISTORY {tag} %",))
+        conn.execute("DELETE FROM services WHERE name = %s", (f"BENCH HISTORY {tag}",))
+        conn.execute("DELETE FROM customers WHERE customer_no = %s", (f"BENCH-{tag}",))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark customer history loading by visit count.")
+    parser.add_argument("--visits", default="10,100,500,2000", help="Comma-separated visit counts.")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per visit count.")
+    args = parser.parse_args()
+
+    visit_counts = sorted(int(v) for v in args.visits.split(",") if v.strip())
+    tag = uuid.uuid4().hex[:8]
+
+    conn = get_db()
+    try:
+        customer_id, item_ids, service_id = _setup(conn, tag)
+
+        print(f"  {'visits':>7} {'batched':>10} {'per-sale':>10}")
+        created = 0
+        for visits in visit_counts:
+            _grow_history(conn, tag, customer_id, item_ids, service_id, created, visits - created)
+            created = visits
+
+            batched = _time(lambda: get_customer_history(customer_id), args.runs)
+            per_sale = _time(lambda: _per_sale_history(customer_id), args.runs)
+            print(f"  {visits:>7} {batched:>8.1f}ms {per_sale:>8.1f}ms")
+    finally:
+        conn.close()
+        _cleanup(tag)
+        print("\n🧹 Benchmark customer, sales, items and services removed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Item search latency at catalogue scale: legacy ILIKE chain vs ranked pg_trgm search.
+
+    python -m scripts.benchmark_item_search [--items 50000] [--runs 20]
+
+Pads the items table with synthetic rows inside a transaction, times both
+search shapes for a set of typical (and misspelled) queries, then rolls
+everything back.
+"""
+import argparse
+import statistics
+import time
+
+from db.database import get_db
+from services.search_service import build_search_clause, set_similarity_threshold
+
+QUERIES = [
+    "oil",
+    "brake pad",
+    "brak pad",        # typo
+    "chain 428",
+    "spark plug ngk",
+    "tire 80/90",
+    "mobil 10w40",
+]
+
+WORDS = [
+    "Brake", "Pad", "Oil", "Filter", "Chain", "Sprocket", "Spark", "Plug", "Tire",
+    "Tube", "Cable", "Clutch", "Bearing", "Mirror", "Grip", "Lever", "Bulb", "Belt",
+    "Gasket", "Piston", "Ring", "Valve", "Seal", "Shock", "Fork", "Horn", "Battery",
+]
+
+
+def _legacy_search(conn, query):
+    words = query.split()
+    query_parts = []
+    params = []
+    for word in words:
+        query_parts.append("(name ILIKE %s OR description ILIKE %s)")
+        pattern = f"%{word}%"
+        params.extend([pattern, pattern])
+    return conn.execute(f"""
+        SELECT * FROM items
+        WHERE {" AND ".join(query_parts)}
+        ORDER BY id DESC
+        LIMIT 100
+    """, params).fetchall()
+
+
+def _ranked_search(conn, query):
+    where_sql, where_params, order_sql, order_params = build_search_clause(query, ["name", "description"])
+    set_similarity_threshold(conn)
+    return conn.execute(f"""
+        SELECT * FROM items
+        WHERE {where_sql}
+        ORDER BY {order_sql}, id DESC
+        LIMIT 100
+    """, where_params + order_params).fetchall()
+
+
+def _time(fn, conn, query, runs):
+    timings = []
+    rows = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = fn(conn, query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark item search at catalogue scale.")
+    parser.add_argument("--items", type=int, default=50000, help="Target catalogue size.")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per query.")
+    args = parser.parse_args()
+
+    conn = get_db()
+    try:
+        existing = conn.execute("SELECT COUNT(*) AS total FROM items").fetchone()["total"]
+        to_add = max(0, args.items - existing)
+
+        if to_add:
+            conn.execute("""
+                INSERT INTO items (name, description, category, a4s_selling_price)
+                SELECT
+                    'BENCH ' || (%s::text[])[1 + (g %% array_length(%s::text[], 1))]
+                             || ' ' || (%s::text[])[1 + ((g / 7) %% array_length(%s::text[], 1))]
+                             || ' ' || g,
+                    'Synthetic benchmark item ' || md5(g::text),
+                    'Benchmark',
+                    100
+                FROM generate_series(1, %s) AS g
+            """, (WORDS, WORDS, WORDS, WORDS, to_add))
+        conn.execute("ANALYZE items")
+
+        print(f"items: {existing + to_add} ({to_add} synthetic, rolled back afterwards)\n")
+        print(f"  {'query':<18} {'legacy p50':>11} {'p95':>8} {'hits':>5}   {'ranked p50':>11} {'p95':>8} {'hits':>5}")
+        for query in QUERIES:
+            legacy_p50, legacy_p95, legacy_hits = _time(_legacy_search, conn, query, args.runs)
+            ranked_p50, ranked_p95, ranked_hits = _time(_ranked_search, conn, query, args.runs)
+            print(
+                f"  {query:<18} {legacy_p50:>9.1f}ms {legacy_p95:>6.1f}ms {legacy_hits:>5}"
+                f"   {ranked_p50:>9.1f}ms {ranked_p95:>6.1f}ms {ranked_hits:>5}"
+            )
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Before/after query plans for the inventory_transactions index set.
+
+    python -m scripts.benchmark_ledger_indexes [--item-id 12] [--days 30]
+
+Runs each query with EXPLAIN (ANALYZE, BUFFERS) twice: once with the ledger
+indexes dropped inside a transaction ("before"), then with them in place
+("after"). Everything is rolled back, so the schema is left untouched — but
+DROP INDEX holds an exclusive lock until the rollback, so do not point this
+at a live shop database during business hours.
+
+Finally checks that the sale-detail lookup is an index-only scan.
+"""
+import argparse
+import time
+
+from db.database import get_db
+from db.ledger import INVENTORY_TRANSACTION_INDEXES
+
+QUERIES = {
+    "stock sum (one item)": ("""
+        SELECT COALESCE(SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END), 0)
+             - COALESCE(SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END), 0)
+        FROM inventory_transactions
+        WHERE item_id = %(item_id)s
+          AND transaction_type IN ('IN', 'OUT')
+    """),
+    "stock sum (all items)": ("""
+        SELECT item_id,
+               SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END)
+             - SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END) AS on_hand
+        FROM inventory_transactions
+        GROUP BY item_id
+    """),
+    "top sellers (last N days)": ("""
+        SELECT item_id, SUM(quantity) AS total_sold
+        FROM inventory_transactions
+        WHERE transaction_type = 'OUT'
+          AND transaction_date >= NOW() - (%(days)s * INTERVAL '1 day')
+        GROUP BY item_id
+        ORDER BY total_sold DESC
+        LIMIT 10
+    """),
+    "audit trail page": ("""
+        SELECT t.id, t.item_id, t.quantity, t.transaction_type, t.transaction_date
+        FROM inventory_transactions t
+        WHERE t.transaction_date >= NOW() - (%(days)s * INTERVAL '1 day')
+        ORDER BY t.transaction_date DESC
+        LIMIT 50
+    """),
+    "PO / sale reference lookup": ("""
+        SELECT id, item_id, quantity
+        FROM inventory_transactions
+        WHERE reference_type = 'PURCHASE_ORDER'
+          AND reference_id = %(reference_id)s
+          AND transaction_type = 'ORDER'
+    """),
+    # Same lookup as /sales/details/<id>; expect an Index Only Scan on idx_inv_tx_reference
+    "sale detail lines": ("""
+        SELECT item_id, quantity, unit_price
+        FROM inventory_transactions
+        WHERE reference_type = 'SALE'
+          AND reference_id = %(sale_id)s
+    """),
+}
+
+
+def _explain(cur, sql, params):
+    started = time.perf_counter()
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+    plan = [row[0] for row in cur.fetchall()]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return plan, elapsed_ms
+
+
+def _run_all(cur, params, label):
+    results = {}
+    for name, sql in QUERIES.items():
+        plan, elapsed_ms = _explain(cur, sql, params)
+        results[name] = elapsed_ms
+        print(f"\n── {label}: {name} ({elapsed_ms:.1f} ms)")
+        for line in plan:
+            print(f"   {line}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ledger query plans with and without indexes.")
+    parser.add_argument("--item-id", type=int, default=None, help="Item for the single-item stock sum (default: busiest item).")
+    parser.add_argument("--reference-id", type=int, default=None, help="PO id for the reference lookup (default: latest PO).")
+    parser.add_argument("--sale-id", type=int, default=None, help="Sale for the sale-detail lookup (default: latest sale).")
+    parser.add_argument("--days", type=int, default=30, help="Window for the date-filtered queries.")
+    args = parser.parse_args()
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT COUNT(*) AS total FROM inventory_transactions")
+        print(f"inventory_transactions rows: {cur.fetchone()['total']}")
+
+        item_id = args.item_id
+        if item_id is None:
+            cur.execute("""
+                SELECT item_id FROM inventory_transactions
+                GROUP BY item_id ORDER BY COUNT(*) DESC LIMIT 1
+            """)
+            row = cur.fetchone()
+            item_id = row["item_id"] if row else 0
+
+        reference_id = args.reference_id
+        if reference_id is None:
+            cur.execute("SELECT COALESCE(MAX(id), 0) AS po_id FROM purchase_orders")
+            reference_id = cur.fetchone()["po_id"]
+
+        sale_id = args.sale_id
+        if sale_id is None:
+            cur.execute("SELECT COALESCE(MAX(id), 0) AS sale_id FROM sales")
+            sale_id = cur.fetchone()["sale_id"]
+
+        params = {"item_id": item_id, "reference_id": reference_id, "sale_id": sale_id, "days": args.days}
+
+        for index_name, _ in INVENTORY_TRANSACTION_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS {index_name}")
+        cur.execute("ANALYZE inventory_transactions")
+        before = _run_all(cur, params, "BEFORE")
+
+        conn.rollback()
+
+        cur.execute("ANALYZE inventory_transactions")
+        after = _run_all(cur, params, "AFTER")
+
+        print("\nSummary (ms)")
+        print(f"  {'query':<30} {'before':>10} {'after':>10}")
+        for name in QUERIES:
+            print(f"  {name:<30} {before[name]:>10.1f} {after[name]:>10.1f}")
+
+        # The sale-detail popup should never touch the ledger heap
+        plan, _ = _explain(cur, QUERIES["sale detail lines"], params)
+        if any("Index Only Scan" in line for line in plan):
+            print("\n✅ sale detail lines: index-only scan")
+        else:
+            print("\n❌ sale detail lines: not index-only (VACUUM inventory_transactions, then re-run)")
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
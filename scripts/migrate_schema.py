@@ -0,0 +1,42 @@
+"""
+Applies pending schema migrations (what init_db does on app start), or lists them.
+
+    python -m scripts.migrate_schema            # apply pending steps
+    python -m scripts.migrate_schema --status   # show applied / pending only
+"""
+import argparse
+
+from db.database import get_db, get_cursor
+from db.schema import MIGRATIONS, get_schema_version, init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations.")
+    parser.add_argument("--status", action="store_true", help="List migrations without applying anything.")
+    args = parser.parse_args()
+
+    if args.status:
+        conn = get_db()
+        cur = get_cursor(conn)
+        try:
+            current = get_schema_version(cur)
+        finally:
+            cur.close()
+            conn.close()
+
+        for version, name, _ in MIGRATIONS:
+            mark = "✅" if version <= current else "⏳"
+            print(f"  {mark} {version:>3}  {name}")
+        pending = sum(1 for version, _, _ in MIGRATIONS if version > current)
+        print(f"\nSchema version {current}, {pending} pending")
+        return
+
+    applied = init_db()
+    if applied:
+        print(f"✅ Applied {len(applied)} migration(s), schema is at version {applied[-1]}")
+    else:
+        print("✅ Schema is current, nothing to apply")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Converts inventory_transactions into a monthly RANGE-partitioned table.
+
+    python -m scripts.partition_inventory_transactions
+
+Optional — only worth it once the ledger is large. Takes an ACCESS EXCLUSIVE
+lock for the copy, so run it during downtime. After conversion, init_db keeps
+the upcoming monthly partitions created.
+"""
+from db.database import get_db
+from db.ledger import partition_inventory_transactions
+
+conn = get_db()
+
+try:
+    moved = partition_inventory_transactions(conn)
+    conn.commit()
+except Exception:
+    conn.rollback()
+    raise
+finally:
+    conn.close()
+
+if moved is False:
+    print("ℹ inventory_transactions is already partitioned")
+else:
+    print(f"✅ inventory_transactions partitioned by month ({moved} rows moved)")
@@ -0,0 +1,76 @@
+"""
+Start-up import profile: how long `import app` takes and which modules cost the most.
+
+    python -m scripts.profile_startup [--top 25] [--module app]
+
+Imports the module in a fresh interpreter with `python -X importtime` and
+prints the slowest imports by cumulative time. The app module's own time
+includes init_db() (schema check / pending migrations), so the database
+must be reachable. The last lines check that the lazy service modules
+(utils/lazy_import.py) were not imported during start-up.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from utils.lazy_import import LAZY_SERVICE_MODULES
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{"elapsed_ms": elapsed_ms, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def _parse_importtime(stderr):
+    """`import time: self [us] | cumulative | name` lines → [(name, self_ms, cumulative_ms)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.rstrip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+        except ValueError:
+            continue
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile module import times at start-up.")
+    parser.add_argument("--top", type=int, default=25, help="How many modules to list.")
+    parser.add_argument("--module", default="app", help="Entry module to import (app or wsgi).")
+    args = parser.parse_args()
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         _CHILD.format(module=args.module, lazy=LAZY_SERVICE_MODULES)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"❌ import {args.module} failed:\n{result.stderr[-2000:]}")
+        return 1
+
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = _parse_importtime(result.stderr)
+
+    print(f"⏱  import {args.module}: {summary['elapsed_ms']:.0f} ms ({len(rows)} modules)\n")
+    print(f"  {'cumulative':>11} {'self':>9}  module")
+    for name, self_ms, cumulative_ms in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_ms:>9.1f}ms {self_ms:>7.1f}ms  {name}")
+
+    print()
+    for module in LAZY_SERVICE_MODULES:
+        if module in summary["loaded"]:
+            print(f"⚠ {module} was imported at start-up (a plain import of it crept back in)")
+        else:
+            print(f"✅ {module} deferred to first request")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+Recomputes the cash_daily_balances rollup from sales, debt payments and cash entries.
+
+    python -m scripts.rebuild_cash_balances
+
+Run after changing PHYSICAL_CASH_CATEGORIES or a payment method's category.
+"""
+from services.cash_service import rebuild_cash_daily_balances
+
+written = rebuild_cash_daily_balances()
+print(f"✅ Rebuilt cash_daily_balances ({written} day rows)")
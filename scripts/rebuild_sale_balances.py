@@ -0,0 +1,47 @@
+"""
+Rebuilds (or verifies) sale_balances from sales_services and debt_payments.
+
+    python -m scripts.rebuild_sale_balances            # full rebuild
+    python -m scripts.rebuild_sale_balances --verify   # report drift only
+
+Run after bulk edits to sales / debt payments made outside the app
+(e.g. migrate.py).
+"""
+import argparse
+import sys
+
+from services.debt_service import rebuild_sale_balances, verify_sale_balances
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify sale_balances.")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Compare sale_balances against the source tables without writing anything.",
+    )
+    args = parser.parse_args()
+
+    if args.verify:
+        drift = verify_sale_balances()
+        if not drift:
+            print("✅ sale_balances matches sales_services / debt_payments")
+            return 0
+
+        print(f"❌ {len(drift)} sale(s) drifted:")
+        for row in drift:
+            print(
+                f"  #{row['sale_id']} {row['sales_number']}: "
+                f"paid {row['actual_amount_paid_total']}/{row['expected_amount_paid_total']}, "
+                f"services {row['actual_service_total']}/{row['expected_service_total']}, "
+                f"service paid {row['actual_service_paid_total']}/{row['expected_service_paid_total']}"
+            )
+        return 1
+
+    written = rebuild_sale_balances()
+    print(f"✅ Rebuilt sale_balances ({written} sales)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
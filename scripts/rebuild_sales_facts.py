@@ -0,0 +1,17 @@
+"""
+Recomputes the daily sales facts and per-item daily movements from the source tables.
+
+    python -m scripts.rebuild_sales_facts
+
+Run after bulk edits to sales / debt payments made outside the app, or to
+backfill the facts on an existing database.
+"""
+from services.sales_facts_service import rebuild_sales_facts
+from services.stock_service import rebuild_stock_balances
+
+written = rebuild_sales_facts()
+for table, rows in written.items():
+    print(f"✅ Rebuilt {table} ({rows} rows)")
+
+items = rebuild_stock_balances()
+print(f"✅ Rebuilt item_stock_balances + item_daily_movements ({items} items)")
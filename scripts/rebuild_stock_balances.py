@@ -0,0 +1,45 @@
+"""
+Rebuilds (or verifies) the item_stock_balances projection from the ledger.
+
+    python -m scripts.rebuild_stock_balances            # full rebuild
+    python -m scripts.rebuild_stock_balances --verify   # report drift only
+"""
+import argparse
+import sys
+
+from services.stock_service import rebuild_stock_balances, verify_stock_balances
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify item_stock_balances.")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Compare the projection against the ledger without writing anything.",
+    )
+    args = parser.parse_args()
+
+    if args.verify:
+        drift = verify_stock_balances()
+        if not drift:
+            print("✅ item_stock_balances matches the ledger")
+            return 0
+
+        print(f"❌ {len(drift)} item(s) drifted from the ledger:")
+        for row in drift:
+            print(
+                f"  #{row['item_id']} {row['name']}: "
+                f"on_hand {row['actual_on_hand']} (expected {row['expected_on_hand']}), "
+                f"in {row['actual_total_in']}/{row['expected_total_in']}, "
+                f"out {row['actual_total_out']}/{row['expected_total_out']}, "
+                f"on_order {row['actual_on_order']}/{row['expected_on_order']}"
+            )
+        return 1
+
+    written = rebuild_stock_balances()
+    print(f"✅ Rebuilt item_stock_balances ({written} items)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
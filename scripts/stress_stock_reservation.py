@@ -0,0 +1,221 @@
+"""
+Concurrency stress test for checkout stock reservation.
+
+    python -m scripts.stress_stock_reservation [--threads 8] [--hot-items 3] [--stock 25]
+
+Phase 1 (contention): every thread hammers the same few "hot" items with
+multi-line carts in shuffled line order. Passes when exactly --stock units
+of each hot item were sold, on_hand ended at 0 (never negative) and there
+were no deadlocks.
+
+Phase 2 (isolation): each thread sells its own item. Throughput is compared
+with a single thread doing the same work; unrelated items must not queue
+behind each other.
+
+Sales commit for real, so run against a dev / staging database. Everything
+created is deleted at the end and the cash rollup is rebuilt.
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+
+from db.database import get_db
+from services.cash_service import rebuild_cash_daily_balances
+from services.stock_service import verify_stock_balances
+from services.transactions_service import add_transaction, record_sale
+
+
+def _create_items(conn, tag, label, count, stock):
+    rows = conn.execute("""
+        INSERT INTO items (name, description, category, a4s_selling_price)
+        SELECT 'STRESS ' || %s || ' ' || %s || ' ' || g, 'Synthetic stress item', 'Benchmark', 100
+        FROM generate_series(1, %s) AS g
+        RETURNING id
+    """, (tag, label, count)).fetchall()
+    item_ids = [row["id"] for row in rows]
+    for item_id in item_ids:
+        add_transaction(item_id=item_id, quantity=stock, transaction_type='IN',
+                        change_reason='BENCHMARK', external_conn=conn)
+    return item_ids
+
+
+def _sale(tag, counter, item_ids, user, payment_method_id):
+    with counter["lock"]:
+        counter["n"] += 1
+        sale_no = counter["n"]
+    data = {
+        "sales_number": f"STRESS-{tag}-{sale_no}",
+        "customer_name": "Stress test",
+        "payment_method_id": payment_method_id,
+        "total_amount": 100 * len(item_ids),
+        "items": [
+            {"item_id": item_id, "quantity": 1, "original_price": 100,
+             "final_price": 100, "discount_percent": 0}
+            for item_id in item_ids
+        ],
+        "services": [],
+    }
+    record_sale(data, user["id"], user["username"])
+
+
+def _run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started
+
+
+def _contention_phase(args, tag, counter, hot_ids, user, payment_method_id):
+    results = {"sold": 0, "rejected": 0, "errors": []}
+    results_lock = threading.Lock()
+
+    def worker(_):
+        rng = random.Random()
+        while True:
+            cart = rng.sample(hot_ids, rng.randint(1, len(hot_ids)))
+            try:
+                _sale(tag, counter, cart, user, payment_method_id)
+                with results_lock:
+                    results["sold"] += 1
+            except ValueError:
+                with results_lock:
+                    results["rejected"] += 1
+                    if results["rejected"] >= args.threads * 20:
+                        return
+            except Exception as e:  # deadlocks / serialization failures land here
+                with results_lock:
+                    results["errors"].append(repr(e))
+                return
+
+            conn = get_db()
+            try:
+                remaining = conn.execute(
+                    "SELECT COALESCE(SUM(on_hand), 0) AS remaining FROM item_stock_balances WHERE item_id = ANY(%s)",
+                    (hot_ids,),
+                ).fetchone()["remaining"]
+            finally:
+                conn.close()
+            if remaining <= 0:
+                return
+
+    elapsed = _run_threads(args.threads, worker)
+
+    conn = get_db()
+    try:
+        rows = conn.execute("""
+            SELECT b.item_id, b.on_hand,
+                   (SELECT COALESCE(SUM(quantity), 0) FROM sales_items si WHERE si.item_id = b.item_id) AS sold
+            FROM item_stock_balances b
+            WHERE b.item_id = ANY(%s)
+            ORDER BY b.item_id
+        """, (hot_ids,)).fetchall()
+    finally:
+        conn.close()
+
+    ok = not results["errors"]
+    print(f"\n1️⃣  Contention: {args.threads} threads on {len(hot_ids)} hot items, {args.stock} units each ({elapsed:.1f}s)")
+    print(f"   sales committed: {results['sold']}, rejected as insufficient: {results['rejected']}")
+    for row in rows:
+        item_ok = row["on_hand"] == 0 and int(row["sold"]) == args.stock
+        ok = ok and item_ok
+        print(f"   item {row['item_id']}: sold {row['sold']}, on_hand {row['on_hand']} {'✅' if item_ok else '❌'}")
+    for error in results["errors"][:5]:
+        print(f"   ❌ {error}")
+    return ok
+
+
+def _isolation_phase(args, tag, counter, cold_ids, user, payment_method_id):
+    per_thread = args.sales_per_thread
+
+    def worker(index):
+        for _ in range(per_thread):
+            _sale(tag, counter, [cold_ids[index]], user, payment_method_id)
+
+    def single(_):
+        for index in range(args.threads):
+            for _ in range(per_thread):
+                _sale(tag, counter, [cold_ids[args.threads + index]], user, payment_method_id)
+
+    serial = _run_threads(1, single)
+    parallel = _run_threads(args.threads, worker)
+    total = per_thread * args.threads
+
+    print(f"\n2️⃣  Isolation: {total} sales on {args.threads} unrelated items")
+    print(f"   1 thread : {serial:.2f}s ({total / serial:.0f} sales/s)")
+    print(f"   {args.threads} threads: {parallel:.2f}s ({total / parallel:.0f} sales/s), speed-up x{serial / parallel:.1f}")
+    return True
+
+
+def _cleanup(tag):
+    conn = get_db()
+    try:
+        item_ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM items WHERE name LIKE %s", (f"STRESS {tag} %",)
+        ).fetchall()]
+        sale_ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM sales WHERE sales_number LIKE %s", (f"STRESS-{tag}-%",)
+        ).fetchall()]
+
+        conn.execute("DELETE FROM sales_items WHERE sale_id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM sales WHERE id = ANY(%s)", (sale_ids,))
+        conn.execute("DELETE FROM inventory_transactions WHERE item_id = ANY(%s)", (item_ids,))
+        conn.execute("DELETE FROM item_stock_balances WHERE item_id = ANY(%s)", (item_ids,))
+        conn.execute("DELETE FROM items WHERE id = ANY(%s)", (item_ids,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    rebuild_cash_daily_balances()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress-test concurrent checkout stock reservation.")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent tills (keep <= DB_POOL_MAX).")
+    parser.add_argument("--hot-items", type=int, default=3, help="Items every thread competes for.")
+    parser.add_argument("--stock", type=int, default=25, help="Starting stock of each hot item.")
+    parser.add_argument("--sales-per-thread", type=int, default=25, help="Sales per thread in the isolation phase.")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    counter = {"n": 0, "lock": threading.Lock()}
+
+    conn = get_db()
+    try:
+        hot_ids = _create_items(conn, tag, "HOT", args.hot_items, args.stock)
+        cold_ids = _create_items(conn, tag, "COLD", args.threads * 2, args.sales_per_thread * args.threads)
+        user = conn.execute("SELECT id, username FROM users ORDER BY id LIMIT 1").fetchone()
+        payment_method = conn.execute("""
+            SELECT id FROM payment_methods
+            WHERE is_active = 1 AND COALESCE(category, '') <> 'Debt'
+            ORDER BY id LIMIT 1
+        """).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    if not user or not payment_method:
+        _cleanup(tag)
+        raise SystemExit("❌ Needs at least one user and one active non-debt payment method.")
+
+    try:
+        contention_ok = _contention_phase(args, tag, counter, hot_ids, user, payment_method["id"])
+        _isolation_phase(args, tag, counter, cold_ids, user, payment_method["id"])
+        stress_ids = set(hot_ids + cold_ids)
+        drift = [row for row in verify_stock_balances() if row["item_id"] in stress_ids]
+        print(f"\n   projection vs ledger drift rows: {len(drift)}")
+    finally:
+        _cleanup(tag)
+
+    if contention_ok and not drift:
+        print("\n✅ No oversell, no deadlocks, projection matches the ledger.")
+    else:
+        raise SystemExit("\n❌ Stock reservation check FAILED.")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,46 +8,25 @@ def get_dashboard_stats():
     ).fetchone()[0]
 
     total_stock = conn.execute("""
-        SELECT COALESCE(SUM(
-            CASE 
-                WHEN transaction_type = 'IN' THEN quantity
-                ELSE -quantity
-            END
-        ), 0)
-        FROM inventory_transactions
+        SELECT COALESCE(SUM(on_hand), 0)
+        FROM item_stock_balances
     """).fetchone()[0]
 
     low_stock_count = conn.execute("""
-        SELECT COUNT(*) FROM (
-            SELECT items.id,
-            COALESCE(SUM(
-                CASE 
-                    WHEN inventory_transactions.transaction_type = 'IN'
-                    THEN inventory_transactions.quantity
-                    ELSE -inventory_transactions.quantity
-                END
-            ), 0) AS current_stock
-            FROM items
-            LEFT JOIN inventory_transactions
-                ON items.id = inventory_transactions.item_id
-            GROUP BY items.id
-            HAVING COALESCE(SUM(
-                CASE 
-                    WHEN inventory_transactions.transaction_type = 'IN'
-                    THEN inventory_transactions.quantity
-                    ELSE -inventory_transactions.quantity
-                END
-            ), 0) <= items.reorder_level
-        )
+        SELECT COUNT(*)
+        FROM items
+        LEFT JOIN item_stock_balances b
+            ON b.item_id = items.id
+        WHERE COALESCE(b.on_hand, 0) <= items.reorder_level
     """).fetchone()[0]
 
     top_item = conn.execute("""
-        SELECT items.name, SUM(inventory_transactions.quantity) AS total_sold
-        FROM inventory_transactions
-        JOIN items ON items.id = inventory_transactions.item_id
-        WHERE inventory_transactions.transaction_type = 'OUT'
-        AND inventory_transactions.transaction_date >= (NOW() - INTERVAL '30 days')
+        SELECT items.name, SUM(m.qty_out) AS total_sold
+        FROM item_daily_movements m
+        JOIN items ON items.id = m.item_id
+        WHERE m.movement_date >= CURRENT_DATE - 30
         GROUP BY items.id
+        HAVING SUM(m.qty_out) > 0
         ORDER BY total_sold DESC
         LIMIT 1
     """).fetchone()
@@ -61,14 +40,14 @@ def get_dashboard_stats():
 def get_hot_items(limit=5):
     conn = get_db()
     rows = conn.execute("""
-        SELECT 
+        SELECT
             items.name,
-            SUM(inventory_transactions.quantity) AS total_sold_last_30_days
-        FROM inventory_transactions
-        JOIN items ON items.id = inventory_transactions.item_id
-        WHERE inventory_transactions.transaction_type = 'OUT'
-        AND inventory_transactions.transaction_date >= (NOW() - INTERVAL '30 days')
+            SUM(m.qty_out) AS total_sold_last_30_days
+        FROM item_daily_movements m
+        JOIN items ON items.id = m.item_id
+        WHERE m.movement_date >= CURRENT_DATE - 30
         GROUP BY items.id
+        HAVING SUM(m.qty_out) > 0
         ORDER BY total_sold_last_30_days DESC
         LIMIT %s
     """, (limit,)).fetchall()
@@ -101,24 +80,11 @@ def get_low_stock_items():
         SELECT 
             items.name,
             items.reorder_level,
-            COALESCE(SUM(
-                CASE 
-                    WHEN inventory_transactions.transaction_type = 'IN'
-                    THEN inventory_transactions.quantity
-                    ELSE -inventory_transactions.quantity
-                END
-            ), 0) AS current_stock
+            COALESCE(b.on_hand, 0) AS current_stock
         FROM items
-        LEFT JOIN inventory_transactions
-            ON items.id = inventory_transactions.item_id
-        GROUP BY items.id
-        HAVING COALESCE(SUM(
-            CASE 
-                WHEN inventory_transactions.transaction_type = 'IN'
-                THEN inventory_transactions.quantity
-                ELSE -inventory_transactions.quantity
-            END
-        ), 0) <= items.reorder_level
+        LEFT JOIN item_stock_balances b
+            ON b.item_id = items.id
+        WHERE COALESCE(b.on_hand, 0) <= items.reorder_level
         ORDER BY current_stock ASC
     """).fetchall()
     conn.close()
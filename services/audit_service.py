@@ -1,105 +1,108 @@
+import os
+import threading
+import time
+
 from db.database import get_db
+from db.filters import date_range_conditions
 from utils.formatters import format_date
 
 PER_PAGE = 50
 
+# Totals are only for the "N total entries / Page x of y" labels, so they are
+# cached per filter combination instead of re-counting the ledger on every page.
+AUDIT_COUNT_TTL_SECONDS = int(os.environ.get("AUDIT_COUNT_TTL_SECONDS", 60))
 
-def get_audit_trail(page=1, start_date=None, end_date=None, movement_type=None, has_discount=False):
-    """
-    Paginated audit trail with optional filters.
+_count_lock = threading.Lock()
+_count_cache = {}
 
-    - movement_type: 'IN', 'OUT', 'ORDER', or None for all
-    - start_date / end_date: YYYY-MM-DD strings
-    - has_discount: when true, include only SALE movement rows from sales that have discounted items
-    - Returns dict with rows, pagination metadata
 
-    NOTE (future branches): add branch_id filter here when ready.
-    """
-    conn = get_db()
-    offset = (page - 1) * PER_PAGE
+# ─────────────────────────────────────────────
+# PRIVATE HELPERS
+# ─────────────────────────────────────────────
 
-    inv_conditions = []
-    inv_params = []
-    sale_conditions = []
-    sale_params = []
+_DISCOUNTED_SALE_SQL = """
+    EXISTS (
+        SELECT 1
+        FROM sales_items si
+        WHERE si.sale_id = {sale_id}
+          AND (si.discount_percent > 0 OR si.discount_amount > 0)
+    )
+"""
 
-    if start_date:
-        inv_conditions.append("DATE(t.transaction_date) >= %s")
-        inv_params.append(start_date)
-        sale_conditions.append("DATE(s.transaction_date) >= %s")
-        sale_params.append(start_date)
-
-    if end_date:
-        inv_conditions.append("DATE(t.transaction_date) <= %s")
-        inv_params.append(end_date)
-        sale_conditions.append("DATE(s.transaction_date) <= %s")
-        sale_params.append(end_date)
 
+def _ledger_conditions(start_date=None, end_date=None, movement_type=None, has_discount=False):
+    """Filter conditions on inventory_transactions t, as ([condition, ...], [param, ...])."""
+    conditions, params = date_range_conditions("t.transaction_date", start_date, end_date)
     if movement_type:
-        inv_conditions.append("t.transaction_type = %s")
-        inv_params.append(movement_type)
-        if movement_type != "OUT":
-            sale_conditions.append("1 = 0")
-
+        conditions.append("t.transaction_type = %s")
+        params.append(movement_type)
     if has_discount:
-        inv_conditions.append("""
-            (
-                t.reference_type = 'SALE'
-                AND EXISTS (
-                    SELECT 1
-                    FROM sales_items si
-                    WHERE si.sale_id = t.reference_id
-                      AND (si.discount_percent > 0 OR si.discount_amount > 0)
-                )
-            )
-        """)
-        sale_conditions.append("""
-            EXISTS (
-                SELECT 1
-                FROM sales_items si
-                WHERE si.sale_id = s.id
-                  AND (si.discount_percent > 0 OR si.discount_amount > 0)
-            )
-        """)
+        conditions.append("t.reference_type = 'SALE'")
+        conditions.append(_DISCOUNTED_SALE_SQL.format(sale_id="t.reference_id"))
+    return conditions, params
 
-    inv_where_clause = ("WHERE " + " AND ".join(inv_conditions)) if inv_conditions else ""
-    sale_extra_clause = (" AND " + " AND ".join(sale_conditions)) if sale_conditions else ""
 
-    count_query = f"""
-        SELECT COUNT(*) FROM (
-            SELECT
-                t.reference_id,
-                t.transaction_date,
-                t.transaction_type,
-                t.change_reason
-            FROM inventory_transactions t
-            JOIN items i ON t.item_id = i.id
-            {inv_where_clause}
-            GROUP BY t.reference_id, t.transaction_date, t.transaction_type, t.change_reason
+def _cursor_id_op(source, cursor):
+    # (transaction_date, row_id, source) DESC: at an equal date and id, only
+    # sources that sort below the cursor's come after it
+    return "<=" if source < cursor[2] else "<"
 
-            UNION ALL
 
-            SELECT
-                s.id AS reference_id,
-                s.transaction_date,
-                'OUT' AS transaction_type,
-                'SERVICE_ONLY_SALE' AS change_reason
-            FROM sales s
-            WHERE NOT EXISTS (
-                SELECT 1
-                FROM inventory_transactions t2
-                WHERE t2.reference_type = 'SALE'
-                  AND CAST(t2.reference_id AS TEXT) = CAST(s.id AS TEXT)
-            )
-            {sale_extra_clause}
-        )
+def _audit_trail_sql(start_date=None, end_date=None, movement_type=None, has_discount=False,
+                     limit=None, cursor=None, floor=None):
     """
-    total = conn.execute(count_query, inv_params + sale_params).fetchone()[0]
-    total_pages = max(1, -(-total // PER_PAGE))
+    Ledger movements grouped per reference, plus sales with no ledger rows
+    (service-only sales), as one UNION ALL with every filter pushed into its
+    branch.
+
+    Each row carries (transaction_date, row_id, source): row_id is MIN(t.id)
+    for a ledger group or the sale id, so the triple, newest first with NULL
+    dates last (_TRAIL_ORDER), is a total order usable as a keyset cursor.
 
-    data_query = f"""
-        SELECT
+    Without `limit` the branches are unordered (counts). With it, each branch
+    is cut to its own first `limit` rows after `cursor` on the raw
+    transaction_date, and the caller merges them. `floor` (from
+    _ledger_page_floor) bounds the ledger rows read to the dates that can
+    still make the page.
+    """
+    branches = []
+    params = []
+
+    inv_conditions, inv_params = _ledger_conditions(start_date, end_date, movement_type, has_discount)
+    having = ""
+    having_params = []
+    if floor is not None:
+        # Enough dated groups at or after the floor: undated rows can't make the page
+        inv_conditions.append("t.transaction_date >= %s::timestamp")
+        inv_params.append(floor)
+    if cursor:
+        stamp, row_id, _ = cursor
+        id_op = _cursor_id_op("LEDGER", cursor)
+        if stamp == "-infinity":
+            inv_conditions.append("t.transaction_date IS NULL")
+            having = f"HAVING MIN(t.id) {id_op} %s"
+            having_params = [row_id]
+        else:
+            inv_conditions.append(
+                "t.transaction_date <= %s::timestamp"
+                if floor is not None
+                else "(t.transaction_date <= %s::timestamp OR t.transaction_date IS NULL)"
+            )
+            inv_params.append(stamp)
+            having = (
+                "HAVING (t.transaction_date < %s::timestamp OR t.transaction_date IS NULL "
+                f"OR MIN(t.id) {id_op} %s)"
+            )
+            having_params = [stamp, row_id]
+    inv_where = ("WHERE " + " AND ".join(inv_conditions)) if inv_conditions else ""
+    inv_page = "ORDER BY t.transaction_date DESC NULLS LAST, MIN(t.id) DESC LIMIT %s" if limit else ""
+
+    # transaction_date leads the GROUP BY so groups come out in index order
+    branches.append(f"""
+        (SELECT
             t.transaction_date,
+            'LEDGER' AS source,
+            MIN(t.id) AS row_id,
             t.transaction_type,
             SUM(t.quantity) AS total_qty,
             t.user_name,
@@ -116,63 +119,225 @@ def get_audit_trail(page=1, start_date=None, end_date=None, movement_type=None,
             ON t.reference_id = s.id AND t.reference_type = 'SALE'
         LEFT JOIN purchase_orders po
             ON t.reference_id = po.id AND t.reference_type = 'PURCHASE_ORDER'
-        {inv_where_clause}
+        {inv_where}
         GROUP BY
-            t.reference_id,
             t.transaction_date,
+            t.reference_id,
             t.transaction_type,
             t.change_reason,
             t.user_name,
             t.reference_type,
             s.sales_number,
             po.po_number
+        {having}
+        {inv_page})
+    """)
+    params.extend(inv_params)
+    params.extend(having_params)
+    if limit:
+        params.append(limit)
 
-        UNION ALL
-
-        SELECT
-            s.transaction_date,
-            'OUT' AS transaction_type,
-            0 AS total_qty,
-            COALESCE(u.username, 'System') AS user_name,
-            'SERVICE_ONLY_SALE' AS change_reason,
-            'SALE' AS reference_type,
-            s.id AS reference_id,
-            s.notes,
-            s.sales_number,
-            NULL AS po_number,
-            COALESCE((
-                SELECT STRING_AGG(sv.name::text, ', ' ORDER BY sv.name)
-                FROM sales_services ss
-                JOIN services sv ON sv.id = ss.service_id
-                WHERE ss.sale_id = s.id
-            ), 'Service-only sale') AS items_summary
-        FROM sales s
-        LEFT JOIN users u ON u.id = s.user_id
-        WHERE NOT EXISTS (
-            SELECT 1
-            FROM inventory_transactions t2
-            WHERE t2.reference_type = 'SALE'
-              AND CAST(t2.reference_id AS TEXT) = CAST(s.id AS TEXT)
-        )
-        {sale_extra_clause}
-
-        ORDER BY transaction_date DESC
-        LIMIT %s OFFSET %s
+    # Service-only sales are OUT movements; skip the branch for IN / ORDER
+    if movement_type in (None, "OUT"):
+        sale_conditions, sale_params = date_range_conditions("s.transaction_date", start_date, end_date)
+        if has_discount:
+            sale_conditions.append(_DISCOUNTED_SALE_SQL.format(sale_id="s.id"))
+        sale_extra = "".join(f" AND {condition}" for condition in sale_conditions)
+
+        # Typed reference join, served by idx_inv_tx_reference
+        sale_sql = f"""
+            SELECT
+                s.transaction_date,
+                'SALE' AS source,
+                s.id AS row_id,
+                'OUT' AS transaction_type,
+                0 AS total_qty,
+                COALESCE(u.username, 'System') AS user_name,
+                'SERVICE_ONLY_SALE' AS change_reason,
+                'SALE' AS reference_type,
+                s.id AS reference_id,
+                s.notes,
+                s.sales_number,
+                NULL AS po_number,
+                COALESCE((
+                    SELECT STRING_AGG(sv.name::text, ', ' ORDER BY sv.name)
+                    FROM sales_services ss
+                    JOIN services sv ON sv.id = ss.service_id
+                    WHERE ss.sale_id = s.id
+                ), 'Service-only sale') AS items_summary
+            FROM sales s
+            LEFT JOIN users u ON u.id = s.user_id
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM inventory_transactions t2
+                WHERE t2.reference_type = 'SALE'
+                  AND t2.reference_id = s.id
+            )
+            {sale_extra}
+        """
+
+        if not limit:
+            branches.append(sale_sql)
+            params.extend(sale_params)
+        else:
+            # Dated sales newest first on idx_sales_transaction_date, then the
+            # undated ones, which sort last
+            stamp = cursor[0] if cursor else None
+            id_op = _cursor_id_op("SALE", cursor) if cursor else "<"
+            if stamp != "-infinity":
+                cursor_sql = f" AND (s.transaction_date, s.id) {id_op} (%s::timestamp, %s)" if cursor else ""
+                branches.append(f"""
+                    ({sale_sql} AND s.transaction_date IS NOT NULL{cursor_sql}
+                     ORDER BY s.transaction_date DESC, s.id DESC
+                     LIMIT %s)
+                """)
+                params.extend(sale_params)
+                if cursor:
+                    params.extend([stamp, cursor[1]])
+                params.append(limit)
+
+            cursor_sql = f" AND s.id {id_op} %s" if stamp == "-infinity" else ""
+            branches.append(f"""
+                ({sale_sql} AND s.transaction_date IS NULL{cursor_sql}
+                 ORDER BY s.id DESC
+                 LIMIT %s)
+            """)
+            params.extend(sale_params)
+            if stamp == "-infinity":
+                params.append(cursor[1])
+            params.append(limit)
+
+    return "\nUNION ALL\n".join(branches), params
+
+
+# Newest first, undated rows last
+_TRAIL_ORDER = "transaction_date DESC NULLS LAST, row_id DESC, source DESC"
+
+
+def _ledger_page_floor(conn, filters, cursor, limit):
     """
+    Oldest ledger date a group on the next `limit` rows can have, or None
+    when there is no bound (fewer dates than that are left, so undated rows
+    may make the page too).
+
+    Every date has at least one group, so the dates down to the (limit + 1)th
+    distinct one after the cursor hold at least `limit` whole groups (one
+    spare for the cursor's own, partly consumed date). Reading just those
+    dates keeps the GROUP BY to about a page of ledger rows.
+    """
+    if cursor and cursor[0] == "-infinity":
+        return None
+
+    conditions, params = _ledger_conditions(*filters)
+    conditions.append("t.transaction_date IS NOT NULL")
+    if cursor:
+        conditions.append("t.transaction_date <= %s::timestamp")
+        params.append(cursor[0])
+    params.append(limit)
+
+    row = conn.execute(f"""
+        SELECT DISTINCT t.transaction_date
+        FROM inventory_transactions t
+        WHERE {" AND ".join(conditions)}
+        ORDER BY t.transaction_date DESC
+        LIMIT 1 OFFSET %s
+    """, params).fetchone()
+    return row["transaction_date"] if row else None
+
+
+def encode_audit_cursor(row):
+    """Opaque keyset cursor pointing just after `row` (newest-first order)."""
+    transaction_date = row["transaction_date"]
+    stamp = transaction_date.isoformat() if transaction_date else "-infinity"
+    return f"{stamp}|{row['row_id']}|{row['source']}"
+
+
+def _decode_audit_cursor(cursor):
+    try:
+        stamp, row_id, source = cursor.split("|", 2)
+        if source not in ("LEDGER", "SALE"):
+            raise ValueError
+        return stamp, int(row_id), source
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid audit cursor.")
+
+
+def _count_audit_trail(conn, filters):
+    """Total rows for a filter combination, cached for AUDIT_COUNT_TTL_SECONDS."""
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(filters)
+        if cached and cached[0] > now:
+            return cached[1]
 
-    rows = conn.execute(data_query, inv_params + sale_params + [PER_PAGE, offset]).fetchall()
-    conn.close()
+    trail_sql, params = _audit_trail_sql(*filters)
+    total = conn.execute(f"SELECT COUNT(*) AS total FROM ({trail_sql}) trail", params).fetchone()["total"]
+
+    with _count_lock:
+        # Filters are user-chosen date ranges; keep the cache from growing unbounded
+        if len(_count_cache) > 256:
+            _count_cache.clear()
+        _count_cache[filters] = (now + AUDIT_COUNT_TTL_SECONDS, total)
+    return total
+
+
+# ─────────────────────────────────────────────
+# AUDIT TRAIL
+# ─────────────────────────────────────────────
+
+def get_audit_trail(page=1, start_date=None, end_date=None, movement_type=None, has_discount=False,
+                    after_cursor=None):
+    """
+    Paginated audit trail with optional filters.
+
+    - movement_type: 'IN', 'OUT', 'ORDER', or None for all
+    - start_date / end_date: YYYY-MM-DD strings
+    - has_discount: when true, include only SALE movement rows from sales that have discounted items
+    - after_cursor: next_cursor from the previous page — preferred over page,
+      cost stays flat however deep the page is
+    - Returns dict with rows, next_cursor, pagination metadata
+
+    NOTE (future branches): add branch_id filter here when ready.
+    """
+    filters = (start_date, end_date, movement_type, bool(has_discount))
+    cursor = _decode_audit_cursor(after_cursor) if after_cursor else None
+
+    conn = get_db()
+    try:
+        total = _count_audit_trail(conn, filters)
+        total_pages = max(1, -(-total // PER_PAGE))
+
+        # Numbered jumps without a cursor still work, just not in flat time
+        offset = (page - 1) * PER_PAGE if not cursor and page > 1 else 0
+        limit = offset + PER_PAGE
+        floor = _ledger_page_floor(conn, filters, cursor, limit)
+        trail_sql, params = _audit_trail_sql(*filters, limit=limit, cursor=cursor, floor=floor)
+
+        query = f"SELECT * FROM ({trail_sql}) trail ORDER BY {_TRAIL_ORDER} LIMIT %s"
+        params.append(PER_PAGE)
+        if offset:
+            query += " OFFSET %s"
+            params.append(offset)
+
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = encode_audit_cursor(rows[-1]) if len(rows) == PER_PAGE else None
 
     formatted = [
-        {**dict(r), "transaction_date": format_date(r["transaction_date"], show_time=True)}
+        {
+            **{k: v for k, v in dict(r).items() if k not in ("source", "row_id")},
+            "transaction_date": format_date(r["transaction_date"], show_time=True),
+        }
         for r in rows
     ]
 
     return {
         "rows": formatted,
+        "next_cursor": next_cursor,
         "total": total,
         "page": page,
         "per_page": PER_PAGE,
         "total_pages": total_pages,
     }
-
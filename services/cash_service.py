@@ -1,4 +1,9 @@
+import os
+import threading
+import time
+from decimal import Decimal
 from db.database import get_db
+from db.filters import date_range_sql
 from utils.formatters import format_date
 from datetime import date as date_today
 
@@ -12,6 +17,13 @@ CASH_OUT_CATEGORIES = ['Parts Purchase', 'Staff Expense', 'Utilities', 'Supplies
 # One constant, affects the entire service automatically.
 PHYSICAL_CASH_CATEGORIES = ('Cash',)
 
+# Ledger totals only feed the "Page x of y" labels, so they are cached per
+# filter combination instead of counting every source on each page view.
+CASH_COUNT_TTL_SECONDS = int(os.environ.get("CASH_COUNT_TTL_SECONDS", 60))
+
+_count_lock = threading.Lock()
+_count_cache = {}
+
 
 def _money(value):
     """Normalize DB numeric/decimal values to float for calculations and JSON."""
@@ -22,143 +34,159 @@ def _money(value):
 # PRIVATE HELPERS
 # ─────────────────────────────────────────────
 
-def _get_sales_cash(conn, branch_id=1, date_from=None, date_to=None):
+def _cash_ledger_branches(branch_id=1, entry_type=None, date_from=None, date_to=None):
     """
-    [Source 1] Direct cash sales that are fully Paid.
-    Always CASH_IN — never appears when filtering for CASH_OUT.
-    """
-    placeholders = ','.join(['%s'] * len(PHYSICAL_CASH_CATEGORIES))
-    params = list(PHYSICAL_CASH_CATEGORIES)
+    One SELECT per ledger source, every filter pushed into its branch (the
+    WHERE is always open, so callers can append conditions with AND).
+    Sources: cash sales, cash debt payments, manual / payout cash entries.
 
-    query = f"""
-        SELECT
-            s.id            AS reference_id,
-            s.sales_number,
-            s.customer_name,
-            s.total_amount  AS amount,
-            s.transaction_date AS created_at,
-            u.username      AS recorded_by
-        FROM sales s
-        JOIN payment_methods pm ON pm.id = s.payment_method_id
-        LEFT JOIN users u       ON u.id  = s.user_id
-        WHERE pm.category IN ({placeholders})
-        AND s.status = 'Paid'
-    """
-
-    if date_from:
-        query += " AND DATE(s.transaction_date) >= %s"
-        params.append(date_from)
-    if date_to:
-        query += " AND DATE(s.transaction_date) <= %s"
-        params.append(date_to)
-
-    return conn.execute(query, params).fetchall()
-
-
-def _get_debt_cash_payments(conn, branch_id=1, date_from=None, date_to=None):
-    """
-    [Source 2] Cash payments that settled Utang balances.
-    Always CASH_IN — never appears when filtering for CASH_OUT.
+    Returns [(source, stamp_column, id_column, sql, params)].
+    Columns: source, source_id, entry_type, amount, category, description,
+             sales_number, customer_name, created_at, recorded_by
     """
     placeholders = ','.join(['%s'] * len(PHYSICAL_CASH_CATEGORIES))
-    params = list(PHYSICAL_CASH_CATEGORIES)
-
-    query = f"""
-        SELECT
-            dp.id           AS reference_id,
-            s.sales_number,
-            s.customer_name,
-            dp.amount_paid  AS amount,
-            dp.paid_at      AS created_at,
-            u.username      AS recorded_by
-        FROM debt_payments dp
-        JOIN sales s            ON s.id  = dp.sale_id
-        JOIN payment_methods pm ON pm.id = dp.payment_method_id
-        LEFT JOIN users u       ON u.id  = dp.paid_by
-        WHERE pm.category IN ({placeholders})
-    """
-
-    if date_from:
-        query += " AND DATE(dp.paid_at) >= %s"
-        params.append(date_from)
-    if date_to:
-        query += " AND DATE(dp.paid_at) <= %s"
-        params.append(date_to)
-
-    return conn.execute(query, params).fetchall()
-
+    branches = []
 
-def _get_manual_entries(conn, branch_id=1, date_from=None, date_to=None, entry_type=None):
-    """
-    [Sources 3 & 4] Manual petty cash entries.
-    Supports optional entry_type filter ('CASH_IN' or 'CASH_OUT').
-    """
-    params = [branch_id]
-    query = """
+    # Sales and debt are always CASH_IN — skip them entirely if filtering for CASH_OUT
+    if entry_type != 'CASH_OUT':
+        sales_dates, sales_date_params = date_range_sql("s.transaction_date", date_from, date_to)
+        branches.append(("sale", "s.transaction_date", "s.id", f"""
+            SELECT
+                'sale'              AS source,
+                s.id                AS source_id,
+                'CASH_IN'           AS entry_type,
+                s.total_amount      AS amount,
+                'Cash Sale'         AS category,
+                NULL                AS description,
+                s.sales_number,
+                s.customer_name,
+                s.transaction_date  AS created_at,
+                u.username          AS recorded_by
+            FROM sales s
+            JOIN payment_methods pm ON pm.id = s.payment_method_id
+            LEFT JOIN users u       ON u.id  = s.user_id
+            WHERE pm.category IN ({placeholders})
+            AND s.status = 'Paid'
+            {sales_dates}
+        """, [*PHYSICAL_CASH_CATEGORIES, *sales_date_params]))
+
+        debt_dates, debt_date_params = date_range_sql("dp.paid_at", date_from, date_to)
+        branches.append(("debt_payment", "dp.paid_at", "dp.id", f"""
+            SELECT
+                'debt_payment'      AS source,
+                dp.id               AS source_id,
+                'CASH_IN'           AS entry_type,
+                dp.amount_paid      AS amount,
+                'Debt Payment'      AS category,
+                NULL                AS description,
+                s.sales_number,
+                s.customer_name,
+                dp.paid_at          AS created_at,
+                u.username          AS recorded_by
+            FROM debt_payments dp
+            JOIN sales s            ON s.id  = dp.sale_id
+            JOIN payment_methods pm ON pm.id = dp.payment_method_id
+            LEFT JOIN users u       ON u.id  = dp.paid_by
+            WHERE pm.category IN ({placeholders})
+            {debt_dates}
+        """, [*PHYSICAL_CASH_CATEGORIES, *debt_date_params]))
+
+    manual_type = " AND ce.entry_type = %s" if entry_type else ""
+    manual_dates, manual_date_params = date_range_sql("ce.created_at", date_from, date_to)
+    branches.append(("manual", "ce.created_at", "ce.id", f"""
         SELECT
-            ce.id,
+            'manual'            AS source,
+            ce.id               AS source_id,
             ce.entry_type,
             ce.amount,
             ce.category,
             ce.description,
+            NULL                AS sales_number,
+            NULL                AS customer_name,
             ce.created_at,
-            u.username AS recorded_by
+            u.username          AS recorded_by
         FROM cash_entries ce
         LEFT JOIN users u ON u.id = ce.user_id
         WHERE ce.branch_id = %s
         AND ce.reference_type IN ('MANUAL', 'MECHANIC_PAYOUT')
-    """
+        {manual_type}
+        {manual_dates}
+    """, [branch_id, *([entry_type] if entry_type else []), *manual_date_params]))
+
+    return branches
 
-    if entry_type:
-        query += " AND ce.entry_type = %s"
-        params.append(entry_type)
-    if date_from:
-        query += " AND DATE(ce.created_at) >= %s"
-        params.append(date_from)
-    if date_to:
-        query += " AND DATE(ce.created_at) <= %s"
-        params.append(date_to)
 
-    return conn.execute(query, params).fetchall()
+def _cash_ledger_sql(branch_id=1, entry_type=None, date_from=None, date_to=None):
+    """All ledger sources as one unordered UNION ALL (counts, full-range report)."""
+    branches = _cash_ledger_branches(branch_id, entry_type, date_from, date_to)
+    params = []
+    for _, _, _, _, branch_params in branches:
+        params.extend(branch_params)
+    return " UNION ALL ".join(sql for _, _, _, sql, _ in branches), params
 
 
-def _build_unified(sales_rows, debt_rows, manual_rows):
+def _cash_ledger_page_sql(branch_id, entry_type, date_from, date_to, limit, cursor=None):
     """
-    Merges all 3 sources into a single normalized list sorted newest first.
-    Each row has the same shape regardless of source — the HTML never needs
-    to know where a row came from.
+    The first `limit` rows of every source after `cursor`, newest first, as
+    one UNION ALL; the caller merges them with _LEDGER_ORDER and applies the
+    final LIMIT / OFFSET.
+
+    Each source is read in two parts so both are plain index range scans on
+    the raw date column ((transaction_date DESC, id DESC), (paid_at DESC,
+    id DESC), (branch_id, created_at DESC, id DESC)): dated rows newest
+    first, then the undated legacy rows, which sort last.
     """
-    unified = []
-
-    for row in sales_rows:
-        customer = row['customer_name'] or 'Walk-in'
-        unified.append({
-            'entry_type':  'CASH_IN',
-            'amount':      _money(row['amount']),
-            'category':    'Cash Sale',
-            'description': f"{row['sales_number']} — {customer}",
-            'created_at':  format_date(row['created_at'], show_time=True),
-            'recorded_by': row['recorded_by'] or '—',
-            'source':      'sale',
-            '_raw_date':   row['created_at'] or '',
-        })
-
-    for row in debt_rows:
-        customer = row['customer_name'] or 'Walk-in'
-        unified.append({
-            'entry_type':  'CASH_IN',
-            'amount':      _money(row['amount']),
-            'category':    'Debt Payment',
-            'description': f"{row['sales_number']} — {customer}",
-            'created_at':  format_date(row['created_at'], show_time=True),
-            'recorded_by': row['recorded_by'] or '—',
-            'source':      'debt_payment',
-            '_raw_date':   row['created_at'] or '',
-        })
-
-    for row in manual_rows:
-        unified.append({
-            'id':          row['id'],
+    stamp, cursor_id, cursor_source = cursor if cursor else (None, None, None)
+    parts = []
+    params = []
+
+    for source, stamp_col, id_col, sql, branch_params in _cash_ledger_branches(
+        branch_id, entry_type, date_from, date_to
+    ):
+        # (created_at, source_id, source) DESC: at an equal stamp and id, only
+        # sources that sort below the cursor's come after it
+        id_op = "<=" if cursor and source < cursor_source else "<"
+
+        if stamp != '-infinity':
+            cursor_sql = f" AND ({stamp_col}, {id_col}) {id_op} (%s::timestamp, %s)" if cursor else ""
+            parts.append(f"""
+                ({sql} AND {stamp_col} IS NOT NULL{cursor_sql}
+                 ORDER BY {stamp_col} DESC, {id_col} DESC
+                 LIMIT %s)
+            """)
+            params.extend(branch_params)
+            if cursor:
+                params.extend([stamp, cursor_id])
+            params.append(limit)
+
+        # Undated rows come after every dated one, so a dated cursor keeps all of them
+        cursor_sql = f" AND {id_col} {id_op} %s" if stamp == '-infinity' else ""
+        parts.append(f"""
+            ({sql} AND {stamp_col} IS NULL{cursor_sql}
+             ORDER BY {id_col} DESC
+             LIMIT %s)
+        """)
+        params.extend(branch_params)
+        if stamp == '-infinity':
+            params.append(cursor_id)
+        params.append(limit)
+
+    return " UNION ALL ".join(parts), params
+
+
+# Newest first, undated rows last; (created_at, source_id, source) is a total
+# order, so the last row of a page doubles as the keyset cursor.
+_LEDGER_ORDER = "created_at DESC NULLS LAST, source_id DESC, source DESC"
+
+
+def _format_ledger_row(row):
+    """
+    One unified ledger row. Same shape regardless of source — the HTML never
+    needs to know where a row came from.
+    """
+    if row['source'] == 'manual':
+        return {
+            'id':          row['source_id'],
             'entry_type':  row['entry_type'],
             'amount':      _money(row['amount']),
             'category':    row['category'],
@@ -166,15 +194,192 @@ def _build_unified(sales_rows, debt_rows, manual_rows):
             'created_at':  format_date(row['created_at'], show_time=True),
             'recorded_by': row['recorded_by'] or '—',
             'source':      'manual',
-            '_raw_date':   row['created_at'] or '',
-        })
+        }
+
+    customer = row['customer_name'] or 'Walk-in'
+    return {
+        'entry_type':  'CASH_IN',
+        'amount':      _money(row['amount']),
+        'category':    row['category'],
+        'description': f"{row['sales_number']} — {customer}",
+        'created_at':  format_date(row['created_at'], show_time=True),
+        'recorded_by': row['recorded_by'] or '—',
+        'source':      row['source'],
+    }
+
+
+def encode_ledger_cursor(row):
+    """Opaque keyset cursor pointing just after `row` (newest-first order)."""
+    created_at = row['created_at']
+    stamp = created_at.isoformat() if created_at else '-infinity'
+    return f"{stamp}|{row['source_id']}|{row['source']}"
+
+
+def _decode_ledger_cursor(cursor):
+    try:
+        stamp, source_id, source = cursor.split('|', 2)
+        return stamp, int(source_id), source
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid ledger cursor.")
+
+
+# ─────────────────────────────────────────────
+# DAILY CASH ROLLUP (cash_daily_balances)
+# ─────────────────────────────────────────────
+#
+# One row per (branch_id, balance_date) holding that day's physical cash
+# movement per source. Writers call the record_* helpers inside their own
+# transaction; rebuild_cash_daily_balances() recomputes everything from the
+# source tables. Sales and debt payments have no branch column yet, so they
+# roll up into branch 1 (NOTE future branches: add sales.branch_id).
+#
+# Rows with no timestamp (legacy imports) are bucketed on 1970-01-01 so the
+# all-time total still matches the source tables.
+
+_UNDATED_BUCKET = "DATE '1970-01-01'"
+
+
+def _rollup_source_sql(source):
+    """
+    SELECT producing (branch_id, balance_date, sales_cash_in, debt_cash_in,
+    manual_cash_in, manual_cash_out) for one source; the caller appends filters
+    (the WHERE is already open). Params: PHYSICAL_CASH_CATEGORIES for sale / debt.
+    """
+    placeholders = ','.join(['%s'] * len(PHYSICAL_CASH_CATEGORIES))
 
-    unified.sort(key=lambda x: x['_raw_date'], reverse=True)
+    if source == 'sale':
+        return f"""
+            SELECT
+                1 AS branch_id,
+                COALESCE(s.transaction_date::date, {_UNDATED_BUCKET}) AS balance_date,
+                SUM(s.total_amount) AS sales_cash_in,
+                0 AS debt_cash_in,
+                0 AS manual_cash_in,
+                0 AS manual_cash_out
+            FROM sales s
+            JOIN payment_methods pm ON pm.id = s.payment_method_id
+            WHERE pm.category IN ({placeholders})
+            AND s.status = 'Paid'
+        """, list(PHYSICAL_CASH_CATEGORIES), "GROUP BY 2"
+
+    if source == 'debt_payment':
+        return f"""
+            SELECT
+                1 AS branch_id,
+                COALESCE(dp.paid_at::date, {_UNDATED_BUCKET}) AS balance_date,
+                0 AS sales_cash_in,
+                SUM(dp.amount_paid) AS debt_cash_in,
+                0 AS manual_cash_in,
+                0 AS manual_cash_out
+            FROM debt_payments dp
+            JOIN payment_methods pm ON pm.id = dp.payment_method_id
+            WHERE pm.category IN ({placeholders})
+        """, list(PHYSICAL_CASH_CATEGORIES), "GROUP BY 2"
+
+    return f"""
+        SELECT
+            ce.branch_id,
+            COALESCE(ce.created_at::date, {_UNDATED_BUCKET}) AS balance_date,
+            0 AS sales_cash_in,
+            0 AS debt_cash_in,
+            SUM(CASE WHEN ce.entry_type = 'CASH_IN'  THEN ce.amount ELSE 0 END) AS manual_cash_in,
+            SUM(CASE WHEN ce.entry_type = 'CASH_OUT' THEN ce.amount ELSE 0 END) AS manual_cash_out
+        FROM cash_entries ce
+        WHERE ce.reference_type IN ('MANUAL', 'MECHANIC_PAYOUT')
+    """, [], "GROUP BY 1, 2"
+
+
+def _apply_cash_rollup(conn, source, filter_sql, filter_params, sign=1):
+    """Adds (sign=1) or removes (sign=-1) the matching source rows from the rollup."""
+    source_sql, params, group_by = _rollup_source_sql(source)
+    conn.execute(f"""
+        INSERT INTO cash_daily_balances
+            (branch_id, balance_date, sales_cash_in, debt_cash_in,
+             manual_cash_in, manual_cash_out, updated_at)
+        SELECT
+            branch_id, balance_date,
+            %s * sales_cash_in, %s * debt_cash_in,
+            %s * manual_cash_in, %s * manual_cash_out,
+            NOW()
+        FROM ({source_sql} {filter_sql} {group_by}) src
+        ON CONFLICT (branch_id, balance_date) DO UPDATE SET
+            sales_cash_in   = cash_daily_balances.sales_cash_in   + EXCLUDED.sales_cash_in,
+            debt_cash_in    = cash_daily_balances.debt_cash_in    + EXCLUDED.debt_cash_in,
+            manual_cash_in  = cash_daily_balances.manual_cash_in  + EXCLUDED.manual_cash_in,
+            manual_cash_out = cash_daily_balances.manual_cash_out + EXCLUDED.manual_cash_out,
+            updated_at      = NOW()
+    """, [sign, sign, sign, sign] + params + list(filter_params))
+
+
+def record_cash_sale(conn, sale_id):
+    """Call after inserting a sale (same transaction). No-op unless it is a Paid cash sale."""
+    _apply_cash_rollup(conn, 'sale', "AND s.id = %s", [sale_id])
+
+
+def record_cash_debt_payment(conn, payment_id):
+    """Call after inserting a debt payment (same transaction). No-op unless paid in cash."""
+    _apply_cash_rollup(conn, 'debt_payment', "AND dp.id = %s", [payment_id])
+
+
+def _record_manual_cash_entry(conn, entry_id, sign=1):
+    _apply_cash_rollup(conn, 'manual', "AND ce.id = %s", [entry_id], sign=sign)
+
+
+def rebuild_cash_daily_balances(external_conn=None):
+    """
+    Recomputes cash_daily_balances from sales, debt_payments and cash_entries.
+    Needed after changing PHYSICAL_CASH_CATEGORIES or a payment method's category.
+    Returns the number of day rows written.
+    """
+    conn = external_conn if external_conn else get_db()
+    try:
+        conn.execute("LOCK TABLE cash_daily_balances IN EXCLUSIVE MODE")
+        conn.execute("DELETE FROM cash_daily_balances")
+        for source in ('sale', 'debt_payment', 'manual'):
+            _apply_cash_rollup(conn, source, "", [])
+
+        written = conn.execute("SELECT COUNT(*) AS total FROM cash_daily_balances").fetchone()["total"]
+        if not external_conn:
+            conn.commit()
+        return written
+    except Exception:
+        if not external_conn:
+            conn.rollback()
+        raise
+    finally:
+        if not external_conn:
+            conn.close()
 
-    for row in unified:
-        del row['_raw_date']
 
-    return unified
+def _today_cash_delta(conn, branch_id, today):
+    """Today's movement straight from the source tables (index-backed date ranges)."""
+    totals = {
+        'sales_cash_in': Decimal('0'),
+        'debt_cash_in': Decimal('0'),
+        'manual_cash_in': Decimal('0'),
+        'manual_cash_out': Decimal('0'),
+    }
+    manual_sql, manual_params = date_range_sql("ce.created_at", today, today)
+    filters = {
+        'sale':         date_range_sql("s.transaction_date", today, today),
+        'debt_payment': date_range_sql("dp.paid_at", today, today),
+        'manual':       ("AND ce.branch_id = %s" + manual_sql, [branch_id] + manual_params),
+    }
+
+    for source, (filter_sql, filter_params) in filters.items():
+        # Sales / debt payments only belong to branch 1 for now (see rollup note above).
+        if source != 'manual' and branch_id != 1:
+            continue
+        source_sql, params, group_by = _rollup_source_sql(source)
+        rows = conn.execute(
+            f"{source_sql} {filter_sql} {group_by}",
+            params + filter_params,
+        ).fetchall()
+        for row in rows:
+            for key in totals:
+                totals[key] += Decimal(row[key] or 0)
+
+    return totals
 
 
 # ─────────────────────────────────────────────
@@ -186,33 +391,36 @@ def get_cash_summary(branch_id=1):
     Full cash on hand from all 4 sources.
     Summary always ignores entry_type filter — it must always show
     the real total regardless of what the ledger table is filtered to.
+
+    = every rollup day except today (cash_daily_balances) + today's live delta,
+    summed as Decimal; converted to float only for the response.
     """
+    today = date_today.today().isoformat()
+
     conn = get_db()
-    sales_rows  = _get_sales_cash(conn, branch_id)
-    debt_rows   = _get_debt_cash_payments(conn, branch_id)
-    manual_rows = _get_manual_entries(conn, branch_id)
+    closed = conn.execute("""
+        SELECT
+            COALESCE(SUM(sales_cash_in + debt_cash_in + manual_cash_in), 0) AS total_in,
+            COALESCE(SUM(manual_cash_out), 0)                               AS total_out
+        FROM cash_daily_balances
+        WHERE branch_id = %s
+        AND balance_date <> %s::date
+    """, (branch_id, today)).fetchone()
+    today_delta = _today_cash_delta(conn, branch_id, today)
     conn.close()
 
-    total_in  = 0.0
-    total_out = 0.0
-
-    for row in sales_rows:
-        total_in += _money(row['amount'])
-    for row in debt_rows:
-        total_in += _money(row['amount'])
-    for row in manual_rows:
-        if row['entry_type'] == 'CASH_IN':
-            total_in  += _money(row['amount'])
-        else:
-            total_out += _money(row['amount'])
-
-    total_in  = round(total_in,  2)
-    total_out = round(total_out, 2)
+    total_in = (
+        Decimal(closed['total_in'])
+        + today_delta['sales_cash_in']
+        + today_delta['debt_cash_in']
+        + today_delta['manual_cash_in']
+    )
+    total_out = Decimal(closed['total_out']) + today_delta['manual_cash_out']
 
     return {
-        'total_in':     total_in,
-        'total_out':    total_out,
-        'cash_on_hand': round(total_in - total_out, 2),
+        'total_in':     _money(total_in),
+        'total_out':    _money(total_out),
+        'cash_on_hand': _money(total_in - total_out),
     }
 
 
@@ -220,61 +428,81 @@ def get_cash_entry_count(branch_id=1, entry_type=None, start_date=None, end_date
     """
     Total number of unified ledger rows matching the given filters.
     Used by the route to calculate total_pages before fetching the page slice.
-
-    Why not just len(get_cash_entries(...))?
-    Because get_cash_entries fetches and formats every row just to count them.
-    This is cheaper — build unified list without formatting, just count it.
-    At current scale it barely matters, but it's the right habit.
+    Cached per filter combination for CASH_COUNT_TTL_SECONDS (manual entries
+    added or deleted here drop the cache straight away).
     """
-    conn = get_db()
+    filters = (branch_id, entry_type, start_date, end_date)
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(filters)
+    if cached and cached[0] > now:
+        return cached[1]
 
-    # Sales and debt are always CASH_IN — skip them entirely if filtering for CASH_OUT
-    if entry_type == 'CASH_OUT':
-        sales_rows = []
-        debt_rows  = []
-    else:
-        sales_rows = _get_sales_cash(conn, branch_id, start_date, end_date)
-        debt_rows  = _get_debt_cash_payments(conn, branch_id, start_date, end_date)
+    ledger_sql, params = _cash_ledger_sql(branch_id, entry_type, start_date, end_date)
 
-    manual_rows = _get_manual_entries(conn, branch_id, start_date, end_date, entry_type)
+    conn = get_db()
+    row = conn.execute(f"SELECT COUNT(*) AS total FROM ({ledger_sql}) ledger", params).fetchone()
     conn.close()
 
-    return len(sales_rows) + len(debt_rows) + len(manual_rows)
+    total = int(row['total'] or 0)
+    with _count_lock:
+        if len(_count_cache) > 256:
+            _count_cache.clear()
+        _count_cache[filters] = (now + CASH_COUNT_TTL_SECONDS, total)
+    return total
+
+
+def _clear_cash_count_cache():
+    with _count_lock:
+        _count_cache.clear()
 
 
 def get_cash_entries(branch_id=1, limit=None, offset=None,
-                    entry_type=None, start_date=None, end_date=None):
+                    entry_type=None, start_date=None, end_date=None,
+                    after_cursor=None, with_cursor=False):
     """
-    Unified ledger with optional pagination and filtering.
-
-    entry_type  : 'CASH_IN', 'CASH_OUT', or None (all)
-    start_date  : 'YYYY-MM-DD' or None
-    end_date    : 'YYYY-MM-DD' or None
-    limit       : page size
-    offset      : how many rows to skip (for pagination)
+    Unified ledger with optional pagination and filtering, newest first.
+    Each source is sorted and limited on its own index (see
+    _cash_ledger_page_sql), then the slices are merged.
+
+    entry_type   : 'CASH_IN', 'CASH_OUT', or None (all)
+    start_date   : 'YYYY-MM-DD' or None
+    end_date     : 'YYYY-MM-DD' or None
+    limit        : page size
+    offset       : how many rows to skip (numbered page links)
+    after_cursor : keyset cursor from a previous page — preferred over offset,
+                   cost stays flat however deep the page is
+    with_cursor  : return (entries, next_cursor) instead of just entries
     """
-    conn = get_db()
+    cursor = _decode_ledger_cursor(after_cursor) if after_cursor else None
+    offset = int(offset) if offset and not after_cursor else 0
 
-    # Sales and debt are always CASH_IN — skip entirely if filtering for CASH_OUT
-    if entry_type == 'CASH_OUT':
-        sales_rows = []
-        debt_rows  = []
+    if limit:
+        # Any row on this page is within the first offset + limit of its own source
+        ledger_sql, params = _cash_ledger_page_sql(
+            branch_id, entry_type, start_date, end_date, offset + int(limit), cursor
+        )
     else:
-        sales_rows = _get_sales_cash(conn, branch_id, start_date, end_date)
-        debt_rows  = _get_debt_cash_payments(conn, branch_id, start_date, end_date)
+        ledger_sql, params = _cash_ledger_sql(branch_id, entry_type, start_date, end_date)
 
-    manual_rows = _get_manual_entries(conn, branch_id, start_date, end_date, entry_type)
-    conn.close()
+    query = f"SELECT * FROM ({ledger_sql}) ledger ORDER BY {_LEDGER_ORDER}"
+    if limit:
+        query += " LIMIT %s"
+        params.append(int(limit))
+    if offset:
+        query += " OFFSET %s"
+        params.append(offset)
 
-    unified = _build_unified(sales_rows, debt_rows, manual_rows)
+    conn = get_db()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
 
-    # Apply pagination after merge+sort so ordering is always correct
-    if offset:
-        unified = unified[offset:]
-    if limit:
-        unified = unified[:limit]
+    entries = [_format_ledger_row(row) for row in rows]
+    if not with_cursor:
+        return entries
 
-    return unified
+    next_cursor = encode_ledger_cursor(rows[-1]) if rows and limit and len(rows) == int(limit) else None
+    return entries, next_cursor
 
 
 # ─────────────────────────────────────────────
@@ -402,11 +630,12 @@ def add_cash_entry(entry_type, amount, category, description, reference_id, payo
 
     conn = get_db()
     try:
-        conn.execute("""
+        entry_row = conn.execute("""
             INSERT INTO cash_entries
                 (branch_id, entry_type, amount, category, description,
                 reference_type, reference_id, payout_for_date, user_id)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
         """, (
             branch_id,
             entry_type,
@@ -417,8 +646,10 @@ def add_cash_entry(entry_type, amount, category, description, reference_id, payo
             normalized_reference_id,
             payout_for_date,
             user_id
-        ))
+        )).fetchone()
+        _record_manual_cash_entry(conn, entry_row["id"])
         conn.commit()
+        _clear_cash_count_cache()
     except Exception:
         conn.rollback()
         raise
@@ -435,6 +666,10 @@ def delete_cash_entry(entry_id, branch_id=1):
     """
     conn = get_db()
     try:
+        # Take the entry out of the daily rollup first (no-op if it doesn't qualify);
+        # a failed DELETE below rolls this back too.
+        _apply_cash_rollup(conn, 'manual', "AND ce.id = %s AND ce.branch_id = %s", [entry_id, branch_id], sign=-1)
+
         result = conn.execute("""
             DELETE FROM cash_entries
             WHERE id = %s AND branch_id = %s AND reference_type IN ('MANUAL', 'MECHANIC_PAYOUT')
@@ -444,6 +679,7 @@ def delete_cash_entry(entry_id, branch_id=1):
             raise ValueError("Entry not found or cannot be deleted.")
 
         conn.commit()
+        _clear_cash_count_cache()
     except Exception:
         conn.rollback()
         raise
@@ -460,16 +696,16 @@ def get_cash_entries_for_report(date_from, date_to, branch_id=1):
     Full unified ledger for a date range — used by the sales report PDF.
     Sorted oldest first so the PDF reads chronologically.
     """
+    ledger_sql, params = _cash_ledger_sql(branch_id, None, date_from, date_to)
+
     conn = get_db()
-    sales_rows  = _get_sales_cash(conn, branch_id, date_from, date_to)
-    debt_rows   = _get_debt_cash_payments(conn, branch_id, date_from, date_to)
-    manual_rows = _get_manual_entries(conn, branch_id, date_from, date_to)
+    rows = conn.execute(f"""
+        SELECT * FROM ({ledger_sql}) ledger
+        ORDER BY created_at ASC NULLS FIRST, source_id ASC, source ASC
+    """, params).fetchall()
     conn.close()
 
-    unified = _build_unified(sales_rows, debt_rows, manual_rows)
-
-    # Reverse to oldest-first for PDF reading order
-    unified.reverse()
+    unified = [_format_ledger_row(row) for row in rows]
 
     total_in  = sum(r['amount'] for r in unified if r['entry_type'] == 'CASH_IN')
     total_out = sum(r['amount'] for r in unified if r['entry_type'] == 'CASH_OUT')
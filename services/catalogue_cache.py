@@ -0,0 +1,259 @@
+import json
+import os
+import select
+import threading
+from collections import OrderedDict
+
+import psycopg2
+
+from db.database import get_db
+
+
+# ─────────────────────────────────────────────
+# ITEM CATALOGUE CACHE (per process)
+# ─────────────────────────────────────────────
+#
+# The item master is read on almost every page but only changes on item
+# creation, item import and cost self-correction. This keeps, per process:
+#   - item rows by id (bounded LRU, ITEM_CACHE_MAX_ENTRIES)
+#   - the id/name list used by the importers' name matching
+#   - the "latest items" list on the home page
+#
+# Versioning: every invalidation bumps _version. A load that started before
+# an invalidation is not stored, so a slow reader can't put stale rows back.
+#
+# Writers call notify_item_catalogue_changed(conn, ...) inside their
+# transaction and invalidate_item_catalogue(...) after commit. The NOTIFY is
+# delivered on commit, so other Waitress processes running
+# start_catalogue_listener() drop their copies too (ITEM_CACHE_LISTEN=1).
+#
+# Stock is NOT cached here — it lives in item_stock_balances.
+#
+# Other per-process caches (auth.utils user cache) ride on the same LISTEN
+# connection: register_listener_channel(channel, handler) at import time.
+
+CATALOGUE_CHANNEL = "item_catalogue_changed"
+ITEM_CACHE_MAX_ENTRIES = int(os.environ.get("ITEM_CACHE_MAX_ENTRIES", 5000))
+
+_lock = threading.Lock()
+_version = 0
+_items = OrderedDict()
+_lists = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+_listener_thread = None
+_channel_handlers = {}     # channel → (handler(payload), on_reconnect())
+
+
+def _record(kind):
+    with _lock:
+        _stats[kind] += 1
+
+
+def _current_version():
+    with _lock:
+        return _version
+
+
+def _store_item(item_id, row, loaded_version):
+    with _lock:
+        if loaded_version != _version:
+            return
+        _items[item_id] = row
+        _items.move_to_end(item_id)
+        while len(_items) > ITEM_CACHE_MAX_ENTRIES:
+            _items.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def _store_list(key, rows, loaded_version):
+    with _lock:
+        if loaded_version == _version:
+            _lists[key] = rows
+
+
+def get_cached_item(item_id, external_conn=None):
+    """
+    Item row (items.* plus vendor_name) as a dict, or None if it doesn't exist.
+    Callers must treat the returned dict as read-only.
+    """
+    item_id = int(item_id)
+    with _lock:
+        row = _items.get(item_id)
+        if row is not None:
+            _items.move_to_end(item_id)
+            _stats["hits"] += 1
+            return row
+        _stats["misses"] += 1
+        loaded_version = _version
+
+    conn = external_conn if external_conn else get_db()
+    try:
+        db_row = conn.execute("""
+            SELECT i.*, v.vendor_name
+            FROM items i
+            LEFT JOIN vendors v ON v.id = i.vendor_id
+            WHERE i.id = %s
+        """, (item_id,)).fetchone()
+    finally:
+        if not external_conn:
+            conn.close()
+
+    if not db_row:
+        return None
+
+    row = dict(db_row)
+    _store_item(item_id, row, loaded_version)
+    return row
+
+
+def _get_cached_list(key, sql, external_conn=None):
+    with _lock:
+        rows = _lists.get(key)
+        if rows is not None:
+            _stats["hits"] += 1
+            return rows
+        _stats["misses"] += 1
+        loaded_version = _version
+
+    conn = external_conn if external_conn else get_db()
+    try:
+        rows = [dict(row) for row in conn.execute(sql).fetchall()]
+    finally:
+        if not external_conn:
+            conn.close()
+
+    _store_list(key, rows, loaded_version)
+    return rows
+
+
+def get_item_name_rows(external_conn=None):
+    """[{id, name}, ...] for the whole catalogue (importer name matching)."""
+    return _get_cached_list("names", "SELECT id, name FROM items", external_conn)
+
+
+def get_latest_items(external_conn=None):
+    """Newest 75 items, as shown on the home page."""
+    return _get_cached_list(
+        "latest",
+        "SELECT * FROM items ORDER BY id DESC LIMIT 75",
+        external_conn,
+    )
+
+
+def invalidate_item_catalogue(item_ids=None):
+    """
+    Drops cached rows for item_ids (or everything when None).
+    The id/name and latest-items lists are always dropped.
+    """
+    global _version
+    with _lock:
+        _version += 1
+        _stats["invalidations"] += 1
+        _lists.clear()
+        if item_ids is None:
+            _items.clear()
+        else:
+            for iid in item_ids:
+                _items.pop(int(iid), None)
+
+
+def notify_item_catalogue_changed(conn, item_ids=None):
+    """
+    Queues a NOTIFY on the writer's transaction; Postgres only delivers it on
+    commit, so other processes never invalidate for a rolled-back change.
+    """
+    payload = json.dumps({"item_ids": sorted({int(i) for i in item_ids}) if item_ids is not None else None})
+    conn.execute("SELECT pg_notify(%s, %s)", (CATALOGUE_CHANNEL, payload))
+
+
+def get_catalogue_cache_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else None,
+            "version": _version,
+            "cached_items": len(_items),
+            "cached_lists": sorted(_lists.keys()),
+            "max_entries": ITEM_CACHE_MAX_ENTRIES,
+            "listening": bool(_listener_thread and _listener_thread.is_alive()),
+        }
+
+
+def _handle_notification(payload):
+    try:
+        item_ids = json.loads(payload or "{}").get("item_ids")
+    except ValueError:
+        item_ids = None
+    invalidate_item_catalogue(item_ids)
+
+
+def register_listener_channel(channel, handler, on_reconnect=None):
+    """
+    Has the listener thread also LISTEN on `channel` and call handler(payload)
+    for each notification; on_reconnect() runs after every (re)connect, since
+    notifications sent while disconnected are lost. Register before
+    start_catalogue_listener().
+    """
+    with _lock:
+        _channel_handlers[channel] = (handler, on_reconnect)
+
+
+register_listener_channel(CATALOGUE_CHANNEL, _handle_notification, on_reconnect=invalidate_item_catalogue)
+
+
+def _listen_forever():
+    while True:
+        listen_conn = None
+        try:
+            listen_conn = psycopg2.connect(
+                host=os.environ["DB_HOST"],
+                port=os.environ.get("DB_PORT", 5432),
+                dbname=os.environ["DB_NAME"],
+                user=os.environ["DB_USER"],
+                password=os.environ["DB_PASSWORD"],
+            )
+            listen_conn.autocommit = True
+            with _lock:
+                handlers = dict(_channel_handlers)
+            with listen_conn.cursor() as cur:
+                for channel in handlers:
+                    cur.execute(f"LISTEN {channel}")
+
+            # Anything may have changed while we were disconnected.
+            for _, on_reconnect in handlers.values():
+                if on_reconnect:
+                    on_reconnect()
+
+            while True:
+                if select.select([listen_conn], [], [], 60) == ([], [], []):
+                    continue
+                listen_conn.poll()
+                while listen_conn.notifies:
+                    notification = listen_conn.notifies.pop(0)
+                    handler = handlers.get(notification.channel)
+                    if handler:
+                        handler[0](notification.payload)
+        except Exception as e:
+            print(f"⚠ Item catalogue listener error, reconnecting: {e}")
+            threading.Event().wait(5)
+        finally:
+            if listen_conn is not None:
+                try:
+                    listen_conn.close()
+                except Exception:
+                    pass
+
+
+def start_catalogue_listener():
+    """Starts the LISTEN thread once per process. Safe to call repeatedly."""
+    global _listener_thread
+    with _lock:
+        if _listener_thread and _listener_thread.is_alive():
+            return
+        _listener_thread = threading.Thread(
+            target=_listen_forever,
+            name="item-catalogue-listener",
+            daemon=True,
+        )
+        _listener_thread.start()
@@ -0,0 +1,363 @@
+from db.database import get_db
+from services.search_service import build_search_clause, set_similarity_threshold
+from utils.formatters import format_date
+from utils.lazy_import import lazy_module
+
+# Heavy service modules load on first call (utils/lazy_import.py)
+_loyalty = lazy_module("services.loyalty_service")
+get_customer_eligibility_bulk = _loyalty.get_customer_eligibility_bulk
+get_customer_earn_only_bulk = _loyalty.get_customer_earn_only_bulk
+get_customer_points_bulk = _loyalty.get_customer_points_bulk
+
+CUSTOMER_PAGE_SIZE = 50
+
+
+# ─────────────────────────────────────────────
+# CUSTOMER DIRECTORY (keyset pages)
+# ─────────────────────────────────────────────
+#
+# /customers renders one page of CUSTOMER_PAGE_SIZE rows. Ordering is always
+# a total order ending in id, so "next page" is a keyset cursor instead of
+# an OFFSET, and every page costs the same however big the customer base is.
+# Visits / last visit / vehicles are computed for the page's ids only;
+# loyalty previews are fetched by the page afterwards (get_loyalty_previews).
+
+# sort key → (ORDER BY, keyset comparison, cursor column)
+DIRECTORY_SORTS = {
+    "name":   ("c.customer_name ASC, c.id ASC", "(c.customer_name, c.id) > (%s, %s)", "customer_name"),
+    "newest": ("c.created_at DESC, c.id DESC", "(c.created_at, c.id) < (%s::timestamp, %s)", "created_at"),
+}
+
+
+def encode_directory_cursor(row, sort):
+    """Opaque keyset cursor pointing just after `row` for the given sort."""
+    value = row[DIRECTORY_SORTS[sort][2]]
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    return f"{value}|{row['id']}"
+
+
+def _decode_directory_cursor(cursor):
+    try:
+        value, customer_id = cursor.rsplit("|", 1)
+        return value, int(customer_id)
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid customer cursor.")
+
+
+def get_customer_directory_page(search=None, sort="name", after_cursor=None, limit=CUSTOMER_PAGE_SIZE):
+    """
+    One page of active customers.
+
+    search       : free text matched on name / customer no. (same matching as autocomplete)
+    sort         : 'name' (A–Z) or 'newest' (most recently added first)
+    after_cursor : next_cursor from the previous page
+    Returns dict with customers, next_cursor, total, sort, search.
+    """
+    if sort not in DIRECTORY_SORTS:
+        sort = "name"
+    order_sql, keyset_sql, _ = DIRECTORY_SORTS[sort]
+
+    conditions = ["c.is_active = 1"]
+    params = []
+    search_clause = build_search_clause(search, ["c.customer_name", "c.customer_no"]) if search else None
+    if search_clause:
+        conditions.append(search_clause[0])
+        params.extend(search_clause[1])
+
+    conn = get_db()
+    try:
+        if search_clause:
+            set_similarity_threshold(conn)
+
+        where_sql = " AND ".join(conditions)
+        total = conn.execute(
+            f"SELECT COUNT(*) AS total FROM customers c WHERE {where_sql}", params
+        ).fetchone()["total"]
+
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if after_cursor:
+            page_conditions.append(keyset_sql)
+            page_params.extend(_decode_directory_cursor(after_cursor))
+
+        rows = conn.execute(f"""
+            SELECT c.id, c.customer_no, c.customer_name, c.created_at
+            FROM customers c
+            WHERE {" AND ".join(page_conditions)}
+            ORDER BY {order_sql}
+            LIMIT %s
+        """, page_params + [int(limit)]).fetchall()
+
+        customer_ids = [int(row["id"]) for row in rows]
+        stats = {}
+        if customer_ids:
+            stat_rows = conn.execute("""
+                SELECT
+                    ids.customer_id,
+                    COALESCE(sv.total_visits, 0) AS total_visits,
+                    sv.last_visit,
+                    vv.vehicles
+                FROM UNNEST(%s::int[]) AS ids(customer_id)
+                LEFT JOIN (
+                    SELECT customer_id, COUNT(*) AS total_visits, MAX(transaction_date) AS last_visit
+                    FROM sales
+                    WHERE customer_id = ANY(%s)
+                    GROUP BY customer_id
+                ) sv ON sv.customer_id = ids.customer_id
+                LEFT JOIN (
+                    SELECT customer_id, STRING_AGG(vehicle_name::text, ', ' ORDER BY vehicle_name) AS vehicles
+                    FROM vehicles
+                    WHERE customer_id = ANY(%s)
+                    GROUP BY customer_id
+                ) vv ON vv.customer_id = ids.customer_id
+            """, (customer_ids, customer_ids, customer_ids)).fetchall()
+            stats = {int(row["customer_id"]): row for row in stat_rows}
+    finally:
+        conn.close()
+
+    customers = []
+    for row in rows:
+        stat = stats.get(int(row["id"]))
+        customer = dict(row)
+        customer["total_visits"] = int(stat["total_visits"]) if stat else 0
+        customer["last_visit"] = stat["last_visit"] if stat else None
+        customer["last_visit_display"] = format_date(customer["last_visit"])
+        customer["vehicles"] = stat["vehicles"] if stat else None
+        customers.append(customer)
+
+    next_cursor = encode_directory_cursor(rows[-1], sort) if len(rows) == int(limit) else None
+    return {
+        "customers": customers,
+        "next_cursor": next_cursor,
+        "total": int(total or 0),
+        "sort": sort,
+        "search": search or "",
+    }
+
+
+# ─────────────────────────────────────────────
+# LOYALTY PREVIEWS (visible page only)
+# ─────────────────────────────────────────────
+
+def _redeemable_preview(program):
+    stamp_count = int(program.get("stamp_count", 0) or 0)
+    threshold = int(program.get("threshold", 0) or 0)
+    progress_current = int(program.get("progress_current", stamp_count) or 0)
+    progress_threshold = int(program.get("progress_threshold", threshold) or 0)
+    progress_unit = str(program.get("progress_unit") or "stamps")
+    return {
+        "program_id": program["program_id"],
+        "name": program["name"],
+        "program_type": program.get("program_type"),
+        "stamp_count": stamp_count,
+        "threshold": threshold,
+        "points_balance": int(program.get("points_balance", 0) or 0),
+        "points_threshold": int(program.get("points_threshold", 0) or 0),
+        "reward_basis": program.get("reward_basis", "STAMPS"),
+        "progress_current": progress_current,
+        "progress_threshold": progress_threshold,
+        "progress_unit": progress_unit,
+        "remaining": max(0, threshold - stamp_count),
+        "progress_remaining": int(program.get("progress_remaining", 0) or 0),
+        "is_eligible": bool(program.get("is_eligible")),
+        "redemption_count": int(program.get("redemption_count", 0) or 0),
+        "pct": (
+            min(100, int((min(progress_current, progress_threshold) / progress_threshold * 100)))
+            if progress_threshold > 0 else 0
+        ),
+    }
+
+
+def _earn_only_preview(program):
+    points_balance = int(program.get("points_balance", 0) or 0)
+    stamp_count = int(program.get("stamp_count", 0) or 0)
+    progress_unit = "points" if bool(program.get("points_enabled")) else "stamps"
+    progress_current = points_balance if progress_unit == "points" else stamp_count
+    return {
+        "program_id": program["program_id"],
+        "name": program["name"],
+        "program_type": program.get("program_type"),
+        "stamp_count": stamp_count,
+        "threshold": 0,
+        "points_balance": points_balance,
+        "points_threshold": 0,
+        "reward_basis": "POINTS",
+        "progress_current": progress_current,
+        "progress_threshold": 0,
+        "progress_unit": progress_unit,
+        "remaining": 0,
+        "progress_remaining": 0,
+        "is_eligible": False,
+        "is_earn_only": True,
+        "redemption_count": 0,
+        "pct": 0,
+    }
+
+
+def get_loyalty_previews(customer_ids):
+    """
+    {customer_id: {"loyalty_points", "has_programs", "programs", "active", "ready", "earn_only"}}
+    for the given customers (the page currently on screen).
+    """
+    normalized_ids = sorted({int(cid) for cid in (customer_ids or []) if cid})
+    if not normalized_ids:
+        return {}
+
+    loyalty_by_customer = get_customer_eligibility_bulk(normalized_ids)
+    earn_only_by_customer = get_customer_earn_only_bulk(normalized_ids)
+    points_by_customer = get_customer_points_bulk(normalized_ids)
+
+    previews = {}
+    for customer_id in normalized_ids:
+        programs = [_redeemable_preview(p) for p in loyalty_by_customer.get(customer_id, [])]
+        programs += [_earn_only_preview(p) for p in earn_only_by_customer.get(customer_id, [])]
+        previews[customer_id] = {
+            "loyalty_points": int(points_by_customer.get(customer_id, 0) or 0),
+            "has_programs": bool(programs),
+            "programs": programs,
+            "active": sum(1 for p in programs if not p.get("is_earn_only")),
+            "ready": sum(1 for p in programs if not p.get("is_earn_only") and p["is_eligible"]),
+            "earn_only": sum(1 for p in programs if p.get("is_earn_only")),
+        }
+    return previews
+
+
+# ─────────────────────────────────────────────
+# CUSTOMER HISTORY (batched, "load more")
+# ─────────────────────────────────────────────
+#
+# A fixed number of queries per page whatever the visit count: the sales
+# page, then items / services / stamps for all of that page's sale ids at
+# once. Older visits come in HISTORY_PAGE_SIZE chunks via a
+# (transaction_date, id) cursor. Undated legacy sales sort after every dated
+# one and page on their id alone ("u|<id>" cursors).
+
+HISTORY_PAGE_SIZE = 25
+
+
+_UNDATED_CURSOR = "u"
+
+
+def encode_history_cursor(row):
+    transaction_date = row['transaction_date']
+    stamp = transaction_date.isoformat() if transaction_date else _UNDATED_CURSOR
+    return f"{stamp}|{row['id']}"
+
+
+def _decode_history_cursor(cursor):
+    """(stamp, sale_id); stamp is None for an undated sale."""
+    try:
+        stamp, sale_id = cursor.rsplit("|", 1)
+        return (None if stamp == _UNDATED_CURSOR else stamp), int(sale_id)
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid history cursor.")
+
+
+def _group_by_sale(rows):
+    grouped = {}
+    for row in rows:
+        line = dict(row)
+        grouped.setdefault(line.pop("sale_id"), []).append(line)
+    return grouped
+
+
+def get_customer_history(customer_id, after_cursor=None, limit=HISTORY_PAGE_SIZE, external_conn=None):
+    """
+    One page of a customer's sales, newest first, each with its items,
+    services and loyalty stamps. Returns (transactions, next_cursor).
+    """
+    conn = external_conn if external_conn else get_db()
+    try:
+        params = [customer_id]
+        cursor_sql = ""
+        if after_cursor:
+            stamp, sale_id = _decode_history_cursor(after_cursor)
+            if stamp is None:
+                cursor_sql = "AND s.transaction_date IS NULL AND s.id < %s"
+                params.append(sale_id)
+            else:
+                # Undated sales all come after the dated ones
+                cursor_sql = """
+                    AND ((s.transaction_date, s.id) < (%s::timestamp, %s)
+                         OR s.transaction_date IS NULL)
+                """
+                params.extend([stamp, sale_id])
+
+        sales = conn.execute(f"""
+            SELECT
+                s.id,
+                s.sales_number,
+                s.transaction_date,
+                s.total_amount,
+                s.status,
+                v.vehicle_name,
+                pm.name AS payment_method
+            FROM sales s
+            LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
+            LEFT JOIN vehicles v ON v.id = s.vehicle_id
+            WHERE s.customer_id = %s
+            {cursor_sql}
+            ORDER BY s.transaction_date DESC NULLS LAST, s.id DESC
+            LIMIT %s
+        """, params + [int(limit)]).fetchall()
+
+        sale_ids = [int(sale["id"]) for sale in sales]
+        services_by_sale = {}
+        items_by_sale = {}
+        stamps_by_sale = {}
+        if sale_ids:
+            services_by_sale = _group_by_sale(conn.execute("""
+                SELECT ss.sale_id, sv.name, ss.price
+                FROM sales_services ss
+                JOIN services sv ON sv.id = ss.service_id
+                WHERE ss.sale_id = ANY(%s)
+                ORDER BY ss.sale_id, ss.id
+            """, (sale_ids,)).fetchall())
+
+            items_by_sale = _group_by_sale(conn.execute("""
+                SELECT si.sale_id, i.name, si.quantity, si.final_unit_price
+                FROM sales_items si
+                JOIN items i ON i.id = si.item_id
+                WHERE si.sale_id = ANY(%s)
+                ORDER BY si.sale_id, si.id
+            """, (sale_ids,)).fetchall())
+
+            stamp_rows = conn.execute("""
+                SELECT
+                    ls.sale_id,
+                    lp.name AS program_name,
+                    ls.redemption_id
+                FROM loyalty_stamps ls
+                JOIN loyalty_programs lp ON lp.id = ls.program_id
+                WHERE ls.customer_id = %s
+                  AND ls.sale_id = ANY(%s)
+                ORDER BY ls.stamped_at ASC
+            """, (customer_id, sale_ids)).fetchall()
+            for row in stamp_rows:
+                stamps_by_sale.setdefault(row["sale_id"], []).append({
+                    "program_name": row["program_name"],
+                    "is_active": row["redemption_id"] is None
+                })
+    finally:
+        if not external_conn:
+            conn.close()
+
+    transactions = [
+        {
+            "id": sale["id"],
+            "sales_number": sale["sales_number"],
+            "transaction_date": format_date(sale["transaction_date"]),
+            "total_amount": sale["total_amount"],
+            "status": sale["status"],
+            "vehicle_name": sale["vehicle_name"],
+            "payment_method": sale["payment_method"],
+            "loyalty_stamps": stamps_by_sale.get(sale["id"], []),
+            "services": services_by_sale.get(sale["id"], []),
+            "items": items_by_sale.get(sale["id"], []),
+        }
+        for sale in sales
+    ]
+    has_more = len(sales) == int(limit)
+    next_cursor = encode_history_cursor(sales[-1]) if has_more else None
+    return transactions, next_cursor
@@ -1,12 +1,154 @@
 from db.database import get_db
 from datetime import datetime
 from utils.formatters import format_date
+from services.cash_service import record_cash_debt_payment
+from services.sales_facts_service import record_debt_payment_facts, record_sale_facts
 
 
 def _money(value):
     return round(float(value or 0), 2)
 
 
+# ─────────────────────────────────────────────
+# SALE BALANCES
+# ─────────────────────────────────────────────
+#
+# sale_balances holds one row per sale: amount_paid_total, service_total and
+# service_paid_total, so the utang page and debt APIs read a sale's balance
+# instead of re-summing sales_services / debt_payments for it.
+# record_sale writes the row, record_payment adds to it, both in their own
+# transaction. Rebuild / verify: python -m scripts.rebuild_sale_balances [--verify]
+
+def _source_balances_sql(scoped):
+    """Balances recomputed from the source tables; scoped takes the sale ids three times."""
+    sale_filter = "WHERE sale_id = ANY(%s)" if scoped else ""
+    outer_filter = "WHERE s.id = ANY(%s)" if scoped else ""
+    return f"""
+        SELECT
+            s.id                               AS sale_id,
+            COALESCE(dp.amount_paid_total, 0)  AS amount_paid_total,
+            COALESCE(ss.service_total, 0)      AS service_total,
+            COALESCE(dp.service_paid_total, 0) AS service_paid_total
+        FROM sales s
+        LEFT JOIN (
+            SELECT sale_id, SUM(price) AS service_total
+            FROM sales_services
+            {sale_filter}
+            GROUP BY sale_id
+        ) ss ON ss.sale_id = s.id
+        LEFT JOIN (
+            SELECT
+                sale_id,
+                SUM(amount_paid) AS amount_paid_total,
+                SUM(COALESCE(service_portion, 0)) AS service_paid_total
+            FROM debt_payments
+            {sale_filter}
+            GROUP BY sale_id
+        ) dp ON dp.sale_id = s.id
+        {outer_filter}
+    """
+
+
+def _write_sale_balances(conn, sale_ids=None):
+    scoped = sale_ids is not None
+    params = (sale_ids, sale_ids, sale_ids) if scoped else None
+    return conn.execute(f"""
+        INSERT INTO sale_balances
+            (sale_id, amount_paid_total, service_total, service_paid_total, updated_at)
+        SELECT sale_id, amount_paid_total, service_total, service_paid_total, NOW()
+        FROM ({_source_balances_sql(scoped)}) src
+        ON CONFLICT (sale_id) DO UPDATE SET
+            amount_paid_total  = EXCLUDED.amount_paid_total,
+            service_total      = EXCLUDED.service_total,
+            service_paid_total = EXCLUDED.service_paid_total,
+            updated_at         = NOW()
+    """, params).rowcount
+
+
+def record_sale_balance(conn, sale_id):
+    """Call after inserting a sale and its services (same transaction)."""
+    _write_sale_balances(conn, [int(sale_id)])
+
+
+def _locked_sale_balance(conn, sale_id):
+    """Locks the sale row and returns its totals; writes a missing balance row first."""
+    query = """
+        SELECT
+            s.total_amount,
+            b.sale_id IS NOT NULL             AS has_balance,
+            COALESCE(b.amount_paid_total, 0)  AS total_paid,
+            COALESCE(b.service_total, 0)      AS service_total,
+            COALESCE(b.service_paid_total, 0) AS service_paid
+        FROM sales s
+        LEFT JOIN sale_balances b ON b.sale_id = s.id
+        WHERE s.id = %s
+        FOR UPDATE OF s
+    """
+    sale = conn.execute(query, (sale_id,)).fetchone()
+    if sale and not sale["has_balance"]:
+        # Sale written outside the app (e.g. migrate.py) and not reconciled yet
+        _write_sale_balances(conn, [int(sale_id)])
+        sale = conn.execute(query, (sale_id,)).fetchone()
+    return sale
+
+
+def rebuild_sale_balances(sale_ids=None, external_conn=None):
+    """
+    Recomputes sale_balances from sales_services and debt_payments.
+    sale_ids=None rebuilds every sale. Returns the number of rows written.
+    """
+    conn = external_conn if external_conn else get_db()
+    try:
+        if sale_ids is None:
+            conn.execute("LOCK TABLE sale_balances IN EXCLUSIVE MODE")
+            written = _write_sale_balances(conn)
+        else:
+            written = _write_sale_balances(conn, sorted({int(sid) for sid in sale_ids}))
+
+        if not external_conn:
+            conn.commit()
+        return written
+    except Exception:
+        if not external_conn:
+            conn.rollback()
+        raise
+    finally:
+        if not external_conn:
+            conn.close()
+
+
+def verify_sale_balances(external_conn=None):
+    """
+    Compares sale_balances with a fresh recomputation.
+    Returns a list of drifted sales (empty list = balances are consistent).
+    """
+    conn = external_conn if external_conn else get_db()
+    try:
+        rows = conn.execute(f"""
+            SELECT
+                src.sale_id,
+                s.sales_number,
+                src.amount_paid_total  AS expected_amount_paid_total,
+                b.amount_paid_total    AS actual_amount_paid_total,
+                src.service_total      AS expected_service_total,
+                b.service_total        AS actual_service_total,
+                src.service_paid_total AS expected_service_paid_total,
+                b.service_paid_total   AS actual_service_paid_total
+            FROM ({_source_balances_sql(False)}) src
+            JOIN sales s ON s.id = src.sale_id
+            LEFT JOIN sale_balances b ON b.sale_id = src.sale_id
+            WHERE b.sale_id IS NULL
+               OR b.amount_paid_total  <> src.amount_paid_total
+               OR b.service_total      <> src.service_total
+               OR b.service_paid_total <> src.service_paid_total
+            ORDER BY src.sale_id
+        """).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        if not external_conn:
+            conn.close()
+
+
 def get_all_debts():
     conn = get_db()
 
@@ -22,23 +164,14 @@ def get_all_debts():
             s.paid_at,
             m.name  AS mechanic_name,
             pm.name AS payment_method,
-            COALESCE(SUM(dp.amount_paid), 0) AS total_paid,
-            COALESCE((
-                SELECT SUM(ss.price)
-                FROM sales_services ss
-                WHERE ss.sale_id = s.id
-            ), 0) AS service_total,
-            COALESCE((
-                SELECT SUM(dp2.service_portion)
-                FROM debt_payments dp2
-                WHERE dp2.sale_id = s.id
-            ), 0) AS service_paid
+            COALESCE(b.amount_paid_total, 0)  AS total_paid,
+            COALESCE(b.service_total, 0)      AS service_total,
+            COALESCE(b.service_paid_total, 0) AS service_paid
         FROM sales s
         LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-        LEFT JOIN debt_payments dp   ON dp.sale_id = s.id
+        LEFT JOIN sale_balances b    ON b.sale_id = s.id
         WHERE s.status IN ('Unresolved', 'Partial')
-        GROUP BY s.id, m.name, pm.name
         ORDER BY s.transaction_date ASC
     """).fetchall()
 
@@ -77,23 +210,14 @@ def get_debt_detail(sale_id):
             s.paid_at,
             m.name  AS mechanic_name,
             pm.name AS payment_method,
-            COALESCE(SUM(dp.amount_paid), 0) AS total_paid,
-            COALESCE((
-                SELECT SUM(ss.price)
-                FROM sales_services ss
-                WHERE ss.sale_id = s.id
-            ), 0) AS service_total,
-            COALESCE((
-                SELECT SUM(dp2.service_portion)
-                FROM debt_payments dp2
-                WHERE dp2.sale_id = s.id
-            ), 0) AS service_paid
+            COALESCE(b.amount_paid_total, 0)  AS total_paid,
+            COALESCE(b.service_total, 0)      AS service_total,
+            COALESCE(b.service_paid_total, 0) AS service_paid
         FROM sales s
         LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-        LEFT JOIN debt_payments dp   ON dp.sale_id = s.id
+        LEFT JOIN sale_balances b    ON b.sale_id = s.id
         WHERE s.id = %s
-        GROUP BY s.id, m.name, pm.name
     """, (sale_id,)).fetchone()
 
     if not sale:
@@ -188,16 +312,10 @@ def record_payment(sale_id, amount_paid, payment_method_id, reference_no, notes,
         if (pm["category"] or "").strip() == "Debt":
             raise ValueError("Debt payment cannot use a Debt-category payment method.")
 
-        # 1) Current state
-        sale = conn.execute("""
-            SELECT s.total_amount,
-            COALESCE(SUM(dp.amount_paid), 0) AS total_paid
-            FROM sales s
-            LEFT JOIN debt_payments dp ON dp.sale_id = s.id
-            WHERE s.id = %s
-            GROUP BY s.id, s.total_amount
-        """, (sale_id,)).fetchone()
-
+        # 1) Current state, from the sale's balance row. Locking the sale
+        # serializes concurrent payments on it, so both can't pass the
+        # overpayment check against the same remaining balance.
+        sale = _locked_sale_balance(conn, sale_id)
         if not sale:
             raise ValueError("Sale not found.")
 
@@ -205,21 +323,9 @@ def record_payment(sale_id, amount_paid, payment_method_id, reference_no, notes,
         total_paid   = _money(sale['total_paid'])
         remaining    = round(total_amount - total_paid, 2)
 
-        # 1b) Calculate service_portion for this payment
-        # Payments always fill service cost first before items
-        total_service_cost = conn.execute("""
-            SELECT COALESCE(SUM(price), 0)
-            FROM sales_services
-            WHERE sale_id = %s
-        """, (sale_id,)).fetchone()[0]
-        total_service_cost = _money(total_service_cost)
-
-        already_paid_to_service = conn.execute("""
-            SELECT COALESCE(SUM(service_portion), 0)
-            FROM debt_payments
-            WHERE sale_id = %s
-        """, (sale_id,)).fetchone()[0]
-        already_paid_to_service = _money(already_paid_to_service)
+        # 1b) Payments always fill service cost first before items
+        total_service_cost      = _money(sale['service_total'])
+        already_paid_to_service = _money(sale['service_paid'])
 
         remaining_service = round(total_service_cost - already_paid_to_service, 2)
 
@@ -237,11 +343,21 @@ def record_payment(sale_id, amount_paid, payment_method_id, reference_no, notes,
         # 3) Insert payment row with service_portion
         service_portion = round(min(amount_paid, max(remaining_service, 0.0)), 2)
 
-        conn.execute("""
+        payment_row = conn.execute("""
             INSERT INTO debt_payments
                 (sale_id, amount_paid, service_portion, payment_method_id, reference_no, notes, paid_by, paid_at)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (sale_id, amount_paid, service_portion, pm_id, reference_no, notes, paid_by, now))
+            RETURNING id
+        """, (sale_id, amount_paid, service_portion, pm_id, reference_no, notes, paid_by, now)).fetchone()
+        conn.execute("""
+            UPDATE sale_balances
+            SET amount_paid_total  = amount_paid_total + %s,
+                service_paid_total = service_paid_total + %s,
+                updated_at         = NOW()
+            WHERE sale_id = %s
+        """, (amount_paid, service_portion, sale_id))
+        record_cash_debt_payment(conn, payment_row["id"])
+        record_debt_payment_facts(conn, payment_row["id"])
 
         # 4) Determine new status
         new_total_paid = round(total_paid + amount_paid, 2)
@@ -253,6 +369,8 @@ def record_payment(sale_id, amount_paid, payment_method_id, reference_no, notes,
                 "UPDATE sales SET status = 'Paid', paid_at = %s WHERE id = %s",
                 (now, sale_id)
             )
+            # Settled debt sales count as Paid on their sale date
+            record_sale_facts(conn, sale_id)
         else:
             new_status = 'Partial'
             conn.execute(
@@ -1,4 +1,6 @@
 from db.database import get_db
+from services.search_service import build_search_clause, set_similarity_threshold
+from services.catalogue_cache import get_cached_item
 
 def get_items_with_stock(snapshot_date=None):
     conn = get_db()
@@ -26,93 +28,134 @@ def get_items_with_stock(snapshot_date=None):
         """
         items = conn.execute(query, (snapshot_date,)).fetchall()
     else:
+        # Current stock comes from the item_stock_balances projection
+        # (kept in sync by add_transaction) — no ledger aggregation.
         query = """
         SELECT 
             items.id,
             items.name,
             items.a4s_selling_price,
-            COALESCE(SUM(
-                CASE 
-                    WHEN inventory_transactions.transaction_type = 'IN'
-                    THEN inventory_transactions.quantity
-                    ELSE -inventory_transactions.quantity
-                END
-            ), 0) AS current_stock
+            COALESCE(b.on_hand, 0) AS current_stock
         FROM items
-        LEFT JOIN inventory_transactions
-            ON items.id = inventory_transactions.item_id
-        GROUP BY items.id;
+        LEFT JOIN item_stock_balances b
+            ON b.item_id = items.id;
         """
         items = conn.execute(query).fetchall()
 
     conn.close()
     return items
 
-def search_items_with_stock(search_query=None, snapshot_date="2026-01-18", item_id=None):
-    from db.database import get_db
+def get_stock_for_items(item_ids, snapshot_date=None, external_conn=None):
+    """
+    Stock for just the given items, in one round trip.
+    Returns {item_id: {"current_stock": int, "pending_stock": int}}; ids with no
+    stock row come back as zeros.
+
+    Without snapshot_date, current_stock is the item_stock_balances on_hand.
+    With snapshot_date, it uses the legacy ledger rule from get_items_with_stock
+    (all IN, OUT only from the snapshot onwards), scoped to these ids.
+    """
+    normalized_ids = sorted({int(iid) for iid in (item_ids or []) if iid})
+    if not normalized_ids:
+        return {}
+
+    conn = external_conn if external_conn else get_db()
+
+    if snapshot_date:
+        rows = conn.execute("""
+            SELECT
+                b.item_id,
+                COALESCE(l.current_stock, 0) AS current_stock,
+                b.on_order AS pending_stock
+            FROM item_stock_balances b
+            LEFT JOIN (
+                SELECT
+                    item_id,
+                    SUM(
+                        CASE
+                            WHEN transaction_type = 'IN' THEN quantity
+                            WHEN transaction_type = 'OUT' AND transaction_date >= %s THEN -quantity
+                            ELSE 0
+                        END
+                    ) AS current_stock
+                FROM inventory_transactions
+                WHERE item_id = ANY(%s)
+                  AND transaction_type IN ('IN', 'OUT')
+                GROUP BY item_id
+            ) l ON l.item_id = b.item_id
+            WHERE b.item_id = ANY(%s)
+        """, (snapshot_date, normalized_ids, normalized_ids)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT
+                item_id,
+                on_hand AS current_stock,
+                on_order AS pending_stock
+            FROM item_stock_balances
+            WHERE item_id = ANY(%s)
+        """, (normalized_ids,)).fetchall()
+
+    if not external_conn:
+        conn.close()
+
+    stock = {
+        iid: {"current_stock": 0, "pending_stock": 0}
+        for iid in normalized_ids
+    }
+    for row in rows:
+        stock[row["item_id"]] = {
+            "current_stock": int(row["current_stock"] or 0),
+            "pending_stock": int(row["pending_stock"] or 0),
+        }
+    return stock
+
+def search_items_with_stock(search_query=None, snapshot_date=None, item_id=None):
     conn = get_db()
     
     # 1. FETCH THE ROWS
     # Case A: We are looking for ONE specific item by ID (Redirect from Add Item)
     if item_id:
-        sql = "SELECT * FROM items WHERE id = %s"
-        rows = conn.execute(sql, (item_id,)).fetchall()
+        item = get_cached_item(item_id, external_conn=conn)
+        rows = [item] if item else []
         
     # Case B: We are doing a general text search (Normal Search)
+    # Ranked trigram search (see services/search_service.py): best matches
+    # first, typo tolerant, served by the items name/description GIN indexes.
     elif search_query:
-        words = search_query.split()
-        if not words:
+        search = build_search_clause(search_query, ["name", "description"])
+        if not search:
             rows = conn.execute("SELECT * FROM items ORDER BY id DESC LIMIT 75").fetchall()
         else:
-            query_parts = []
-            params = []
-            for word in words:
-                query_parts.append("(name ILIKE %s OR description ILIKE %s)")
-                pattern = f"%{word}%"
-                params.extend([pattern, pattern])
-            
-            where_clause = " AND ".join(query_parts)
-            
-            # Note: Changed ORDER BY to id DESC so new items show at the top
+            where_sql, where_params, order_sql, order_params = search
+            set_similarity_threshold(conn)
             sql = f"""
                 SELECT * FROM items 
-                WHERE {where_clause}
-                ORDER BY id DESC
+                WHERE {where_sql}
+                ORDER BY {order_sql}, id DESC
                 LIMIT 100
             """
-            rows = conn.execute(sql, params).fetchall()
+            rows = conn.execute(sql, where_params + order_params).fetchall()
     else:
         rows = []
 
-    # 2. GET STOCK LEVELS
-    from services.inventory_service import get_items_with_stock
-    all_stock = get_items_with_stock(snapshot_date)
-    stock_map = {s["id"]: s["current_stock"] for s in all_stock}
-
-    # 3. GET PENDING STOCK
-    # Only counts units still outstanding on PENDING or PARTIAL POs.
-    # quantity_ordered - quantity_received = true remaining balance.
+    # 2. GET STOCK + PENDING FOR JUST THESE ROWS
+    # Pending = units still outstanding on PENDING or PARTIAL POs (on_order).
     # NOTE (future branches): add branch_id filter here when ready.
-    pending_rows = conn.execute("""
-        SELECT
-            pi.item_id,
-            SUM(pi.quantity_ordered - pi.quantity_received) AS pending_stock
-        FROM po_items pi
-        JOIN purchase_orders po ON po.id = pi.po_id
-        WHERE po.status IN ('PENDING', 'PARTIAL')
-        AND pi.quantity_ordered > pi.quantity_received
-        GROUP BY pi.item_id
-    """).fetchall()
-    pending_map = {row["item_id"]: row["pending_stock"] for row in pending_rows}
+    stock_map = get_stock_for_items(
+        [row["id"] for row in rows],
+        snapshot_date=snapshot_date,
+        external_conn=conn,
+    )
 
     conn.close()
 
-    # 4. MERGE
+    # 3. MERGE
     results = []
     for row in rows:
         d = dict(row)
-        d["current_stock"] = stock_map.get(row["id"], 0)
-        d["pending_stock"] = pending_map.get(row["id"], 0)
+        stock = stock_map.get(row["id"], {})
+        d["current_stock"] = stock.get("current_stock", 0)
+        d["pending_stock"] = stock.get("pending_stock", 0)
         results.append(d)
 
     return results
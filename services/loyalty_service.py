@@ -477,6 +477,9 @@ def log_stamps_for_sale(sale_id, customer_id, service_ids, item_ids, sale_date,
         for row in rule_rows:
             rules_by_program[int(row["program_id"])].append(dict(row))
 
+    stamp_rows = []
+    point_rows = []
+
     for program in programs:
         program_id = int(program["id"])
         qualifies_on_stamp = False
@@ -488,13 +491,7 @@ def log_stamps_for_sale(sale_id, customer_id, service_ids, item_ids, sale_date,
                 qualifies_on_stamp = int(program["qualifying_id"]) in item_ids_set
 
             if qualifies_on_stamp:
-                external_conn.execute(
-                    """
-                    INSERT INTO loyalty_stamps (customer_id, program_id, sale_id, stamped_at)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (customer_id, program_id, sale_id, sale_date),
-                )
+                stamp_rows.append((customer_id, program_id, sale_id, sale_date))
 
         if int(program["points_enabled"] or 0) != 1:
             continue
@@ -503,27 +500,122 @@ def log_stamps_for_sale(sale_id, customer_id, service_ids, item_ids, sale_date,
             if not _rule_matches(rule, service_ids_set, item_ids_set):
                 continue
 
-            external_conn.execute(
-                """
-                INSERT INTO loyalty_point_ledger (
-                    customer_id, program_id, rule_id, sale_id, points, awarded_at, note
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (customer_id, program_id, sale_id, rule_id) DO NOTHING
-                """,
-                (
-                    customer_id,
-                    program_id,
-                    int(rule["id"]),
-                    sale_id,
-                    int(rule["points"]),
-                    sale_date,
-                    rule.get("rule_name") or "Rule match",
-                ),
-            )
+            point_rows.append((
+                customer_id,
+                program_id,
+                int(rule["id"]),
+                sale_id,
+                int(rule["points"]),
+                sale_date,
+                rule.get("rule_name") or "Rule match",
+            ))
 
             if int(rule.get("stop_on_match") or 0) == 1:
                 break
 
+    # One multi-row insert per table instead of one round trip per program / rule
+    if stamp_rows:
+        external_conn.execute_values(
+            """
+            INSERT INTO loyalty_stamps (customer_id, program_id, sale_id, stamped_at)
+            VALUES %s
+            """,
+            stamp_rows,
+        )
+
+    if point_rows:
+        external_conn.execute_values(
+            """
+            INSERT INTO loyalty_point_ledger (
+                customer_id, program_id, rule_id, sale_id, points, awarded_at, note
+            ) VALUES %s
+            ON CONFLICT (customer_id, program_id, sale_id, rule_id) DO NOTHING
+            """,
+            point_rows,
+        )
+
+
+def _get_program_balances(conn, customer_ids, programs, unredeemed_only):
+    """
+    Stamp count, points balance and redemption count for every customer ×
+    program pair, in one round trip. Each program only counts rows inside its
+    own period. unredeemed_only=True skips stamps / points already consumed
+    by a redemption (REDEEMABLE programs); EARN_ONLY programs count everything.
+
+    Returns {(customer_id, program_id): {"stamp_count", "points_balance", "redemption_count"}}.
+    Pairs with no activity are missing; callers default them to 0.
+    """
+    if not customer_ids or not programs:
+        return {}
+
+    unredeemed_sql = "AND x.redemption_id IS NULL" if unredeemed_only else ""
+    rows = conn.execute(
+        f"""
+        WITH p AS (
+            SELECT *
+            FROM UNNEST(%s::int[], %s::date[], %s::date[]) AS p(program_id, period_start, period_end)
+        ),
+        stamps AS (
+            SELECT x.customer_id, x.program_id, COUNT(*) AS stamp_count
+            FROM loyalty_stamps x
+            JOIN p ON p.program_id = x.program_id
+            WHERE x.customer_id = ANY(%s)
+              {unredeemed_sql}
+              AND x.stamped_at >= p.period_start
+              AND x.stamped_at < (p.period_end + INTERVAL '1 day')
+            GROUP BY x.customer_id, x.program_id
+        ),
+        points AS (
+            SELECT x.customer_id, x.program_id, SUM(x.points) AS points_balance
+            FROM loyalty_point_ledger x
+            JOIN p ON p.program_id = x.program_id
+            WHERE x.customer_id = ANY(%s)
+              {unredeemed_sql}
+              AND x.awarded_at >= p.period_start
+              AND x.awarded_at < (p.period_end + INTERVAL '1 day')
+            GROUP BY x.customer_id, x.program_id
+        ),
+        redemptions AS (
+            SELECT x.customer_id, x.program_id, COUNT(*) AS redemption_count
+            FROM loyalty_redemptions x
+            JOIN p ON p.program_id = x.program_id
+            WHERE x.customer_id = ANY(%s)
+              AND x.redeemed_at >= p.period_start
+              AND x.redeemed_at < (p.period_end + INTERVAL '1 day')
+            GROUP BY x.customer_id, x.program_id
+        )
+        SELECT
+            customer_id,
+            program_id,
+            COALESCE(stamps.stamp_count, 0) AS stamp_count,
+            COALESCE(points.points_balance, 0) AS points_balance,
+            COALESCE(redemptions.redemption_count, 0) AS redemption_count
+        FROM stamps
+        FULL JOIN points USING (customer_id, program_id)
+        FULL JOIN redemptions USING (customer_id, program_id)
+        """,
+        (
+            [int(prog["id"]) for prog in programs],
+            [prog["period_start"] for prog in programs],
+            [prog["period_end"] for prog in programs],
+            customer_ids,
+            customer_ids,
+            customer_ids,
+        ),
+    ).fetchall()
+
+    return {
+        (int(row["customer_id"]), int(row["program_id"])): {
+            "stamp_count": int(row["stamp_count"] or 0),
+            "points_balance": int(row["points_balance"] or 0),
+            "redemption_count": int(row["redemption_count"] or 0),
+        }
+        for row in rows
+    }
+
+
+_NO_BALANCE = {"stamp_count": 0, "points_balance": 0, "redemption_count": 0}
+
 
 def get_customer_eligibility(customer_id, branch_id=None):
     conn = get_db()
@@ -566,50 +658,17 @@ def get_customer_eligibility(customer_id, branch_id=None):
         (today, today, branch_id),
     ).fetchall()
 
+    balances = _get_program_balances(conn, [int(customer_id)], programs, unredeemed_only=True)
+
     result = []
     for prog in programs:
-        stamp_count = conn.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM loyalty_stamps
-            WHERE customer_id = %s
-              AND program_id = %s
-              AND redemption_id IS NULL
-              AND stamped_at >= %s
-              AND stamped_at < (%s::date + INTERVAL '1 day')
-            """,
-            (customer_id, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchone()["cnt"]
-
-        points_balance = conn.execute(
-            """
-            SELECT COALESCE(SUM(points), 0) AS total_points
-            FROM loyalty_point_ledger
-            WHERE customer_id = %s
-              AND program_id = %s
-              AND redemption_id IS NULL
-              AND awarded_at >= %s
-              AND awarded_at < (%s::date + INTERVAL '1 day')
-            """,
-            (customer_id, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchone()["total_points"]
-
-        redemption_count = conn.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM loyalty_redemptions
-            WHERE customer_id = %s
-              AND program_id = %s
-              AND DATE(redeemed_at) >= %s
-              AND DATE(redeemed_at) <= %s
-            """,
-            (customer_id, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchone()["cnt"]
+        balance = balances.get((int(customer_id), int(prog["id"])), _NO_BALANCE)
+        stamp_count = balance["stamp_count"]
+        points_balance = balance["points_balance"]
+        redemption_count = balance["redemption_count"]
 
         threshold = int(prog["threshold"] or 0)
         points_threshold = int(prog["points_threshold"] or 0)
-        stamp_count = int(stamp_count or 0)
-        points_balance = int(points_balance or 0)
         reward_basis = (prog["reward_basis"] or "STAMPS").upper()
         program_mode = (prog["program_mode"] or "REDEEMABLE").upper()
         stamp_enabled = int(prog["stamp_enabled"] or 0) == 1
@@ -653,7 +712,7 @@ def get_customer_eligibility(customer_id, branch_id=None):
                 "progress_threshold": progress_threshold,
                 "progress_remaining": progress_remaining,
                 "progress_unit": progress_unit,
-                "redemption_count": int(redemption_count or 0),
+                "redemption_count": redemption_count,
                 "reward_type": prog["reward_type"],
                 "reward_value": prog["reward_value"],
                 "reward_description": prog["reward_description"],
@@ -715,51 +774,9 @@ def get_customer_eligibility_bulk(customer_ids, branch_id=None):
         conn.close()
         return by_customer
 
-    for prog in programs:
-        stamp_rows = conn.execute(
-            """
-            SELECT customer_id, COUNT(*) AS cnt
-            FROM loyalty_stamps
-            WHERE customer_id = ANY(%s)
-              AND program_id = %s
-              AND redemption_id IS NULL
-              AND stamped_at >= %s
-              AND stamped_at < (%s::date + INTERVAL '1 day')
-            GROUP BY customer_id
-            """,
-            (normalized_ids, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchall()
-        stamp_map = {int(row["customer_id"]): int(row["cnt"]) for row in stamp_rows}
-
-        points_rows = conn.execute(
-            """
-            SELECT customer_id, COALESCE(SUM(points), 0) AS total_points
-            FROM loyalty_point_ledger
-            WHERE customer_id = ANY(%s)
-              AND program_id = %s
-              AND redemption_id IS NULL
-              AND awarded_at >= %s
-              AND awarded_at < (%s::date + INTERVAL '1 day')
-            GROUP BY customer_id
-            """,
-            (normalized_ids, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchall()
-        points_map = {int(row["customer_id"]): int(row["total_points"] or 0) for row in points_rows}
-
-        redemption_rows = conn.execute(
-            """
-            SELECT customer_id, COUNT(*) AS cnt
-            FROM loyalty_redemptions
-            WHERE customer_id = ANY(%s)
-              AND program_id = %s
-              AND DATE(redeemed_at) >= %s
-              AND DATE(redeemed_at) <= %s
-            GROUP BY customer_id
-            """,
-            (normalized_ids, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchall()
-        redemption_map = {int(row["customer_id"]): int(row["cnt"]) for row in redemption_rows}
+    balances = _get_program_balances(conn, normalized_ids, programs, unredeemed_only=True)
 
+    for prog in programs:
         threshold = int(prog["threshold"] or 0)
         points_threshold = int(prog["points_threshold"] or 0)
         reward_basis = (prog["reward_basis"] or "STAMPS").upper()
@@ -767,8 +784,9 @@ def get_customer_eligibility_bulk(customer_ids, branch_id=None):
         stamp_enabled = int(prog["stamp_enabled"] or 0) == 1
         points_enabled = int(prog["points_enabled"] or 0) == 1
         for customer_id in normalized_ids:
-            stamp_count = stamp_map.get(customer_id, 0)
-            points_balance = points_map.get(customer_id, 0)
+            balance = balances.get((customer_id, int(prog["id"])), _NO_BALANCE)
+            stamp_count = balance["stamp_count"]
+            points_balance = balance["points_balance"]
             is_eligible = False if program_mode == "EARN_ONLY" else _is_eligible(
                 stamp_count=stamp_count,
                 stamp_threshold=threshold,
@@ -807,7 +825,7 @@ def get_customer_eligibility_bulk(customer_ids, branch_id=None):
                     "progress_threshold": progress_threshold,
                     "progress_remaining": progress_remaining,
                     "progress_unit": progress_unit,
-                    "redemption_count": redemption_map.get(customer_id, 0),
+                    "redemption_count": balance["redemption_count"],
                     "reward_type": prog["reward_type"],
                     "reward_value": prog["reward_value"],
                     "reward_description": prog["reward_description"],
@@ -857,31 +875,11 @@ def get_customer_earn_only(customer_id, branch_id=None):
         (today, today, branch_id),
     ).fetchall()
 
+    balances = _get_program_balances(conn, [int(customer_id)], programs, unredeemed_only=False)
+
     result = []
     for prog in programs:
-        stamp_count = conn.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM loyalty_stamps
-            WHERE customer_id = %s
-              AND program_id = %s
-              AND stamped_at >= %s
-              AND stamped_at < (%s::date + INTERVAL '1 day')
-            """,
-            (customer_id, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchone()["cnt"]
-
-        points_balance = conn.execute(
-            """
-            SELECT COALESCE(SUM(points), 0) AS total_points
-            FROM loyalty_point_ledger
-            WHERE customer_id = %s
-              AND program_id = %s
-              AND awarded_at >= %s
-              AND awarded_at < (%s::date + INTERVAL '1 day')
-            """,
-            (customer_id, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchone()["total_points"]
+        balance = balances.get((int(customer_id), int(prog["id"])), _NO_BALANCE)
 
         result.append(
             {
@@ -893,8 +891,8 @@ def get_customer_earn_only(customer_id, branch_id=None):
                 "program_mode": "EARN_ONLY",
                 "stamp_enabled": int(prog["stamp_enabled"] or 0) == 1,
                 "points_enabled": int(prog["points_enabled"] or 0) == 1,
-                "stamp_count": int(stamp_count or 0),
-                "points_balance": int(points_balance or 0),
+                "stamp_count": balance["stamp_count"],
+                "points_balance": balance["points_balance"],
                 "period_end": prog["period_end"],
             }
         )
@@ -946,36 +944,11 @@ def get_customer_earn_only_bulk(customer_ids, branch_id=None):
         conn.close()
         return by_customer
 
-    for prog in programs:
-        stamp_rows = conn.execute(
-            """
-            SELECT customer_id, COUNT(*) AS cnt
-            FROM loyalty_stamps
-            WHERE customer_id = ANY(%s)
-              AND program_id = %s
-              AND stamped_at >= %s
-              AND stamped_at < (%s::date + INTERVAL '1 day')
-            GROUP BY customer_id
-            """,
-            (normalized_ids, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchall()
-        stamp_map = {int(row["customer_id"]): int(row["cnt"] or 0) for row in stamp_rows}
-
-        points_rows = conn.execute(
-            """
-            SELECT customer_id, COALESCE(SUM(points), 0) AS total_points
-            FROM loyalty_point_ledger
-            WHERE customer_id = ANY(%s)
-              AND program_id = %s
-              AND awarded_at >= %s
-              AND awarded_at < (%s::date + INTERVAL '1 day')
-            GROUP BY customer_id
-            """,
-            (normalized_ids, prog["id"], prog["period_start"], prog["period_end"]),
-        ).fetchall()
-        points_map = {int(row["customer_id"]): int(row["total_points"] or 0) for row in points_rows}
+    balances = _get_program_balances(conn, normalized_ids, programs, unredeemed_only=False)
 
+    for prog in programs:
         for customer_id in normalized_ids:
+            balance = balances.get((customer_id, int(prog["id"])), _NO_BALANCE)
             by_customer[customer_id].append(
                 {
                     "program_id": prog["id"],
@@ -986,8 +959,8 @@ def get_customer_earn_only_bulk(customer_ids, branch_id=None):
                     "program_mode": "EARN_ONLY",
                     "stamp_enabled": int(prog["stamp_enabled"] or 0) == 1,
                     "points_enabled": int(prog["points_enabled"] or 0) == 1,
-                    "stamp_count": stamp_map.get(customer_id, 0),
-                    "points_balance": points_map.get(customer_id, 0),
+                    "stamp_count": balance["stamp_count"],
+                    "points_balance": balance["points_balance"],
                     "period_end": prog["period_end"],
                 }
             )
@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 
 import psycopg2.extras
@@ -9,6 +10,10 @@ from utils.formatters import format_date
 DEFAULT_NOTIFICATION_LIMIT = 10
 MAX_NOTIFICATION_LIMIT = 50
 
+# When on, notification writes queued with write_notifications() run after
+# the business transaction commits, on their own short transaction.
+NOTIFICATIONS_DEFERRED = os.environ.get("NOTIFICATIONS_DEFERRED", "0").strip().lower() in {"1", "true", "yes", "on"}
+
 
 def _now():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -40,6 +45,23 @@ def _serialize_notification(row):
     return data
 
 
+def _notification_fields(notification_type, title, message, category, entity_type, entity_id,
+                        action_url, created_by, metadata):
+    """Insert values for every notification column after recipient_user_id."""
+    return (
+        str(notification_type or "").strip(),
+        str(category or "general").strip(),
+        str(title or "").strip(),
+        str(message or "").strip(),
+        str(entity_type or "").strip() or None,
+        int(entity_id) if entity_id is not None else None,
+        str(action_url or "").strip() or None,
+        _now(),
+        int(created_by) if created_by is not None else None,
+        _jsonb(metadata),
+    )
+
+
 def list_active_user_ids(role=None, external_conn=None):
     conn = external_conn if external_conn else get_db()
     params = []
@@ -109,18 +131,9 @@ def create_notification(
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, NULL, 0, %s, %s, %s)
             RETURNING *
             """,
-            (
-                recipient_user_id,
-                str(notification_type or "").strip(),
-                str(category or "general").strip(),
-                str(title or "").strip(),
-                str(message or "").strip(),
-                str(entity_type or "").strip() or None,
-                int(entity_id) if entity_id is not None else None,
-                str(action_url or "").strip() or None,
-                _now(),
-                int(created_by) if created_by is not None else None,
-                _jsonb(metadata),
+            (recipient_user_id,) + _notification_fields(
+                notification_type, title, message, category, entity_type, entity_id,
+                action_url, created_by, metadata,
             ),
         ).fetchone()
 
@@ -136,6 +149,30 @@ def create_notification(
             conn.close()
 
 
+# Recipients come from the SELECT; every other column is the same bound value
+_FAN_OUT_INSERT_SQL = """
+    INSERT INTO notifications (
+        recipient_user_id,
+        notification_type,
+        category,
+        title,
+        message,
+        entity_type,
+        entity_id,
+        action_url,
+        is_read,
+        read_at,
+        is_archived,
+        created_at,
+        created_by,
+        metadata
+    )
+    SELECT
+        recipient.id, %s, %s, %s, %s, %s, %s, %s, 0, NULL, 0, %s, %s, %s
+    FROM ({recipients_sql}) AS recipient
+"""
+
+
 def create_notifications_for_users(
     recipient_user_ids,
     notification_type,
@@ -171,48 +208,84 @@ def create_notifications_for_users(
         if not external_conn:
             conn.execute("BEGIN")
 
-        rows = []
-        for recipient_user_id in unique_recipient_ids:
-            row = conn.execute(
-                """
-                INSERT INTO notifications (
-                    recipient_user_id,
-                    notification_type,
-                    category,
-                    title,
-                    message,
-                    entity_type,
-                    entity_id,
-                    action_url,
-                    is_read,
-                    read_at,
-                    is_archived,
-                    created_at,
-                    created_by,
-                    metadata
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, NULL, 0, %s, %s, %s)
-                RETURNING *
-                """,
-                (
-                    recipient_user_id,
-                    str(notification_type or "").strip(),
-                    str(category or "general").strip(),
-                    str(title or "").strip(),
-                    str(message or "").strip(),
-                    str(entity_type or "").strip() or None,
-                    int(entity_id) if entity_id is not None else None,
-                    str(action_url or "").strip() or None,
-                    _now(),
-                    int(created_by) if created_by is not None else None,
-                    _jsonb(metadata),
-                ),
-            ).fetchone()
-            rows.append(_serialize_notification(row))
+        # One statement for every recipient, in the order they were given
+        recipients_sql = "SELECT id FROM UNNEST(%s::int[]) WITH ORDINALITY AS r(id, position) ORDER BY position"
+        rows = conn.execute(
+            _FAN_OUT_INSERT_SQL.format(recipients_sql=recipients_sql) + " RETURNING *",
+            _notification_fields(
+                notification_type, title, message, category, entity_type, entity_id,
+                action_url, created_by, metadata,
+            ) + (unique_recipient_ids,),
+        ).fetchall()
+
+        if not external_conn:
+            conn.commit()
+        return [_serialize_notification(row) for row in rows]
+    except Exception:
+        if not external_conn:
+            conn.rollback()
+        raise
+    finally:
+        if not external_conn:
+            conn.close()
+
+
+def _int_ids(values):
+    ids = []
+    for value in values or []:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def create_notifications_for_role(
+    role,
+    notification_type,
+    title,
+    message,
+    *,
+    exclude_user_ids=None,
+    category="general",
+    entity_type=None,
+    entity_id=None,
+    action_url=None,
+    created_by=None,
+    metadata=None,
+    external_conn=None,
+):
+    """
+    Notifies every active user with `role` (minus exclude_user_ids) in a
+    single INSERT ... SELECT FROM users, without reading the recipients
+    into Python first. Returns the number of notifications created.
+    """
+    excluded_ids = _int_ids(exclude_user_ids)
+
+    conn = external_conn if external_conn else get_db()
+
+    try:
+        if not external_conn:
+            conn.execute("BEGIN")
+
+        recipients_sql = """
+            SELECT id
+            FROM users
+            WHERE is_active = 1
+              AND role = %s
+              AND id <> ALL(%s::int[])
+        """
+        cursor = conn.execute(
+            _FAN_OUT_INSERT_SQL.format(recipients_sql=recipients_sql),
+            _notification_fields(
+                notification_type, title, message, category, entity_type, entity_id,
+                action_url, created_by, metadata,
+            ) + (str(role).strip().lower(), excluded_ids),
+        )
 
         if not external_conn:
             conn.commit()
-        return rows
+        return cursor.rowcount
     except Exception:
         if not external_conn:
             conn.rollback()
@@ -222,14 +295,53 @@ def create_notifications_for_users(
             conn.close()
 
 
+# ─────────────────────────────────────────────
+# DEFERRED WRITES
+# ─────────────────────────────────────────────
+
+def _run_deferred_write(write):
+    conn = get_db()
+    try:
+        conn.execute("BEGIN")
+        write(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠ Deferred notification write failed: {e}")
+    finally:
+        conn.close()
+
+
+def write_notifications(conn, write):
+    """
+    Runs write(conn) for a caller that is inside a business transaction on
+    `conn`. With NOTIFICATIONS_DEFERRED on, it runs after that transaction
+    commits instead (nothing is written if it rolls back), so notification
+    inserts and archives no longer hold the transaction's row locks open.
+    Deferred writes are best-effort: a failure is logged, not raised.
+    """
+    if NOTIFICATIONS_DEFERRED:
+        conn.after_commit(lambda: _run_deferred_write(write))
+    else:
+        write(conn)
+
+
 def archive_notifications(
     *,
     recipient_user_id=None,
     entity_type=None,
     entity_id=None,
     notification_types=None,
+    recipient_role=None,
+    exclude_user_ids=None,
     external_conn=None,
 ):
+    """
+    Archives the matching notifications. With recipient_role, it does so
+    only when that role still has an active user outside exclude_user_ids
+    (the same recipients create_notifications_for_role would notify), so a
+    replaced notification is never archived without a successor.
+    """
     where_clauses = ["is_archived = 0"]
     params = []
 
@@ -247,6 +359,18 @@ def archive_notifications(
         if normalized_types:
             where_clauses.append("notification_type = ANY(%s)")
             params.append(normalized_types)
+    if recipient_role:
+        where_clauses.append("""
+            EXISTS (
+                SELECT 1
+                FROM users
+                WHERE is_active = 1
+                  AND role = %s
+                  AND id <> ALL(%s::int[])
+            )
+        """)
+        params.append(str(recipient_role).strip().lower())
+        params.append(_int_ids(exclude_user_ids))
 
     conn = external_conn if external_conn else get_db()
 
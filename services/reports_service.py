@@ -1,5 +1,11 @@
 from db.database import get_db
 from utils.formatters import format_date
+from db.filters import date_range_sql, on_date_sql, on_dates_sql
+from services.sales_facts_service import (
+    get_item_sales_summary,
+    get_mechanic_daily_facts,
+    get_sales_totals,
+)
 
 
 # ─────────────────────────────────────────────
@@ -57,6 +63,40 @@ def _build_mechanic_maps(sales_rows, debt_collected_rows, services_by_sale):
     return mechanic_map, debt_mechanic_map
 
 
+def _mechanic_maps_from_facts(fact_rows):
+    """
+    Same shape as _build_mechanic_maps, but from sales_daily_mechanic_facts rows
+    (one or many days) instead of individual sales and debt payments.
+    """
+    mechanic_map      = {}
+    debt_mechanic_map = {}
+
+    for row in fact_rows:
+        mech_id         = row["mechanic_id"]
+        mechanic_name   = row["mechanic_name"] or "—"
+        commission_rate = _num(row["commission_rate"])
+        paid_services   = _num(row["paid_services_total"])
+        debt_services   = round(_num(row["debt_service_total"]), 2)
+
+        if paid_services > 0:
+            entry = mechanic_map.setdefault(mech_id, {
+                "mechanic_name":       mechanic_name,
+                "commission_rate":     commission_rate,
+                "paid_services_total": 0.0,
+            })
+            entry["paid_services_total"] += paid_services
+
+        if debt_services > 0:
+            entry = debt_mechanic_map.setdefault(mech_id, {
+                "mechanic_name":      mechanic_name,
+                "commission_rate":    commission_rate,
+                "debt_service_total": 0.0,
+            })
+            entry["debt_service_total"] += debt_services
+
+    return mechanic_map, debt_mechanic_map
+
+
 def _calculate_mechanic_payouts(mechanic_map, debt_mechanic_map):
     """
     Runs quota + commission math for every mechanic found in either map.
@@ -166,7 +206,8 @@ def get_mechanic_payouts_for_dates(report_dates):
         return {}
 
     conn = get_db()
-    placeholders = ",".join(["%s"] * len(normalized_dates))
+    sales_dates_sql, sales_dates_params = on_dates_sql("s.transaction_date", normalized_dates)
+    debt_dates_sql, debt_dates_params = on_dates_sql("dp.paid_at", normalized_dates)
 
     sales_rows = conn.execute(f"""
         SELECT
@@ -178,9 +219,9 @@ def get_mechanic_payouts_for_dates(report_dates):
             m.commission_rate
         FROM sales s
         LEFT JOIN mechanics m ON m.id = s.mechanic_id
-        WHERE DATE(s.transaction_date) IN ({placeholders})
+        WHERE {sales_dates_sql}
           AND s.mechanic_id IS NOT NULL
-    """, normalized_dates).fetchall()
+    """, sales_dates_params).fetchall()
 
     debt_collected_rows = conn.execute(f"""
         SELECT
@@ -192,9 +233,9 @@ def get_mechanic_payouts_for_dates(report_dates):
         FROM debt_payments dp
         JOIN sales s ON s.id = dp.sale_id
         LEFT JOIN mechanics m ON m.id = s.mechanic_id
-        WHERE DATE(dp.paid_at) IN ({placeholders})
+        WHERE {debt_dates_sql}
           AND s.mechanic_id IS NOT NULL
-    """, normalized_dates).fetchall()
+    """, debt_dates_params).fetchall()
 
     if not sales_rows and not debt_collected_rows:
         conn.close()
@@ -263,7 +304,8 @@ def get_mechanic_payouts_for_date(report_date):
 
 def get_sales_by_date(report_date):
     conn = get_db()
-    rows = conn.execute("""
+    date_sql, date_params = date_range_sql("transaction_date", report_date, report_date)
+    rows = conn.execute(f"""
         SELECT
             items.name,
             inventory_transactions.quantity,
@@ -272,15 +314,16 @@ def get_sales_by_date(report_date):
         FROM inventory_transactions
         JOIN items ON items.id = inventory_transactions.item_id
         WHERE transaction_type = 'OUT'
-        AND DATE(transaction_date) = %s
-    """, (report_date,)).fetchall()
+        {date_sql}
+    """, date_params).fetchall()
     conn.close()
     return rows
 
 
 def get_sales_by_range(start_date, end_date):
     conn = get_db()
-    rows = conn.execute("""
+    date_sql, date_params = date_range_sql("transaction_date", start_date, end_date)
+    rows = conn.execute(f"""
         SELECT
             items.name,
             inventory_transactions.quantity,
@@ -289,8 +332,8 @@ def get_sales_by_range(start_date, end_date):
         FROM inventory_transactions
         JOIN items ON items.id = inventory_transactions.item_id
         WHERE transaction_type = 'OUT'
-        AND DATE(transaction_date) BETWEEN %s AND %s
-    """, (start_date, end_date)).fetchall()
+        {date_sql}
+    """, date_params).fetchall()
     conn.close()
     return rows
 
@@ -310,13 +353,12 @@ def get_all_unresolved_sales(conn):
             s.transaction_date,
             m.name  AS mechanic_name,
             pm.name AS payment_method,
-            COALESCE(SUM(dp.amount_paid), 0) AS total_paid
+            COALESCE(b.amount_paid_total, 0) AS total_paid
         FROM sales s
         LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-        LEFT JOIN debt_payments dp   ON dp.sale_id = s.id
+        LEFT JOIN sale_balances b    ON b.sale_id = s.id
         WHERE s.status IN ('Unresolved', 'Partial')
-        GROUP BY s.id, m.name, pm.name
         ORDER BY s.transaction_date ASC
     """).fetchall()
 
@@ -389,8 +431,10 @@ def get_sales_report_by_date(report_date):
     Return value is identical to before — PDF template is untouched.
     """
     conn = get_db()
+    sales_date_sql, sales_date_params = on_date_sql("s.transaction_date", report_date)
+    debt_date_sql, debt_date_params = on_date_sql("dp.paid_at", report_date)
 
-    sales_rows = conn.execute("""
+    sales_rows = conn.execute(f"""
         SELECT
             s.id,
             s.sales_number,
@@ -406,13 +450,13 @@ def get_sales_report_by_date(report_date):
         FROM sales s
         LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-        WHERE DATE(s.transaction_date) = %s
+        WHERE {sales_date_sql}
         ORDER BY s.transaction_date ASC
-    """, (report_date,)).fetchall()
+    """, sales_date_params).fetchall()
 
     all_unresolved = get_all_unresolved_sales(conn)
 
-    debt_collected_rows = conn.execute("""
+    debt_collected_rows = conn.execute(f"""
         SELECT
             dp.sale_id,
             dp.amount_paid,
@@ -431,9 +475,9 @@ def get_sales_report_by_date(report_date):
         JOIN sales s ON s.id = dp.sale_id
         LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = dp.payment_method_id
-        WHERE DATE(dp.paid_at) = %s
+        WHERE {debt_date_sql}
         ORDER BY dp.paid_at ASC
-    """, (report_date,)).fetchall()
+    """, debt_date_params).fetchall()
 
     if not sales_rows and not all_unresolved and not debt_collected_rows:
         conn.close()
@@ -552,10 +596,15 @@ def get_sales_report_by_range(start_date, end_date):
     """
     Pulls all completed sales between start_date and end_date (inclusive).
     Return value is identical to before — PDF template is untouched.
+
+    Totals, items sold and mechanic payouts / quota misses come from the daily
+    sales facts; only the per-sale listing reads the sales rows themselves.
     """
     conn = get_db()
+    sales_date_sql, sales_date_params = date_range_sql("s.transaction_date", start_date, end_date)
+    debt_date_sql, debt_date_params = date_range_sql("dp.paid_at", start_date, end_date)
 
-    sales_rows = conn.execute("""
+    sales_rows = conn.execute(f"""
         SELECT
             s.id,
             s.sales_number,
@@ -571,13 +620,14 @@ def get_sales_report_by_range(start_date, end_date):
         FROM sales s
         LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = s.payment_method_id
-        WHERE DATE(s.transaction_date) BETWEEN %s AND %s
+        WHERE s.status = 'Paid'
+        {sales_date_sql}
         ORDER BY s.transaction_date ASC
-    """, (start_date, end_date)).fetchall()
+    """, sales_date_params).fetchall()
 
     all_unresolved = get_all_unresolved_sales(conn)
 
-    debt_collected_rows = conn.execute("""
+    debt_collected_rows = conn.execute(f"""
         SELECT
             dp.sale_id,
             dp.amount_paid,
@@ -588,54 +638,51 @@ def get_sales_report_by_range(start_date, end_date):
             s.sales_number,
             s.customer_name,
             s.total_amount,
-            s.mechanic_id,
-            m.name            AS mechanic_name,
-            m.commission_rate,
             pm.name           AS payment_method
         FROM debt_payments dp
         JOIN sales s ON s.id = dp.sale_id
-        LEFT JOIN mechanics m        ON m.id = s.mechanic_id
         LEFT JOIN payment_methods pm ON pm.id = dp.payment_method_id
-        WHERE DATE(dp.paid_at) BETWEEN %s AND %s
+        WHERE TRUE
+        {debt_date_sql}
         ORDER BY dp.paid_at ASC
-    """, (start_date, end_date)).fetchall()
+    """, debt_date_params).fetchall()
 
     if not sales_rows and not all_unresolved and not debt_collected_rows:
         conn.close()
         return []
 
-    paid_sale_ids = [row["id"] for row in sales_rows if row["status"] == "Paid"]
-    all_sale_ids  = [row["id"] for row in sales_rows]
+    sale_ids         = [row["id"] for row in sales_rows]
     items_by_sale    = {}
     services_by_sale = {}
 
-    if paid_sale_ids:
-        placeholders = ",".join(["%s"] * len(paid_sale_ids))
-        items_rows = conn.execute(f"""
+    if sale_ids:
+        items_rows = conn.execute("""
             SELECT si.sale_id, i.name AS item_name, si.quantity,
                    si.original_unit_price, si.discount_percent,
                    si.discount_amount, si.final_unit_price,
                    (si.quantity * si.final_unit_price) AS line_total
             FROM sales_items si
             JOIN items i ON i.id = si.item_id
-            WHERE si.sale_id IN ({placeholders})
+            WHERE si.sale_id = ANY(%s)
             ORDER BY si.sale_id, i.name
-        """, paid_sale_ids).fetchall()
+        """, (sale_ids,)).fetchall()
         for row in items_rows:
             items_by_sale.setdefault(row["sale_id"], []).append(dict(row))
 
-    if all_sale_ids:
-        placeholders = ",".join(["%s"] * len(all_sale_ids))
-        services_rows = conn.execute(f"""
+        services_rows = conn.execute("""
             SELECT ss.sale_id, sv.name AS service_name, ss.price
             FROM sales_services ss
             JOIN services sv ON sv.id = ss.service_id
-            WHERE ss.sale_id IN ({placeholders})
+            WHERE ss.sale_id = ANY(%s)
             ORDER BY ss.sale_id, sv.name
-        """, all_sale_ids).fetchall()
+        """, (sale_ids,)).fetchall()
         for row in services_rows:
             services_by_sale.setdefault(row["sale_id"], []).append(dict(row))
 
+    totals_facts   = get_sales_totals(conn, start_date, end_date)
+    mechanic_facts = get_mechanic_daily_facts(conn, start_date, end_date)
+    items_summary  = get_item_sales_summary(conn, start_date, end_date)
+
     conn.close()
 
     debt_collected = [
@@ -652,55 +699,38 @@ def get_sales_report_by_range(start_date, end_date):
         }
         for row in debt_collected_rows
     ]
-    total_debt_collected = round(sum(r["amount_paid"] for r in debt_collected), 2)
-
-    paid_sales            = []
-    total_gross           = 0.0
-    total_service_revenue = 0.0
+    total_debt_collected = round(totals_facts["debt_collected"], 2)
 
+    paid_sales = []
     for sale in sales_rows:
         sale_id        = sale["id"]
-        services_total  = sum(_num(svc["price"]) for svc in services_by_sale.get(sale_id, []))
-        if sale["status"] == "Paid":
-            total_amount = _num(sale["total_amount"])
-            total_service_revenue += services_total
-            paid_sales.append({
-                "sales_number":     sale["sales_number"] or f"#{sale_id}",
-                "customer_name":    sale["customer_name"] or "Walk-in",
-                "mechanic_name":    sale["mechanic_name"] or "—",
-                "services_total":   round(services_total, 2),
-                "total_amount":     round(total_amount, 2),
-                "status":           sale["status"],
-                "payment_method":   sale["payment_method"] or "—",
-                "notes":            sale["notes"] or "",
-                "transaction_date": format_date(sale["transaction_date"]),
-                "products":         items_by_sale.get(sale_id, []),
-                "services":         services_by_sale.get(sale_id, []),
-            })
-            total_gross += total_amount
-
-    # Build date-bucketed records so the range report can include daily quota misses.
-    sales_by_day = {}
-    debt_by_day = {}
+        services_total = sum(_num(svc["price"]) for svc in services_by_sale.get(sale_id, []))
+        paid_sales.append({
+            "sales_number":     sale["sales_number"] or f"#{sale_id}",
+            "customer_name":    sale["customer_name"] or "Walk-in",
+            "mechanic_name":    sale["mechanic_name"] or "—",
+            "services_total":   round(services_total, 2),
+            "total_amount":     round(_num(sale["total_amount"]), 2),
+            "status":           sale["status"],
+            "payment_method":   sale["payment_method"] or "—",
+            "notes":            sale["notes"] or "",
+            "transaction_date": format_date(sale["transaction_date"]),
+            "products":         items_by_sale.get(sale_id, []),
+            "services":         services_by_sale.get(sale_id, []),
+        })
 
-    for row in sales_rows:
-        sale_day = str(row["transaction_date"])[:10]
-        sales_by_day.setdefault(sale_day, []).append(row)
+    total_gross           = totals_facts["gross_amount"]
+    total_service_revenue = totals_facts["service_revenue"]
 
-    for row in debt_collected_rows:
-        paid_day = str(row["paid_at"])[:10]
-        debt_by_day.setdefault(paid_day, []).append(row)
+    # Quota is applied per mechanic per day, so misses are computed day by day.
+    facts_by_day = {}
+    for row in mechanic_facts:
+        facts_by_day.setdefault(str(row["fact_date"]), []).append(row)
 
-    all_days = set(sales_by_day.keys()) | set(debt_by_day.keys())
     quota_failures = []
-
-    for day in sorted(all_days):
+    for day in sorted(facts_by_day):
         day_mechanic_summary, _ = _calculate_mechanic_payouts(
-            *_build_mechanic_maps(
-                sales_by_day.get(day, []),
-                debt_by_day.get(day, []),
-                services_by_sale,
-            )
+            *_mechanic_maps_from_facts(facts_by_day[day])
         )
 
         for row in day_mechanic_summary:
@@ -719,31 +749,15 @@ def get_sales_report_by_range(start_date, end_date):
                     "total_payout": row["total_payout"],
                 })
 
-    # Keep only days in requested range (in case local DB stores timezone-shifted timestamps).
-    quota_failures = [
-        row for row in quota_failures
-        if start_date <= row["date"] <= end_date
-    ]
-
-    mechanic_map, debt_mechanic_map = _build_mechanic_maps(
-        sales_rows, debt_collected_rows, services_by_sale
+    mechanic_summary, totals = _calculate_mechanic_payouts(
+        *_mechanic_maps_from_facts(mechanic_facts)
     )
-    mechanic_summary, totals = _calculate_mechanic_payouts(mechanic_map, debt_mechanic_map)
-
-    items_summary = {}
-    for sale in paid_sales:
-        for item in sale["products"]:
-            key = item["item_name"]
-            if key not in items_summary:
-                items_summary[key] = {"item_name": key, "quantity": 0, "total": 0.0}
-            items_summary[key]["quantity"] += int(item["quantity"] or 0)
-            items_summary[key]["total"]    += _num(item["line_total"])
 
     return {
         "sales":                  paid_sales,
         "unresolved":             all_unresolved,
         "mechanic_summary":       mechanic_summary,
-        "items_summary":          sorted(items_summary.values(), key=lambda x: x["item_name"]),
+        "items_summary":          items_summary,
         "total_gross":            round(total_gross, 2),
         "total_mech_cut":         totals["total_mech_cut"],
         "total_shop_topup":       totals["total_shop_topup"],
@@ -1,4 +1,5 @@
 from db.database import get_db
+from db.filters import date_range_conditions
 from utils.formatters import format_date
 
 PER_PAGE = 50
@@ -17,12 +18,9 @@ def get_sales_paginated(page=1, start_date=None, end_date=None, search=None, has
     conditions = []
     params = []
 
-    if start_date:
-        conditions.append("DATE(s.transaction_date) >= %s")
-        params.append(start_date)
-    if end_date:
-        conditions.append("DATE(s.transaction_date) <= %s")
-        params.append(end_date)
+    date_conditions, date_params = date_range_conditions("s.transaction_date", start_date, end_date)
+    conditions.extend(date_conditions)
+    params.extend(date_params)
     if search:
         conditions.append("(s.sales_number ILIKE %s OR s.customer_name ILIKE %s)")
         params.extend([f"%{search}%", f"%{search}%"])
@@ -0,0 +1,234 @@
+from db.database import get_db
+
+
+# ─────────────────────────────────────────────
+# DAILY SALES FACTS (rollup behind range reports)
+# ─────────────────────────────────────────────
+#
+# One row per day and dimension, so a range report sums a few hundred fact
+# rows instead of rescanning sales / sales_items / sales_services /
+# debt_payments:
+#
+#   sales_daily_item_facts       items sold on Paid sales (qty, line totals)
+#   sales_daily_service_facts    services on Paid sales (count, price)
+#   sales_daily_mechanic_facts   service revenue per mechanic: paid_services_total
+#                                (Paid sales, by sale date) and debt_service_total
+#                                (debt payment service portions, by payment date)
+#   sales_daily_payment_facts    Paid sales per payment method (count, gross) and
+#                                debt collected per payment method
+#
+# "Paid" is the report's definition: a debt sale enters the facts on its sale
+# date once record_payment settles it. Per-item stock movement per day lives
+# in item_daily_movements (services/stock_service.py).
+#
+# Writers call record_sale_facts / record_debt_payment_facts inside their
+# transaction; rebuild_sales_facts() recomputes everything from the sources.
+# Undated legacy rows are bucketed on 1970-01-01 (as in cash_daily_balances).
+
+_UNDATED_BUCKET = "DATE '1970-01-01'"
+
+# source → (fact table, key columns, value columns, SELECT producing keys + values)
+# Each SELECT leaves its WHERE open so callers can append "AND ..." filters.
+_FACT_SOURCES = {
+    "sale_items": ("sales_daily_item_facts", ["fact_date", "item_id"], ["quantity", "amount"], f"""
+        SELECT
+            COALESCE(s.transaction_date::date, {_UNDATED_BUCKET}) AS fact_date,
+            si.item_id,
+            SUM(si.quantity) AS quantity,
+            SUM(si.quantity * si.final_unit_price) AS amount
+        FROM sales_items si
+        JOIN sales s ON s.id = si.sale_id
+        WHERE s.status = 'Paid'
+    """),
+    "sale_services": ("sales_daily_service_facts", ["fact_date", "service_id"], ["quantity", "amount"], f"""
+        SELECT
+            COALESCE(s.transaction_date::date, {_UNDATED_BUCKET}) AS fact_date,
+            ss.service_id,
+            COUNT(*) AS quantity,
+            SUM(ss.price) AS amount
+        FROM sales_services ss
+        JOIN sales s ON s.id = ss.sale_id
+        WHERE s.status = 'Paid'
+    """),
+    "sale_mechanics": ("sales_daily_mechanic_facts", ["fact_date", "mechanic_id"],
+                       ["paid_services_total", "debt_service_total"], f"""
+        SELECT
+            COALESCE(s.transaction_date::date, {_UNDATED_BUCKET}) AS fact_date,
+            s.mechanic_id,
+            SUM(ss.price) AS paid_services_total,
+            0 AS debt_service_total
+        FROM sales_services ss
+        JOIN sales s ON s.id = ss.sale_id
+        WHERE s.status = 'Paid'
+        AND s.mechanic_id IS NOT NULL
+    """),
+    "sale_payments": ("sales_daily_payment_facts", ["fact_date", "payment_method_id"],
+                      ["sale_count", "gross_amount", "debt_collected"], f"""
+        SELECT
+            COALESCE(s.transaction_date::date, {_UNDATED_BUCKET}) AS fact_date,
+            COALESCE(s.payment_method_id, 0) AS payment_method_id,
+            COUNT(*) AS sale_count,
+            SUM(s.total_amount) AS gross_amount,
+            0 AS debt_collected
+        FROM sales s
+        WHERE s.status = 'Paid'
+    """),
+    "debt_mechanics": ("sales_daily_mechanic_facts", ["fact_date", "mechanic_id"],
+                       ["paid_services_total", "debt_service_total"], f"""
+        SELECT
+            COALESCE(dp.paid_at::date, {_UNDATED_BUCKET}) AS fact_date,
+            s.mechanic_id,
+            0 AS paid_services_total,
+            SUM(dp.service_portion) AS debt_service_total
+        FROM debt_payments dp
+        JOIN sales s ON s.id = dp.sale_id
+        WHERE s.mechanic_id IS NOT NULL
+    """),
+    "debt_payments": ("sales_daily_payment_facts", ["fact_date", "payment_method_id"],
+                      ["sale_count", "gross_amount", "debt_collected"], f"""
+        SELECT
+            COALESCE(dp.paid_at::date, {_UNDATED_BUCKET}) AS fact_date,
+            COALESCE(dp.payment_method_id, 0) AS payment_method_id,
+            0 AS sale_count,
+            0 AS gross_amount,
+            SUM(dp.amount_paid) AS debt_collected
+        FROM debt_payments dp
+        WHERE TRUE
+    """),
+}
+
+_SALE_SOURCES = ("sale_items", "sale_services", "sale_mechanics", "sale_payments")
+_DEBT_SOURCES = ("debt_mechanics", "debt_payments")
+
+FACT_TABLES = (
+    "sales_daily_item_facts",
+    "sales_daily_service_facts",
+    "sales_daily_mechanic_facts",
+    "sales_daily_payment_facts",
+)
+
+
+def _apply_sales_facts(conn, source, filter_sql, filter_params, sign=1):
+    """Adds (sign=1) or removes (sign=-1) the matching source rows from one fact table."""
+    table, keys, values, source_sql = _FACT_SOURCES[source]
+    key_list = ", ".join(keys)
+    value_list = ", ".join(values)
+    signed_values = ", ".join(f"%s * {v}" for v in values)
+    updates = ",\n            ".join(f"{v} = {table}.{v} + EXCLUDED.{v}" for v in values)
+
+    conn.execute(f"""
+        INSERT INTO {table} ({key_list}, {value_list}, updated_at)
+        SELECT {key_list}, {signed_values}, NOW()
+        FROM ({source_sql} {filter_sql} GROUP BY 1, 2) src
+        ON CONFLICT ({key_list}) DO UPDATE SET
+            {updates},
+            updated_at = NOW()
+    """, [sign] * len(values) + list(filter_params))
+
+
+def record_sale_facts(conn, sale_id, sign=1):
+    """
+    Call after inserting a sale, and after a debt sale turns Paid (same transaction).
+    No-op while the sale is not Paid.
+    """
+    for source in _SALE_SOURCES:
+        _apply_sales_facts(conn, source, "AND s.id = %s", [sale_id], sign=sign)
+
+
+def record_debt_payment_facts(conn, payment_id):
+    """Call after inserting a debt payment (same transaction)."""
+    for source in _DEBT_SOURCES:
+        _apply_sales_facts(conn, source, "AND dp.id = %s", [payment_id])
+
+
+def rebuild_sales_facts(external_conn=None):
+    """
+    Recomputes every sales fact table from sales, sales_items, sales_services
+    and debt_payments. Returns {table: rows written}.
+    """
+    conn = external_conn if external_conn else get_db()
+    try:
+        for table in FACT_TABLES:
+            conn.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            conn.execute(f"DELETE FROM {table}")
+        for source in _SALE_SOURCES + _DEBT_SOURCES:
+            _apply_sales_facts(conn, source, "", [])
+
+        written = {
+            table: conn.execute(f"SELECT COUNT(*) AS total FROM {table}").fetchone()["total"]
+            for table in FACT_TABLES
+        }
+        if not external_conn:
+            conn.commit()
+        return written
+    except Exception:
+        if not external_conn:
+            conn.rollback()
+        raise
+    finally:
+        if not external_conn:
+            conn.close()
+
+
+# ─────────────────────────────────────────────
+# READERS
+# ─────────────────────────────────────────────
+
+def get_item_sales_summary(conn, start_date, end_date):
+    """Items sold on Paid sales in [start_date, end_date]: item_name, quantity, total."""
+    rows = conn.execute("""
+        SELECT
+            i.name AS item_name,
+            SUM(f.quantity) AS quantity,
+            SUM(f.amount) AS total
+        FROM sales_daily_item_facts f
+        JOIN items i ON i.id = f.item_id
+        WHERE f.fact_date BETWEEN %s AND %s
+        GROUP BY i.name
+        HAVING SUM(f.quantity) <> 0
+        ORDER BY i.name
+    """, (start_date, end_date)).fetchall()
+    return [
+        {"item_name": row["item_name"], "quantity": int(row["quantity"] or 0), "total": float(row["total"] or 0)}
+        for row in rows
+    ]
+
+
+def get_mechanic_daily_facts(conn, start_date, end_date):
+    """Per-day, per-mechanic service totals with the mechanic's name and commission rate."""
+    return conn.execute("""
+        SELECT
+            f.fact_date,
+            f.mechanic_id,
+            m.name AS mechanic_name,
+            m.commission_rate,
+            f.paid_services_total,
+            f.debt_service_total
+        FROM sales_daily_mechanic_facts f
+        LEFT JOIN mechanics m ON m.id = f.mechanic_id
+        WHERE f.fact_date BETWEEN %s AND %s
+        ORDER BY f.fact_date, f.mechanic_id
+    """, (start_date, end_date)).fetchall()
+
+
+def get_sales_totals(conn, start_date, end_date):
+    """Paid gross, paid service revenue and debt collected in [start_date, end_date]."""
+    payment = conn.execute("""
+        SELECT
+            COALESCE(SUM(sale_count), 0)     AS sale_count,
+            COALESCE(SUM(gross_amount), 0)   AS gross_amount,
+            COALESCE(SUM(debt_collected), 0) AS debt_collected
+        FROM sales_daily_payment_facts
+        WHERE fact_date BETWEEN %s AND %s
+    """, (start_date, end_date)).fetchone()
+    services = conn.execute("""
+        SELECT COALESCE(SUM(amount), 0) AS service_revenue
+        FROM sales_daily_service_facts
+        WHERE fact_date BETWEEN %s AND %s
+    """, (start_date, end_date)).fetchone()
+    return {
+        "sale_count":      int(payment["sale_count"] or 0),
+        "gross_amount":    float(payment["gross_amount"] or 0),
+        "debt_collected":  float(payment["debt_collected"] or 0),
+        "service_revenue": float(services["service_revenue"] or 0),
+    }
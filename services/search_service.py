@@ -0,0 +1,70 @@
+# ─────────────────────────────────────────────
+# RANKED TEXT SEARCH (pg_trgm)
+# ─────────────────────────────────────────────
+#
+# Shared by item / service / customer autocomplete.
+#
+# A row matches when either:
+#   - every typed word appears somewhere in the searched columns (ILIKE), or
+#   - the whole query is "close enough" to one of the columns
+#     (word_similarity >= SEARCH_SIMILARITY_THRESHOLD) → tolerates typos.
+#
+# Both predicates are served by the gin_trgm_ops indexes created in init_db,
+# so autocomplete no longer scans the whole table.
+#
+# Ranking: all-words matches first, then prefix matches on the first column,
+# then best trigram similarity.
+
+# 0 = match anything, 1 = exact. 0.45 lets "brak pad" find "Brake Pad" while
+# keeping unrelated parts out of the list.
+SEARCH_SIMILARITY_THRESHOLD = 0.45
+
+
+def set_similarity_threshold(conn, threshold=SEARCH_SIMILARITY_THRESHOLD):
+    """Transaction-local; reset automatically when the connection goes back to the pool."""
+    conn.execute(
+        "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+        (str(threshold),),
+    )
+
+
+def build_search_clause(query, columns):
+    """
+    Builds the WHERE / ORDER BY fragments for a ranked trigram search.
+
+    columns: SQL column expressions to search, most important first.
+    Returns (where_sql, where_params, order_sql, order_params), or None for a blank query.
+    """
+    words = (query or "").split()
+    if not words:
+        return None
+
+    normalized_query = " ".join(words)
+
+    word_clauses = []
+    word_params = []
+    for word in words:
+        word_clauses.append("(" + " OR ".join(f"{col} ILIKE %s" for col in columns) + ")")
+        word_params.extend([f"%{word}%"] * len(columns))
+    all_words_sql = " AND ".join(word_clauses)
+
+    # "<%%" is pg_trgm's word_similarity operator (%% escapes the driver placeholder).
+    fuzzy_sql = " OR ".join(f"%s <%% {col}" for col in columns)
+    fuzzy_params = [normalized_query] * len(columns)
+
+    similarity_sql = "GREATEST(" + ", ".join(
+        f"word_similarity(%s, COALESCE({col}, ''))" for col in columns
+    ) + ")"
+    similarity_params = [normalized_query] * len(columns)
+
+    where_sql = f"(({all_words_sql}) OR {fuzzy_sql})"
+    where_params = word_params + fuzzy_params
+
+    order_sql = f"""
+        (CASE WHEN {all_words_sql} THEN 0 ELSE 1 END) ASC,
+        (CASE WHEN {columns[0]} ILIKE %s THEN 0 ELSE 1 END) ASC,
+        {similarity_sql} DESC
+    """
+    order_params = word_params + [f"{normalized_query}%"] + similarity_params
+
+    return where_sql, where_params, order_sql, order_params
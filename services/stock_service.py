@@ -0,0 +1,392 @@
+from db.database import get_db
+
+
+# ─────────────────────────────────────────────
+# ITEM STOCK BALANCES (projection of inventory_transactions)
+# ─────────────────────────────────────────────
+#
+# item_stock_balances keeps one row per item so stock reads are a primary-key
+# lookup instead of a SUM over the whole ledger.
+#
+#   on_hand / total_in / total_out / last_movement_at
+#       maintained by add_transaction() for every IN / OUT ledger row.
+#   on_order
+#       outstanding quantity on PENDING / PARTIAL purchase orders.
+#       ORDER ledger rows are deleted and re-inserted on PO edits, so this is
+#       refreshed from po_items whenever a PO changes state instead.
+#
+# The ledger stays the source of truth. rebuild_stock_balances() recomputes
+# the projection from it and verify_stock_balances() reports any drift.
+
+STOCK_MOVEMENT_TYPES = ("IN", "OUT")
+
+# item_daily_movements keeps per-item, per-day IN / OUT totals next to the
+# balance row (same writers, same lock), for the stock-movement and
+# top-items charts. Undated legacy rows land on 1970-01-01.
+_MOVEMENT_DATE_SQL = "COALESCE(%s::timestamp::date, DATE '1970-01-01')"
+
+
+def apply_stock_movement(conn, item_id, transaction_type, quantity, movement_at):
+    """
+    Applies one ledger row to the item's balance row.
+    Must run on the same connection (and transaction) as the ledger INSERT.
+    """
+    if transaction_type not in STOCK_MOVEMENT_TYPES:
+        return
+
+    qty = int(quantity or 0)
+    qty_in = qty if transaction_type == "IN" else 0
+    qty_out = qty if transaction_type == "OUT" else 0
+
+    conn.execute("""
+        INSERT INTO item_stock_balances
+            (item_id, on_hand, total_in, total_out, last_movement_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+        ON CONFLICT (item_id) DO UPDATE SET
+            on_hand          = item_stock_balances.on_hand + EXCLUDED.on_hand,
+            total_in         = item_stock_balances.total_in + EXCLUDED.total_in,
+            total_out        = item_stock_balances.total_out + EXCLUDED.total_out,
+            last_movement_at = GREATEST(item_stock_balances.last_movement_at, EXCLUDED.last_movement_at),
+            updated_at       = NOW()
+    """, (int(item_id), qty_in - qty_out, qty_in, qty_out, movement_at))
+
+    conn.execute(f"""
+        INSERT INTO item_daily_movements (movement_date, item_id, qty_in, qty_out)
+        VALUES ({_MOVEMENT_DATE_SQL}, %s, %s, %s)
+        ON CONFLICT (movement_date, item_id) DO UPDATE SET
+            qty_in  = item_daily_movements.qty_in + EXCLUDED.qty_in,
+            qty_out = item_daily_movements.qty_out + EXCLUDED.qty_out
+    """, (movement_at, int(item_id), qty_in, qty_out))
+
+
+def apply_stock_movements(conn, movements):
+    """
+    Batched apply_stock_movement for a multi-line document (e.g. a sale).
+    movements: iterable of (item_id, transaction_type, quantity, movement_at).
+    Lines are folded per item first, because one INSERT ... ON CONFLICT
+    cannot touch the same balance row twice.
+    """
+    totals = {}
+    daily = {}
+    for item_id, transaction_type, quantity, movement_at in movements:
+        if transaction_type not in STOCK_MOVEMENT_TYPES:
+            continue
+        qty = int(quantity or 0)
+        entry = totals.setdefault(int(item_id), [0, 0, movement_at])
+        day_entry = daily.setdefault((int(item_id), movement_at and str(movement_at)[:10]), [0, 0])
+        if transaction_type == "IN":
+            entry[0] += qty
+            day_entry[0] += qty
+        else:
+            entry[1] += qty
+            day_entry[1] += qty
+        if movement_at and (entry[2] is None or str(movement_at) > str(entry[2])):
+            entry[2] = movement_at
+
+    if not totals:
+        return
+
+    conn.execute_values("""
+        INSERT INTO item_stock_balances
+            (item_id, on_hand, total_in, total_out, last_movement_at, updated_at)
+        VALUES %s
+        ON CONFLICT (item_id) DO UPDATE SET
+            on_hand          = item_stock_balances.on_hand + EXCLUDED.on_hand,
+            total_in         = item_stock_balances.total_in + EXCLUDED.total_in,
+            total_out        = item_stock_balances.total_out + EXCLUDED.total_out,
+            last_movement_at = GREATEST(item_stock_balances.last_movement_at, EXCLUDED.last_movement_at),
+            updated_at       = NOW()
+    """, [
+        (item_id, qty_in - qty_out, qty_in, qty_out, movement_at)
+        for item_id, (qty_in, qty_out, movement_at) in sorted(totals.items())
+    ], template="(%s, %s, %s, %s, %s::timestamp, NOW())")
+
+    conn.execute_values("""
+        INSERT INTO item_daily_movements (movement_date, item_id, qty_in, qty_out)
+        VALUES %s
+        ON CONFLICT (movement_date, item_id) DO UPDATE SET
+            qty_in  = item_daily_movements.qty_in + EXCLUDED.qty_in,
+            qty_out = item_daily_movements.qty_out + EXCLUDED.qty_out
+    """, [
+        (day, item_id, qty_in, qty_out)
+        for (item_id, day), (qty_in, qty_out) in sorted(daily.items(), key=lambda kv: (kv[0][0], kv[0][1] or ""))
+    ], template=f"({_MOVEMENT_DATE_SQL}, %s, %s, %s)")
+
+
+# ─────────────────────────────────────────────
+# STOCK RESERVATION (concurrent checkouts)
+# ─────────────────────────────────────────────
+#
+# A sale must not read stock, decide it is enough, and write the OUT rows
+# while another till does the same for the same item. Writers that move
+# stock for several items take row locks on their item_stock_balances rows
+# up front, always in ascending item_id order:
+#   - same item on two tills → the second waits, then sees the reduced on_hand
+#   - different items        → different rows, no waiting
+#   - consistent order       → no lock cycles, so no deadlocks between a
+#                              sale and a PO receive touching the same items
+# Locks are released when the caller's transaction commits or rolls back.
+
+def lock_stock_balances(conn, item_ids):
+    """
+    Row-locks the balance rows for item_ids (ascending id order) for the rest
+    of the caller's transaction. Missing rows are created first so there is
+    always something to lock. Returns {item_id: {"on_hand", "name"}}.
+    """
+    normalized_ids = sorted({int(iid) for iid in (item_ids or []) if iid})
+    if not normalized_ids:
+        return {}
+
+    conn.execute("""
+        INSERT INTO item_stock_balances (item_id)
+        SELECT id FROM items WHERE id = ANY(%s)
+        ORDER BY id
+        ON CONFLICT (item_id) DO NOTHING
+    """, (normalized_ids,))
+
+    rows = conn.execute("""
+        SELECT b.item_id, b.on_hand, i.name
+        FROM item_stock_balances b
+        JOIN items i ON i.id = b.item_id
+        WHERE b.item_id = ANY(%s)
+        ORDER BY b.item_id
+        FOR UPDATE OF b
+    """, (normalized_ids,)).fetchall()
+
+    return {
+        int(row["item_id"]): {"on_hand": int(row["on_hand"] or 0), "name": row["name"]}
+        for row in rows
+    }
+
+
+def reserve_stock(conn, quantities):
+    """
+    Locks and checks stock for a checkout. quantities: {item_id: qty}, in cart order.
+    Raises ValueError for the first line that isn't covered; otherwise the
+    caller holds the locks until it commits its OUT rows.
+    """
+    balances = lock_stock_balances(conn, quantities.keys())
+
+    for item_id, qty_requested in quantities.items():
+        balance = balances.get(int(item_id))
+        current_stock = balance["on_hand"] if balance else 0
+
+        if qty_requested > current_stock:
+            item_name = balance["name"] if balance else f"Item ID {item_id}"
+            raise ValueError(
+                f"Insufficient stock for '{item_name}'. "
+                f"Requested: {qty_requested}, Available: {current_stock}."
+            )
+
+    return balances
+
+
+def refresh_on_order(conn, item_ids):
+    """
+    Recomputes on_order for the given items from open purchase orders.
+    Call after any PO insert/edit/approval/cancel/receive, inside that transaction.
+    """
+    normalized_ids = sorted({int(iid) for iid in (item_ids or []) if iid})
+    if not normalized_ids:
+        return
+
+    # Take the row locks in ascending id order first (same order as checkout);
+    # the upsert below would otherwise lock rows in whatever order it scans them.
+    lock_stock_balances(conn, normalized_ids)
+
+    conn.execute("""
+        INSERT INTO item_stock_balances (item_id, on_order, updated_at)
+        SELECT
+            i.id,
+            COALESCE(p.pending_stock, 0),
+            NOW()
+        FROM items i
+        LEFT JOIN (
+            SELECT
+                pi.item_id,
+                SUM(pi.quantity_ordered - pi.quantity_received) AS pending_stock
+            FROM po_items pi
+            JOIN purchase_orders po ON po.id = pi.po_id
+            WHERE po.status IN ('PENDING', 'PARTIAL')
+              AND pi.quantity_ordered > pi.quantity_received
+              AND pi.item_id = ANY(%s)
+            GROUP BY pi.item_id
+        ) p ON p.item_id = i.id
+        WHERE i.id = ANY(%s)
+        ON CONFLICT (item_id) DO UPDATE SET
+            on_order   = EXCLUDED.on_order,
+            updated_at = NOW()
+    """, (normalized_ids, normalized_ids))
+
+
+def _po_item_ids(conn, po_id, extra_item_ids=None):
+    rows = conn.execute(
+        "SELECT item_id FROM po_items WHERE po_id = %s",
+        (po_id,),
+    ).fetchall()
+    item_ids = {int(row["item_id"]) for row in rows}
+    item_ids.update(int(iid) for iid in (extra_item_ids or []) if iid)
+    return item_ids
+
+
+def lock_po_stock_balances(conn, po_id, extra_item_ids=None):
+    """
+    Locks the balance rows of every item on a PO (plus extra_item_ids) in one
+    ascending pass. Call before touching any of them, so a later
+    refresh_po_on_order never has to lock a lower id after a higher one.
+    """
+    return lock_stock_balances(conn, _po_item_ids(conn, po_id, extra_item_ids))
+
+
+def refresh_po_on_order(conn, po_id, extra_item_ids=None):
+    """Refreshes on_order for every item on a PO (plus any items just removed from it)."""
+    refresh_on_order(conn, _po_item_ids(conn, po_id, extra_item_ids))
+
+
+def _ledger_balances_sql(scoped):
+    """
+    Balance figures recomputed straight from the ledger + open POs.
+    When scoped, expects two array params (item ids) for the ledger and items filters.
+    """
+    ledger_filter = "WHERE item_id = ANY(%s)" if scoped else ""
+    item_filter = "WHERE i.id = ANY(%s)" if scoped else ""
+
+    return f"""
+        SELECT
+            i.id AS item_id,
+            COALESCE(l.total_in, 0) - COALESCE(l.total_out, 0) AS on_hand,
+            COALESCE(l.total_in, 0) AS total_in,
+            COALESCE(l.total_out, 0) AS total_out,
+            COALESCE(p.pending_stock, 0) AS on_order,
+            l.last_movement_at
+        FROM items i
+        LEFT JOIN (
+            SELECT
+                item_id,
+                SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END) AS total_in,
+                SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END) AS total_out,
+                MAX(CASE WHEN transaction_type IN ('IN', 'OUT') THEN transaction_date END) AS last_movement_at
+            FROM inventory_transactions
+            {ledger_filter}
+            GROUP BY item_id
+        ) l ON l.item_id = i.id
+        LEFT JOIN (
+            SELECT
+                pi.item_id,
+                SUM(pi.quantity_ordered - pi.quantity_received) AS pending_stock
+            FROM po_items pi
+            JOIN purchase_orders po ON po.id = pi.po_id
+            WHERE po.status IN ('PENDING', 'PARTIAL')
+              AND pi.quantity_ordered > pi.quantity_received
+            GROUP BY pi.item_id
+        ) p ON p.item_id = i.id
+        {item_filter}
+    """
+
+
+def _rebuild_daily_movements(conn, item_ids=None):
+    """Recomputes item_daily_movements from the ledger (all items, or just item_ids)."""
+    if item_ids is None:
+        conn.execute("DELETE FROM item_daily_movements")
+        filter_sql, params = "", None
+    else:
+        conn.execute("DELETE FROM item_daily_movements WHERE item_id = ANY(%s)", (item_ids,))
+        filter_sql, params = "AND item_id = ANY(%s)", (item_ids,)
+
+    conn.execute(f"""
+        INSERT INTO item_daily_movements (movement_date, item_id, qty_in, qty_out)
+        SELECT
+            COALESCE(transaction_date::date, DATE '1970-01-01'),
+            item_id,
+            SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END),
+            SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END)
+        FROM inventory_transactions
+        WHERE transaction_type IN ('IN', 'OUT')
+        {filter_sql}
+        GROUP BY 1, 2
+    """, params)
+
+
+def rebuild_stock_balances(item_ids=None, external_conn=None):
+    """
+    Recomputes balance rows from the ledger.
+    item_ids=None rebuilds every item. Returns the number of rows written.
+
+    The table lock makes concurrent add_transaction() calls wait until the
+    rebuild commits, so no movement is lost or double-counted.
+    """
+    conn = external_conn if external_conn else get_db()
+    scoped = item_ids is not None
+    normalized_ids = sorted({int(iid) for iid in (item_ids or []) if iid})
+
+    if scoped and not normalized_ids:
+        if not external_conn:
+            conn.close()
+        return 0
+
+    try:
+        conn.execute("LOCK TABLE item_stock_balances IN EXCLUSIVE MODE")
+        params = (normalized_ids, normalized_ids) if scoped else None
+        cursor = conn.execute(f"""
+            INSERT INTO item_stock_balances
+                (item_id, on_hand, total_in, total_out, on_order, last_movement_at, updated_at)
+            SELECT item_id, on_hand, total_in, total_out, on_order, last_movement_at, NOW()
+            FROM ({_ledger_balances_sql(scoped)}) src
+            ON CONFLICT (item_id) DO UPDATE SET
+                on_hand          = EXCLUDED.on_hand,
+                total_in         = EXCLUDED.total_in,
+                total_out        = EXCLUDED.total_out,
+                on_order         = EXCLUDED.on_order,
+                last_movement_at = EXCLUDED.last_movement_at,
+                updated_at       = NOW()
+        """, params)
+        written = cursor.rowcount
+        _rebuild_daily_movements(conn, normalized_ids if scoped else None)
+
+        if not external_conn:
+            conn.commit()
+        return written
+    except Exception:
+        if not external_conn:
+            conn.rollback()
+        raise
+    finally:
+        if not external_conn:
+            conn.close()
+
+
+def verify_stock_balances(external_conn=None):
+    """
+    Compares the projection with a fresh ledger recomputation.
+    Returns a list of drifted items (empty list = projection is consistent).
+    """
+    conn = external_conn if external_conn else get_db()
+    try:
+        rows = conn.execute(f"""
+            SELECT
+                src.item_id,
+                i.name,
+                src.on_hand          AS expected_on_hand,
+                b.on_hand            AS actual_on_hand,
+                src.total_in         AS expected_total_in,
+                b.total_in           AS actual_total_in,
+                src.total_out        AS expected_total_out,
+                b.total_out          AS actual_total_out,
+                src.on_order         AS expected_on_order,
+                b.on_order           AS actual_on_order,
+                src.last_movement_at AS expected_last_movement_at,
+                b.last_movement_at   AS actual_last_movement_at
+            FROM ({_ledger_balances_sql(False)}) src
+            JOIN items i ON i.id = src.item_id
+            LEFT JOIN item_stock_balances b ON b.item_id = src.item_id
+            WHERE COALESCE(b.on_hand, 0)   <> src.on_hand
+               OR COALESCE(b.total_in, 0)  <> src.total_in
+               OR COALESCE(b.total_out, 0) <> src.total_out
+               OR COALESCE(b.on_order, 0)  <> src.on_order
+               OR b.last_movement_at IS DISTINCT FROM src.last_movement_at
+            ORDER BY src.item_id ASC
+        """).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        if not external_conn:
+            conn.close()
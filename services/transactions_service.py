@@ -2,6 +2,17 @@ from db.database import get_db
 from datetime import datetime
 from utils.formatters import format_date
 from services.loyalty_service import log_stamps_for_sale
+from services.stock_service import (
+    apply_stock_movement,
+    apply_stock_movements,
+    lock_po_stock_balances,
+    refresh_po_on_order,
+    reserve_stock,
+)
+from services.catalogue_cache import invalidate_item_catalogue, notify_item_catalogue_changed
+from services.cash_service import record_cash_sale
+from services.debt_service import record_sale_balance
+from services.sales_facts_service import record_sale_facts
 from services.approval_service import (
     approve_request,
     cancel_request,
@@ -14,8 +25,8 @@ from services.approval_service import (
 from services.notification_service import (
     archive_notifications,
     create_notification,
-    create_notifications_for_users,
-    list_active_user_ids,
+    create_notifications_for_role,
+    write_notifications,
 )
 
 
@@ -30,6 +41,9 @@ def add_transaction(item_id, quantity, transaction_type, user_id=None, user_name
     The Universal Ledger Entry.
     Handles logging and stock updates.
 
+    IN / OUT rows also update item_stock_balances on the same connection,
+    so the projection commits (or rolls back) together with the ledger row.
+
     ENFORCEMENT: BONUS_STOCK transactions require a notes value.
     Enforced here at service level — cannot be bypassed via API.
 
@@ -58,12 +72,55 @@ def add_transaction(item_id, quantity, transaction_type, user_id=None, user_name
         item_id, quantity, transaction_type, final_time, user_id, user_name,
         reference_id, reference_type, change_reason, unit_price, notes
     ))
+    apply_stock_movement(conn, item_id, transaction_type, quantity, final_time)
 
     if not external_conn:
         conn.commit()
         conn.close()
 
 
+def add_transactions(entries, external_conn):
+    """
+    Batched add_transaction for multi-line documents (sales).
+    entries: list of dicts with add_transaction's keyword names.
+    All ledger rows go in one multi-row INSERT and the balance projection is
+    updated with one upsert, on the caller's connection and transaction.
+    """
+    rows = []
+    movements = []
+    for entry in entries:
+        if entry.get("change_reason") == 'BONUS_STOCK':
+            if not entry.get("notes") or not str(entry["notes"]).strip():
+                raise ValueError("A reason note is required for over-receive (BONUS_STOCK) transactions.")
+
+        transaction_date = entry.get("transaction_date")
+        if transaction_date:
+            final_time = transaction_date.replace('T', ' ')
+            if len(final_time) == 16:
+                final_time += ":00"
+        else:
+            final_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        rows.append((
+            entry["item_id"], entry["quantity"], entry["transaction_type"], final_time,
+            entry.get("user_id"), entry.get("user_name"),
+            entry.get("reference_id"), entry.get("reference_type"), entry.get("change_reason"),
+            entry.get("unit_price"), entry.get("notes")
+        ))
+        movements.append((entry["item_id"], entry["transaction_type"], entry["quantity"], final_time))
+
+    if not rows:
+        return
+
+    external_conn.execute_values("""
+        INSERT INTO inventory_transactions
+        (item_id, quantity, transaction_type, transaction_date, user_id, user_name,
+        reference_id, reference_type, change_reason, unit_price, notes)
+        VALUES %s
+    """, rows)
+    apply_stock_movements(external_conn, movements)
+
+
 # ─────────────────────────────────────────────
 # ITEMS
 # ─────────────────────────────────────────────
@@ -117,6 +174,7 @@ def add_item_to_db(data, user_id=None, username=None):
             external_conn=conn
         )
 
+        notify_item_catalogue_changed(conn, [new_id])
         conn.commit()
     except Exception:
         conn.rollback()
@@ -124,6 +182,7 @@ def add_item_to_db(data, user_id=None, username=None):
     finally:
         conn.close()
 
+    invalidate_item_catalogue([new_id])
     return new_id
 
 
@@ -215,6 +274,7 @@ def process_manual_stock_in(item_id, qty_int, unit_price, notes, user_id, userna
         raise ValueError("Invalid unit cost. Must be 0 or higher.")
 
     conn = get_db()
+    cost_updated = False
     try:
         conn.execute("BEGIN")
         clean_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -261,6 +321,8 @@ def process_manual_stock_in(item_id, qty_int, unit_price, notes, user_id, userna
                 transaction_date=clean_time,
                 external_conn=conn
             )
+            notify_item_catalogue_changed(conn, [item_id])
+            cost_updated = True
 
         conn.commit()
     except Exception:
@@ -269,6 +331,9 @@ def process_manual_stock_in(item_id, qty_int, unit_price, notes, user_id, userna
     finally:
         conn.close()
 
+    if cost_updated:
+        invalidate_item_catalogue([item_id])
+
 
 # ─────────────────────────────────────────────
 # RECORD SALE
@@ -359,12 +424,35 @@ def record_sale(data, user_id, username):
             if not valid_vehicle:
                 raise ValueError("Invalid vehicle selected for this customer.")
 
+        # 4b) Services (validated up front so service_fee goes in with the sale row)
+        service_rows = []
+        service_subtotal = 0
+        for service in data.get('services', []):
+            service_id = service.get('service_id')
+            if not service_id:
+                raise ValueError("Selected service is missing service_id.")
+
+            raw_price = service.get('price')
+            if raw_price in (None, ""):
+                raise ValueError("Price is required for each selected service.")
+
+            try:
+                price = float(raw_price)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid service price. Please enter a valid amount.")
+
+            if price < 0:
+                raise ValueError("Service price cannot be negative.")
+
+            service_subtotal += price
+            service_rows.append((service_id, price))
+
         sale_row = conn.execute("""
             INSERT INTO sales (
                 sales_number, customer_name, customer_id, vehicle_id, total_amount,
                 payment_method_id, reference_no, status,
-                notes, user_id, transaction_date, mechanic_id
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                notes, user_id, transaction_date, mechanic_id, service_fee
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """, (
             data.get('sales_number'),
@@ -378,40 +466,24 @@ def record_sale(data, user_id, username):
             data.get('notes'),
             user_id,
             clean_time,
-            data.get('mechanic_id') or None
+            data.get('mechanic_id') or None,
+            service_subtotal
         )).fetchone()
 
         new_sale_id = sale_row["id"]
 
         # 5a) Stock validation — enforced at service level, cannot be bypassed via API
+        # reserve_stock row-locks every cart item (ascending id order) until this
+        # sale commits, so two tills can't both sell the last unit.
         # NOTE (future branches): filter stock calc by branch_id when ready.
+        requested = {}
         for item in raw_items:
-            item_id = item['item_id']
-            qty_requested = int(item['quantity'])
-
-            stock_row = conn.execute("""
-                SELECT COALESCE(SUM(
-                    CASE
-                        WHEN transaction_type = 'IN' THEN quantity
-                        WHEN transaction_type = 'OUT' THEN -quantity
-                        ELSE 0
-                    END
-                ), 0) AS current_stock
-                FROM inventory_transactions
-                WHERE item_id = %s
-            """, (item_id,)).fetchone()
-
-            current_stock = int(stock_row['current_stock']) if stock_row else 0
-
-            if qty_requested > current_stock:
-                name_row = conn.execute("SELECT name FROM items WHERE id = %s", (item_id,)).fetchone()
-                item_name = name_row['name'] if name_row else f"Item ID {item_id}"
-                raise ValueError(
-                    f"Insufficient stock for '{item_name}'. "
-                    f"Requested: {qty_requested}, Available: {current_stock}."
-                )
+            requested[int(item['item_id'])] = int(item['quantity'])
+        reserve_stock(conn, requested)
 
-        # 5) Items OUT
+        # 5) Items OUT — one multi-row insert each for the ledger and sales_items
+        ledger_entries = []
+        sales_item_rows = []
         for item in raw_items:
             original_price = float(item.get('original_price', 0))
             final_price = float(item.get('final_price', 0))
@@ -419,66 +491,50 @@ def record_sale(data, user_id, username):
             discount_percent_decimal = discount_percent_whole / 100
             discount_amount = original_price - final_price
 
-            add_transaction(
-                item_id=item['item_id'],
-                quantity=item['quantity'],
-                transaction_type='OUT',
-                user_id=user_id,
-                user_name=username,
-                reference_id=new_sale_id,
-                reference_type='SALE',
-                change_reason='CUSTOMER_PURCHASE',
-                unit_price=original_price,
-                transaction_date=clean_time,
-                external_conn=conn
-            )
-
-            conn.execute("""
-                INSERT INTO sales_items (
-                    sale_id, item_id, quantity,
-                    original_unit_price, discount_percent, discount_amount, final_unit_price,
-                    discounted_by, created_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
+            ledger_entries.append({
+                "item_id": item['item_id'],
+                "quantity": item['quantity'],
+                "transaction_type": 'OUT',
+                "user_id": user_id,
+                "user_name": username,
+                "reference_id": new_sale_id,
+                "reference_type": 'SALE',
+                "change_reason": 'CUSTOMER_PURCHASE',
+                "unit_price": original_price,
+                "transaction_date": clean_time,
+            })
+
+            sales_item_rows.append((
                 new_sale_id, item['item_id'], item['quantity'],
                 original_price, discount_percent_decimal, discount_amount, final_price,
                 user_id if discount_percent_whole > 0 else None,
                 clean_time
             ))
 
-        # 6) Services
-        service_subtotal = 0
-        for service in data.get('services', []):
-            service_id = service.get('service_id')
-            if not service_id:
-                raise ValueError("Selected service is missing service_id.")
+        add_transactions(ledger_entries, external_conn=conn)
 
-            raw_price = service.get('price')
-            if raw_price in (None, ""):
-                raise ValueError("Price is required for each selected service.")
-
-            try:
-                price = float(raw_price)
-            except (TypeError, ValueError):
-                raise ValueError("Invalid service price. Please enter a valid amount.")
-
-            if price < 0:
-                raise ValueError("Service price cannot be negative.")
+        if sales_item_rows:
+            conn.execute_values("""
+                INSERT INTO sales_items (
+                    sale_id, item_id, quantity,
+                    original_unit_price, discount_percent, discount_amount, final_unit_price,
+                    discounted_by, created_at
+                ) VALUES %s
+            """, sales_item_rows)
 
-            service_subtotal += price
-            conn.execute("""
+        # 6) Services
+        if service_rows:
+            conn.execute_values("""
                 INSERT INTO sales_services (sale_id, service_id, price)
-                VALUES (%s, %s, %s)
-            """, (new_sale_id, service_id, price))
-
-        conn.execute(
-            "UPDATE sales SET service_fee = %s WHERE id = %s",
-            (service_subtotal, new_sale_id)
-        )
+                VALUES %s
+            """, [(new_sale_id, service_id, price) for service_id, price in service_rows])
 
         service_ids = [s["service_id"] for s in data.get("services", [])]
         item_ids    = [i["item_id"] for i in raw_items]
         log_stamps_for_sale(new_sale_id, data.get("customer_id"), service_ids, item_ids, clean_time, conn)
+        record_sale_balance(conn, new_sale_id)
+        record_cash_sale(conn, new_sale_id)
+        record_sale_facts(conn, new_sale_id)
 
         conn.commit()
         return data.get('sales_number'), new_sale_id
@@ -511,53 +567,60 @@ def _po_notification_url(po_id, audience="general"):
 
 
 def _archive_po_admin_notifications(conn, po_id):
-    archive_notifications(
+    write_notifications(conn, lambda c: archive_notifications(
         entity_type=PO_ENTITY_TYPE,
         entity_id=po_id,
         notification_types=PO_ADMIN_PENDING_NOTIFICATION_TYPES,
-        external_conn=conn,
-    )
+        external_conn=c,
+    ))
 
 
 def _archive_po_requester_notifications(conn, po_id, requester_id):
-    archive_notifications(
+    write_notifications(conn, lambda c: archive_notifications(
         recipient_user_id=requester_id,
         entity_type=PO_ENTITY_TYPE,
         entity_id=po_id,
-        external_conn=conn,
-    )
+        external_conn=c,
+    ))
 
 
 def _notify_po_admins_pending(conn, po_row, actor_user_id, notification_type):
-    admin_ids = [
-        admin_id for admin_id in list_active_user_ids(role="admin", external_conn=conn)
-        if int(admin_id) != int(actor_user_id)
-    ]
-    if not admin_ids:
-        return
-
     po_id = int(po_row["id"])
     po_number = po_row["po_number"]
     vendor_name = po_row["vendor_name"] or "Unknown vendor"
     verb = "submitted" if notification_type == "PO_SUBMITTED_FOR_APPROVAL" else "resubmitted"
 
-    _archive_po_admin_notifications(conn, po_id)
-    create_notifications_for_users(
-        admin_ids,
-        notification_type,
-        "Purchase order needs approval",
-        f"{po_number} for {vendor_name} was {verb} and is waiting for approval.",
-        category="approval",
-        entity_type=PO_ENTITY_TYPE,
-        entity_id=po_id,
-        action_url=_po_notification_url(po_id, audience="admin"),
-        created_by=actor_user_id,
-        metadata={
-            "po_number": po_number,
-            "vendor_name": vendor_name,
-        },
-        external_conn=conn,
-    )
+    def write(c):
+        # Archived only if another active admin gets the new notification,
+        # checked inside the UPDATE itself
+        archive_notifications(
+            entity_type=PO_ENTITY_TYPE,
+            entity_id=po_id,
+            notification_types=PO_ADMIN_PENDING_NOTIFICATION_TYPES,
+            recipient_role="admin",
+            exclude_user_ids=[actor_user_id],
+            external_conn=c,
+        )
+        # Every active admin but the actor, in one INSERT ... SELECT FROM users
+        create_notifications_for_role(
+            "admin",
+            notification_type,
+            "Purchase order needs approval",
+            f"{po_number} for {vendor_name} was {verb} and is waiting for approval.",
+            exclude_user_ids=[actor_user_id],
+            category="approval",
+            entity_type=PO_ENTITY_TYPE,
+            entity_id=po_id,
+            action_url=_po_notification_url(po_id, audience="admin"),
+            created_by=actor_user_id,
+            metadata={
+                "po_number": po_number,
+                "vendor_name": vendor_name,
+            },
+            external_conn=c,
+        )
+
+    write_notifications(conn, write)
 
 
 def _notify_po_requester(conn, po_row, requester_id, actor_user_id, notification_type, title, message):
@@ -569,7 +632,7 @@ def _notify_po_requester(conn, po_row, requester_id, actor_user_id, notification
     vendor_name = po_row["vendor_name"] or "Unknown vendor"
 
     _archive_po_requester_notifications(conn, po_id, requester_id)
-    create_notification(
+    write_notifications(conn, lambda c: create_notification(
         requester_id,
         notification_type,
         title,
@@ -583,8 +646,8 @@ def _notify_po_requester(conn, po_row, requester_id, actor_user_id, notification
             "po_number": po_number,
             "vendor_name": vendor_name,
         },
-        external_conn=conn,
-    )
+        external_conn=c,
+    ))
 
 
 def _coerce_positive_int(value, field_name):
@@ -711,27 +774,11 @@ def _get_po_items(conn, po_id):
             pi.*,
             i.name,
             i.pack_size,
-            COALESCE((
-                SELECT SUM(
-                    CASE
-                        WHEN t.transaction_type = 'IN' THEN t.quantity
-                        WHEN t.transaction_type = 'OUT' THEN -t.quantity
-                        ELSE 0
-                    END
-                )
-                FROM inventory_transactions t
-                WHERE t.item_id = pi.item_id
-            ), 0) AS current_stock,
-            COALESCE((
-                SELECT SUM(other_pi.quantity_ordered - other_pi.quantity_received)
-                FROM po_items other_pi
-                JOIN purchase_orders other_po ON other_po.id = other_pi.po_id
-                WHERE other_pi.item_id = pi.item_id
-                  AND other_po.status IN ('PENDING', 'PARTIAL')
-                  AND other_pi.quantity_ordered > other_pi.quantity_received
-            ), 0) AS pending_stock
+            COALESCE(b.on_hand, 0) AS current_stock,
+            COALESCE(b.on_order, 0) AS pending_stock
         FROM po_items pi
         JOIN items i ON pi.item_id = i.id
+        LEFT JOIN item_stock_balances b ON b.item_id = pi.item_id
         WHERE pi.po_id = %s
         ORDER BY i.name ASC, pi.id ASC
         """,
@@ -1067,6 +1114,7 @@ def create_purchase_order(data, user_id, username, user_role):
             "UPDATE purchase_orders SET total_amount = %s WHERE id = %s",
             (total_order_amount, new_po_id)
         )
+        refresh_po_on_order(conn, new_po_id)
         po_row = conn.execute(
             """
             SELECT id, po_number, vendor_id, vendor_name, notes, status, total_amount, created_by
@@ -1368,6 +1416,12 @@ def update_purchase_order(po_id, data, user_id, username, user_role):
                 notification_type="PO_RESUBMITTED_FOR_APPROVAL",
             )
 
+        refresh_po_on_order(
+            conn,
+            po_id,
+            extra_item_ids=[item["item_id"] for item in current_items],
+        )
+
         conn.commit()
         return get_purchase_order_details(po_id, current_user_id=user_id, current_role=user_role)
     except Exception:
@@ -1414,6 +1468,7 @@ def cancel_purchase_order(po_id, user_id, user_role, notes=None):
             "UPDATE purchase_orders SET status = %s WHERE id = %s",
             ("CANCELLED", po_id),
         )
+        refresh_po_on_order(conn, po_id)
 
         _archive_po_admin_notifications(conn, po_id)
         if role == "admin":
@@ -1460,6 +1515,7 @@ def approve_purchase_order(po_id, admin_user_id, notes=None):
             "UPDATE purchase_orders SET status = %s WHERE id = %s",
             ("PENDING", po_id),
         )
+        refresh_po_on_order(conn, po_id)
 
         po = _get_po_row(conn, po_id)
         _archive_po_admin_notifications(conn, po_id)
@@ -1505,6 +1561,7 @@ def request_po_revisions(po_id, admin_user_id, notes, revision_items=None):
             "UPDATE purchase_orders SET status = %s WHERE id = %s",
             ("FOR_APPROVAL", po_id),
         )
+        refresh_po_on_order(conn, po_id)
 
         po = _get_po_row(conn, po_id)
         _archive_po_admin_notifications(conn, po_id)
@@ -1536,6 +1593,7 @@ def receive_purchase_order(po_id, received_items, user_id, username):
     """
     conn = get_db()
     clean_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cost_updated_ids = set()
 
     try:
         conn.execute("BEGIN")
@@ -1546,6 +1604,11 @@ def receive_purchase_order(po_id, received_items, user_id, username):
             raise ValueError("This purchase order is not approved for receiving.")
         all_completed = True
 
+        # Same lock order as checkout, so a receive and a sale can't deadlock.
+        # Every PO line is locked up front, because refresh_po_on_order below
+        # touches all of them, not just the ones received.
+        lock_po_stock_balances(conn, po_id, [entry['item_id'] for entry in received_items])
+
         for entry in received_items:
             item_id = entry['item_id']
             qty_in = int(entry['qty_received'])
@@ -1587,6 +1650,7 @@ def receive_purchase_order(po_id, received_items, user_id, username):
                     transaction_date=clean_time, external_conn=conn,
                     notes=f"Cost updated from {current_master_cost:.2f} to {float(unit_cost):.2f} via PO receive"
                 )
+                cost_updated_ids.add(item_id)
 
             is_over_receive = qty_in > remaining
 
@@ -1641,6 +1705,10 @@ def receive_purchase_order(po_id, received_items, user_id, username):
             UPDATE purchase_orders SET status = %s, received_at = %s
             WHERE id = %s
         """, (new_status, clean_time, po_id))
+        refresh_po_on_order(conn, po_id)
+
+        if cost_updated_ids:
+            notify_item_catalogue_changed(conn, cost_updated_ids)
 
         conn.commit()
 
@@ -1650,6 +1718,9 @@ def receive_purchase_order(po_id, received_items, user_id, username):
     finally:
         conn.close()
 
+    if cost_updated_ids:
+        invalidate_item_catalogue(cost_updated_ids)
+
 
 def get_po_details_for_api(po_id):
     """
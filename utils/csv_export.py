@@ -0,0 +1,78 @@
+import csv
+import io
+import os
+import zlib
+
+from flask import Response, request, stream_with_context
+
+from db.database import get_db
+
+
+# ─────────────────────────────────────────────
+# STREAMING CSV EXPORTS
+# ─────────────────────────────────────────────
+#
+# Export endpoints build a generator of CSV rows (header first) and hand it
+# to csv_response(). Rows come from stream_query(), a server-side cursor
+# read EXPORT_ITERSIZE rows at a time, and go out in ~EXPORT_CHUNK_BYTES
+# chunks, so memory stays flat whatever the export size.
+#
+# The generator runs under stream_with_context: get_db() inside it still
+# gets the request's shared connection, and the app-context teardown (which
+# returns that connection to the pool) only runs after the last chunk, or
+# when the client disconnects.
+#
+# ?gzip=1 on any export sends <filename>.gz, compressed on the fly.
+
+EXPORT_ITERSIZE = int(os.environ.get("EXPORT_ITERSIZE", 2000))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def stream_query(sql, params=None, itersize=EXPORT_ITERSIZE):
+    """Yields the rows of `sql` through a server-side cursor on its own get_db() connection."""
+    conn = get_db()
+    try:
+        yield from conn.iter_rows(sql, params, itersize=itersize)
+    finally:
+        conn.close()
+
+
+def iter_csv(rows):
+    """Lists of values → CSV text chunks of about EXPORT_CHUNK_BYTES (csv.writer quoting)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_response(rows, filename):
+    """Streams `rows` (header row first) as a CSV download named `filename`."""
+    chunks = iter_csv(rows)
+    if request.args.get("gzip", "").strip().lower() in {"1", "true", "yes", "on"}:
+        body = _gzip_chunks(chunks)
+        mimetype = "application/gzip"
+        filename = f"{filename}.gz"
+    else:
+        body = chunks
+        mimetype = "text/csv"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -0,0 +1,84 @@
+import importlib
+import time
+
+
+# ─────────────────────────────────────────────
+# LAZY SERVICE IMPORTS
+# ─────────────────────────────────────────────
+#
+# Blueprints are still registered at start-up (url_for needs every endpoint
+# in the URL map), but the big service modules behind them are only
+# imported when one of their functions is first called:
+#
+#     _transactions = lazy_module("services.transactions_service")
+#     record_sale = _transactions.record_sale
+#
+# record_sale behaves like the function itself. Only functions can be
+# imported this way; constants still need a normal import.
+#
+# PyInstaller can't see imports made by name, so every module loaded
+# through here must also be listed in LAZY_SERVICE_MODULES (app.spec reads
+# it for hiddenimports).
+
+LAZY_SERVICE_MODULES = (
+    "services.approval_service",
+    "services.loyalty_service",
+    "services.reports_service",
+    "services.transactions_service",
+)
+
+_load_times_ms = {}
+
+
+class LazyFunction:
+    """Stands in for module_name.name; imports the module on the first call."""
+
+    def __init__(self, module_name, name):
+        self._module_name = module_name
+        self._target = None
+        self.__name__ = name
+        self.__qualname__ = name
+        self.__module__ = module_name
+
+    def _resolve(self):
+        if self._target is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._module_name)
+            _load_times_ms.setdefault(self._module_name, round((time.perf_counter() - started) * 1000, 1))
+            self._target = getattr(module, self.__name__)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<lazy {self.__module__}.{self.__name__} ({state})>"
+
+
+class LazyModule:
+    """Attribute access hands out LazyFunctions without importing the module."""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._functions = {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        function = self._functions.get(name)
+        if function is None:
+            function = self._functions[name] = LazyFunction(self._module_name, name)
+        return function
+
+
+def lazy_module(module_name):
+    """Lazy stand-in for `import module_name`, for modules in LAZY_SERVICE_MODULES."""
+    if module_name not in LAZY_SERVICE_MODULES:
+        raise ValueError(f"{module_name} is missing from LAZY_SERVICE_MODULES.")
+    return LazyModule(module_name)
+
+
+def get_lazy_load_times():
+    """Module → ms its first import took, for the modules loaded so far."""
+    return dict(_load_times_ms)